@@ -0,0 +1,79 @@
+"""
+Throughput of one-file-per-osascript adds vs batched adds, against the fake osascript.
+
+    python benchmarks/bench_apple_add.py --tracks 500 --delay 2.0
+
+The legacy path sleeps `--delay` after each file like main.py used to, so long
+runs are dominated by that. Use --skip-legacy to time only the batched path.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+FAKE_OSASCRIPT = os.path.join(ROOT, 'benchmarks', 'fakes', 'fake_osascript.py')
+
+from src import apple_music
+
+
+def make_files(directory, count):
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"Artist {i % 97} - Song {i}.mp3")
+        with open(path, 'wb') as f:
+            f.write(b'ID3')
+        paths.append(path)
+    return paths
+
+
+def reset_library(playlist_name, worker):
+    apple_music.set_backend(None)
+    if os.path.exists(os.environ['FAKE_MUSIC_LIBRARY']):
+        os.remove(os.environ['FAKE_MUSIC_LIBRARY'])
+    if worker:
+        apple_music.set_backend(apple_music.WorkerBackend([sys.executable, FAKE_OSASCRIPT, '--worker']))
+    else:
+        apple_music.set_backend(apple_music.OsascriptBackend())
+    apple_music.create_playlist(playlist_name)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tracks', type=int, default=200)
+    parser.add_argument('--delay', type=float, default=2.0, help="Sleep after each legacy add")
+    parser.add_argument('--batch-size', type=int, default=25)
+    parser.add_argument('--max-batch', type=int, default=0, help="Fake Music times out above this batch size")
+    parser.add_argument('--skip-legacy', action='store_true')
+    parser.add_argument('--worker', action='store_true', help="Use the persistent worker backend")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['FAKE_MUSIC_LIBRARY'] = os.path.join(tmp, 'library.json')
+        os.environ['FAKE_OSASCRIPT_MAX_BATCH'] = str(args.max_batch)
+        apple_music.OSASCRIPT = FAKE_OSASCRIPT
+        files = make_files(tmp, args.tracks)
+
+        rows = []
+        if not args.skip_legacy:
+            reset_library('Bench', args.worker)
+            start = time.perf_counter()
+            added = apple_music.add_files_to_playlist(files, 'Bench', delay=args.delay)
+            rows.append(('one file per call', added, time.perf_counter() - start))
+
+        reset_library('Bench', args.worker)
+        start = time.perf_counter()
+        results = apple_music.add_files_batched(files, 'Bench', batch_size=args.batch_size)
+        added = sum(1 for _, persistent_id in results if persistent_id)
+        rows.append(('batched', added, time.perf_counter() - start))
+        apple_music.set_backend(None)
+
+    print(f"\n{'mode':<20}{'added':>8}{'seconds':>10}{'files/s':>10}")
+    for mode, added, elapsed in rows:
+        print(f"{mode:<20}{added:>8}{elapsed:>10.2f}{added / elapsed:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
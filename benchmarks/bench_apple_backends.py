@@ -0,0 +1,48 @@
+"""
+Per-call overhead of the AppleScript backends, against the fake osascript.
+
+    python benchmarks/bench_apple_backends.py --calls 100
+
+'osascript' starts a process (and compiles the handler script) for every call;
+'worker' pays that once and then only sends framed requests over a pipe.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+FAKE_OSASCRIPT = os.path.join(ROOT, 'benchmarks', 'fakes', 'fake_osascript.py')
+
+from src import apple_music
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['FAKE_MUSIC_LIBRARY'] = os.path.join(tmp, 'library.json')
+        apple_music.OSASCRIPT = FAKE_OSASCRIPT
+        backends = [
+            ('osascript', apple_music.OsascriptBackend()),
+            ('worker', apple_music.WorkerBackend([sys.executable, FAKE_OSASCRIPT, '--worker'])),
+        ]
+
+        print(f"{'backend':<12}{'calls':>8}{'seconds':>10}{'ms/call':>10}")
+        for name, backend in backends:
+            apple_music.set_backend(backend)
+            apple_music.create_playlist('Bench')
+            start = time.perf_counter()
+            for _ in range(args.calls):
+                assert apple_music.playlist_exists('Bench')
+            elapsed = time.perf_counter() - start
+            print(f"{name:<12}{args.calls:>8}{elapsed:>10.2f}{elapsed / args.calls * 1000:>10.1f}")
+            apple_music.set_backend(None)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+Diagnostics over many playlists: the old per-playlist `count of tracks` loop vs
+one bulk playlist_summary call, against the fake Music worker.
+
+    python benchmarks/bench_diagnose.py --playlists 500 --tracks 200
+
+Every playlist is in the sync state with a local folder, so diagnose() compares
+all of them. The old listing is modelled as Apple events x --event-cost, since
+its handler is gone; the new one is run for real with the same per-event cost.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+FAKE_OSASCRIPT = os.path.join(ROOT, 'benchmarks', 'fakes', 'fake_osascript.py')
+
+
+def build(tmp, playlists, tracks):
+    from src.sync_state import SyncState
+
+    library = {'tracks': {}, 'playlists': {}}
+    state = SyncState(os.path.join(tmp, 'state.db'))
+    for p in range(playlists):
+        name = f'Playlist {p}'
+        folder = os.path.join(tmp, name)
+        os.makedirs(folder)
+        entries = []
+        ids = []
+        for t in range(tracks):
+            pid = f'{p:08X}{t:08X}'
+            path = os.path.join(folder, f'Song {t}.mp3')
+            library['tracks'][pid] = {'name': f'Song {t}', 'artist': 'Artist', 'path': path}
+            ids.append(pid)
+            entries.append({'path': path, 'size': 1, 'mtime': 0.0, 'apple_id': pid})
+        library['playlists'][name] = ids
+        state.record_tracks(name, entries)
+        state.touch_playlist(name, folder)
+    with open(os.path.join(tmp, 'library.json'), 'w') as f:
+        json.dump(library, f)
+    return state
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--playlists', type=int, default=500)
+    parser.add_argument('--tracks', type=int, default=200)
+    parser.add_argument('--event-cost', type=float, default=0.002, help="Seconds per Apple event")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['FAKE_MUSIC_LIBRARY'] = os.path.join(tmp, 'library.json')
+        os.environ['FAKE_OSASCRIPT_EVENT_COST'] = str(args.event_cost)
+        from src import apple_music
+        from src.diagnose_playlists import diagnose
+
+        state = build(tmp, args.playlists, args.tracks)
+        apple_music.set_backend(apple_music.WorkerBackend([sys.executable, FAKE_OSASCRIPT, '--worker']))
+        try:
+            start = time.perf_counter()
+            report = diagnose(state)
+            elapsed = time.perf_counter() - start
+        finally:
+            apple_music.set_backend(None)
+
+    # name and count of tracks per playlist, plus listing the playlists
+    legacy_events = 1 + 2 * args.playlists
+    compared = sum(1 for p in report['playlists'] if 'state_tracks' in p)
+    print(f"\n{args.playlists} playlists x {args.tracks} tracks")
+    print(f"{'mode':<8}{'seconds':>10}{'compared':>10}")
+    print(f"{'legacy':<8}{legacy_events * args.event_cost:>10.2f}{'-':>10}  (Music only, listing without comparison)")
+    print(f"{'bulk':<8}{elapsed:>10.2f}{compared:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+"""
+Wall time of downloading several playlists one after another vs on the shared
+SpotDL worker pool, against the fake spotdl.
+
+    python benchmarks/bench_downloads.py --playlists 6 --tracks 40 --workers 3
+
+The sequential run mirrors the old behaviour: one spotdl process per playlist,
+started only once the previous playlist is done. The library run uses the
+in-process backend against the fake spotdl package in benchmarks/fakes, so
+start-up is paid once per worker instead of once per chunk.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+FAKES = os.path.join(ROOT, 'benchmarks', 'fakes')
+FAKE_SPOTDL = os.path.join(FAKES, 'fake_spotdl.py')
+# The fake spotdl package, ahead of any real one
+sys.path.insert(0, FAKES)
+
+from src import downloader
+
+
+def track_urls(playlist, count):
+    return [f"https://open.spotify.com/track/{playlist:02d}{i:020d}" for i in range(count)]
+
+
+def run(tmp, label, playlists, tracks, workers, chunk_size, backend='command'):
+    scheduler = downloader.DownloadScheduler(workers=workers, chunk_size=chunk_size, backend=backend)
+    start = time.perf_counter()
+    try:
+        if workers == 1 and chunk_size >= tracks:
+            # Old behaviour: finish each playlist before starting the next
+            failed = [scheduler.submit(f"PL {p}", track_urls(p, tracks), os.path.join(tmp, label, str(p))).wait()
+                      for p in range(playlists)]
+        else:
+            jobs = [scheduler.submit(f"PL {p}", track_urls(p, tracks), os.path.join(tmp, label, str(p)))
+                    for p in range(playlists)]
+            failed = [job.wait() for job in jobs]
+    finally:
+        scheduler.shutdown()
+    return time.perf_counter() - start, sum(len(f) for f in failed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--playlists', type=int, default=6)
+    parser.add_argument('--tracks', type=int, default=40)
+    parser.add_argument('--workers', type=int, default=3)
+    parser.add_argument('--chunk-size', type=int, default=20)
+    parser.add_argument('--startup', type=float, default=1.0, help="Fake spotdl start-up seconds")
+    parser.add_argument('--per-song', type=float, default=0.05, help="Fake spotdl seconds per song")
+    args = parser.parse_args()
+
+    os.environ['FAKE_SPOTDL_STARTUP'] = str(args.startup)
+    os.environ['FAKE_SPOTDL_PER_SONG'] = str(args.per_song)
+    downloader.SPOTDL = FAKE_SPOTDL
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rows = [
+            ('sequential', *run(tmp, 'seq', args.playlists, args.tracks, 1, args.tracks)),
+            (f'pool x{args.workers}', *run(tmp, 'pool', args.playlists, args.tracks, args.workers, args.chunk_size)),
+            (f'library x{args.workers}', *run(tmp, 'library', args.playlists, args.tracks, args.workers,
+                                              args.chunk_size, backend='library')),
+        ]
+
+    total = args.playlists * args.tracks
+    print(f"\n{args.playlists} playlists x {args.tracks} songs")
+    print(f"{'mode':<14}{'seconds':>10}{'songs/s':>10}{'failed':>8}")
+    for label, seconds, failed in rows:
+        print(f"{label:<14}{seconds:>10.2f}{total / seconds:>10.1f}{failed:>8}")
+
+
+if __name__ == '__main__':
+    main()
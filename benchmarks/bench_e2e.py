@@ -0,0 +1,278 @@
+"""
+Whole-tool benchmark on Linux: main.process_playlist and main.main() against
+the fake Spotify Web API, the fake spotdl and the fake osascript worker.
+
+    python benchmarks/bench_e2e.py --sizes 100,5000,50000
+    python benchmarks/bench_e2e.py --sizes 100,5000 --save-baseline
+
+Each size runs three scenarios, every one in its own process so peak memory
+(max RSS) is per scenario:
+
+    playlist-cold   process_playlist on one empty folder: fetch, download, import
+    main-cold       main() with sync_all_playlists, size split over --playlists
+    main-warm       main() --force again on the same state: nothing to download
+
+and reports wall time, seconds spent inside each phase (phases overlap: the
+download workers run alongside the import), subprocesses started and peak
+memory. Results are compared with benchmarks/baselines/bench_e2e.json and
+regressions are flagged (exit status 1). The baselines are machine-specific;
+refresh them with --save-baseline after a deliberate change. The 50k size is
+slow (~25 minutes per cold scenario, mostly fake spotdl processes and the
+Spotify request budget), so day to day use --sizes 100,5000.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FAKES = os.path.join(ROOT, 'benchmarks', 'fakes')
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baselines', 'bench_e2e.json')
+SCENARIOS = ('playlist-cold', 'main-cold', 'main-warm')
+PHASES = ('spotify', 'prepare', 'import', 'scan', 'apple', 'spotdl')
+
+# A run counts as a regression when it is this much worse than the baseline
+SLOWER = 1.25
+SLOWER_MIN_SECONDS = 1.0
+BIGGER = 1.25
+
+
+class Probe:
+    """Wraps functions in place to add up the time spent inside them, per phase."""
+
+    def __init__(self):
+        self.seconds = dict.fromkeys(PHASES, 0.0)
+        self.subprocesses = {}
+        self.lock = threading.Lock()
+
+    def time(self, owner, name, phase):
+        func = getattr(owner, name)
+        probe = self
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                with probe.lock:
+                    probe.seconds[phase] += time.perf_counter() - start
+        setattr(owner, name, timed)
+
+    def count_subprocesses(self):
+        probe = self
+
+        class CountingPopen(subprocess.Popen):
+            def __init__(self, args, *rest, **kwargs):
+                command = args[0] if isinstance(args, (list, tuple)) else str(args).split()[0]
+                # The fakes run under the interpreter; name them by script
+                if command == sys.executable and len(args) > 1:
+                    command = args[1]
+                name = os.path.basename(command)
+                with probe.lock:
+                    probe.subprocesses[name] = probe.subprocesses.get(name, 0) + 1
+                super().__init__(args, *rest, **kwargs)
+        subprocess.Popen = CountingPopen
+
+
+def fake_client(prefix):
+    import requests
+    import spotipy
+    sp = spotipy.Spotify(auth='fake-token', requests_session=requests.Session())
+    sp.prefix = prefix
+    return sp
+
+
+def run_scenario(scenario, size, workdir, args):
+    """Runs one scenario in this process and returns its measurements."""
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, FAKES)
+    # Everything the tool touches (~/Music/Spotify, config/, the state) lives in workdir
+    os.environ['HOME'] = workdir
+    os.environ['FAKE_MUSIC_LIBRARY'] = os.path.join(workdir, 'music_library.json')
+    os.environ['FAKE_OSASCRIPT_LATENCY'] = str(args.osascript_latency)
+    os.environ['FAKE_OSASCRIPT_EVENT_COST'] = str(args.event_cost)
+    os.environ['FAKE_SPOTDL_STARTUP'] = str(args.spotdl_startup)
+    os.environ['FAKE_SPOTDL_PER_SONG'] = str(args.per_song)
+    os.environ['FAKE_SPOTDL_SIZE'] = '1024'
+    os.chdir(workdir)
+
+    from fake_spotify import FakeSpotify
+    from src import apple_music, downloader
+    from src.spotify_handler import SpotifyHandler
+    from src.sync_state import SyncState
+    from src.utils import answer_automatically
+    import main as app
+
+    playlists = 1 if scenario == 'playlist-cold' else args.playlists
+    server = FakeSpotify(playlists=playlists, tracks_per_playlist=max(1, size // playlists),
+                         liked=0, latency=args.spotify_latency).start()
+    downloader.SPOTDL = os.path.join(FAKES, 'fake_spotdl.py')
+    answer_automatically({'create_playlist': True, 'download_all': True})
+
+    probe = Probe()
+    probe.count_subprocesses()
+    for name in ('get_tracks', 'get_snapshot_id', 'get_all_user_playlists'):
+        probe.time(SpotifyHandler, name, 'spotify')
+    probe.time(app, 'prepare_playlist', 'prepare')
+    probe.time(app, 'import_playlist', 'import')
+    probe.time(app, 'scan_directory_for_audio', 'scan')
+    probe.time(app, 'index_local_tracks', 'scan')
+    probe.time(apple_music, 'run_applescript', 'apple')
+    probe.time(downloader.DownloadScheduler, '_run_chunk', 'spotdl')
+
+    apple_config = {'worker_command': [sys.executable, os.path.join(FAKES, 'fake_osascript.py'), '--worker']}
+    start = time.perf_counter()
+    if scenario == 'playlist-cold':
+        apple_music.configure(apple_config)
+        handler = SpotifyHandler({}, client=fake_client(server.prefix))
+        state = SyncState(os.path.join(workdir, 'state.db'))
+        job = {
+            'name': 'Bench', 'type': 'playlist', 'apple_playlist_name': 'Bench',
+            'spotify_playlist_url': 'https://open.spotify.com/playlist/' + server.playlists[0]['id'],
+            'local_dir': os.path.join(workdir, 'Bench'),
+        }
+        downloads = downloader.DownloadScheduler(workers=args.workers, chunk_size=args.chunk_size, backend='command')
+        try:
+            app.process_playlist(job, handler, None, state, downloads=downloads)
+        finally:
+            downloads.shutdown()
+        state.close()
+    else:
+        os.makedirs('config', exist_ok=True)
+        with open(os.path.join('config', 'settings.yaml'), 'w') as f:
+            json.dump({
+                'spotify': {'client_id': 'x', 'client_secret': 'x', 'redirect_uri': 'x', 'scope': 'x'},
+                'sync_all_playlists': True,
+                'sync_limit_default': size,
+                # baselines/bench_e2e.json was recorded against the spotdl command
+                'downloads': {'workers': args.workers, 'chunk_size': args.chunk_size, 'backend': 'command'},
+                'apple_music': apple_config,
+            }, f)  # JSON is valid YAML
+
+        class BenchSpotifyHandler(SpotifyHandler):
+            def __init__(self, config, client=None):
+                super().__init__(config, client=fake_client(server.prefix))
+        app.SpotifyHandler = BenchSpotifyHandler
+        sys.argv = ['main.py', 'sync'] + (['--force'] if scenario == 'main-warm' else [])
+        app.main()
+    wall = time.perf_counter() - start
+
+    apple_music.set_backend(None)
+    server.stop()
+    return {
+        'wall': wall,
+        'phases': probe.seconds,
+        'subprocesses': sum(probe.subprocesses.values()),
+        'by_command': probe.subprocesses,
+        'spotify_requests': server.requests,
+        # ru_maxrss is KB on Linux, bytes on macOS
+        'peak_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (2**20 if sys.platform == 'darwin' else 2**10),
+    }
+
+
+def child(scenario, size, workdir, args):
+    """Runs a scenario in a fresh interpreter. The tool's own output goes to <workdir>/<scenario>.log."""
+    command = [sys.executable, os.path.abspath(__file__), '--child', scenario, '--size', str(size), '--workdir', workdir]
+    for name, value in vars(args).items():
+        if name in CHILD_OPTIONS:
+            command += [f"--{name.replace('_', '-')}", str(value)]
+    with open(os.path.join(workdir, f'{scenario}.log'), 'w') as log:
+        proc = subprocess.run(command, stdout=subprocess.PIPE, stderr=log, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{scenario} @ {size} failed; see {workdir}/{scenario}.log")
+    return json.loads(proc.stdout.splitlines()[-1])
+
+
+def compare(key, result, baseline):
+    """Returns the ways result is worse than baseline."""
+    old = baseline.get(key)
+    if not old:
+        return []
+    problems = []
+    if result['wall'] > old['wall'] * SLOWER and result['wall'] - old['wall'] > SLOWER_MIN_SECONDS:
+        problems.append(f"wall {old['wall']:.1f}s -> {result['wall']:.1f}s")
+    if result['subprocesses'] > old['subprocesses']:
+        problems.append(f"subprocesses {old['subprocesses']} -> {result['subprocesses']}")
+    if result['peak_mb'] > old['peak_mb'] * BIGGER:
+        problems.append(f"peak {old['peak_mb']:.0f}MB -> {result['peak_mb']:.0f}MB")
+    return problems
+
+
+CHILD_OPTIONS = ('playlists', 'workers', 'chunk_size', 'spotify_latency', 'osascript_latency',
+                 'event_cost', 'spotdl_startup', 'per_song')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', default='100,5000,50000', help="Comma-separated track counts")
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--playlists', type=int, default=4, help="Playlists the main() scenarios split each size over")
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--chunk-size', type=int, default=20)
+    parser.add_argument('--spotify-latency', type=float, default=0.05, help="Seconds per Spotify request")
+    parser.add_argument('--osascript-latency', type=float, default=0.15, help="Seconds to start the scripting worker")
+    parser.add_argument('--event-cost', type=float, default=0.001, help="Seconds per Apple event")
+    parser.add_argument('--spotdl-startup', type=float, default=0.2, help="Fake spotdl seconds per process")
+    parser.add_argument('--per-song', type=float, default=0.002, help="Fake spotdl seconds per song")
+    parser.add_argument('--save-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        # The tool's own output goes to stderr so the last stdout line is ours
+        real_stdout = sys.stdout
+        sys.stdout = sys.stderr
+        result = run_scenario(args.child, args.size, args.workdir, args)
+        real_stdout.write(json.dumps(result) + '\n')
+        return 0
+
+    baseline = {}
+    if os.path.exists(BASELINE_PATH):
+        with open(BASELINE_PATH) as f:
+            baseline = json.load(f)
+
+    results = {}
+    regressions = []
+    scenarios = [s for s in args.scenarios.split(',') if s]
+    print(f"{'scenario':<16}{'tracks':>7}{'wall s':>8}" + ''.join(f'{p:>9}' for p in PHASES)
+          + f"{'procs':>7}{'peak MB':>9}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        with tempfile.TemporaryDirectory() as tmp:
+            for scenario in scenarios:
+                # main-warm reuses main-cold's state and files
+                workdir = os.path.join(tmp, 'main' if scenario.startswith('main') else scenario)
+                os.makedirs(workdir, exist_ok=True)
+                if scenario == 'main-warm' and 'main-cold' not in scenarios:
+                    child('main-cold', size, workdir, args)
+                result = child(scenario, size, workdir, args)
+                key = f'{scenario}@{size}'
+                results[key] = result
+                problems = compare(key, result, baseline)
+                regressions += [(key, p) for p in problems]
+                print(f"{scenario:<16}{size:>7}{result['wall']:>8.1f}"
+                      + ''.join(f"{result['phases'][p]:>9.1f}" for p in PHASES)
+                      + f"{result['subprocesses']:>7}{result['peak_mb']:>9.0f}"
+                      + ('  REGRESSED' if problems else ''), flush=True)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+        with open(BASELINE_PATH, 'w') as f:
+            json.dump({**baseline, **results}, f, indent=2, sort_keys=True)
+        print(f"\nSaved baseline to {os.path.relpath(BASELINE_PATH, ROOT)}")
+    elif regressions:
+        print("\nRegressions against the baseline:")
+        for key, problem in regressions:
+            print(f"  {key}: {problem}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,99 @@
+"""
+get_existing_tracks: per-track AppleScript loop vs bulk column fetch.
+
+    python benchmarks/bench_existing_tracks.py --sizes 1000 10000 50000
+
+Music's side is modelled as (Apple events x --event-cost). The Python side is
+measured for real: the legacy ":::"/"|||" split into dicts vs the streaming
+column parser in apple_music.parse_track_columns.
+"""
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks', 'fakes'))
+
+os.environ['FAKE_OSASCRIPT_EVENT_COST'] = '0'
+from fake_osascript import FakeMusic
+from src import apple_music
+
+
+def legacy_output(music, name):
+    """What the old repeat-loop script returned, costing three Apple events per track."""
+    ids = music.playlists[name]
+    rows = [f"{t['name']}|||{t['artist']}|||{t['path']}" for t in (music.tracks[pid] for pid in ids)]
+    return ':::'.join([str(len(ids))] + rows), 2 + 3 * len(ids)
+
+
+def legacy_parse(output):
+    """The parser get_existing_tracks used before the bulk fetch."""
+    parts = output.split(":::")
+    tracks = []
+    for item in parts[1:]:
+        if "|||" in item:
+            fields = item.split("|||")
+            if len(fields) >= 3:
+                loc = fields[2].strip()
+                tracks.append({
+                    'name': fields[0].strip(),
+                    'artist': fields[1].strip(),
+                    'path': os.path.normcase(loc) if loc else None,
+                    'raw_location': loc,
+                })
+    return tracks
+
+
+def make_library(size):
+    music = FakeMusic('/nonexistent/library.json')
+    music.playlists['Bench'] = []
+    for i in range(size):
+        pid = f'{i:016X}'
+        # Every 500th title contains the old delimiters, which the legacy parser mangles.
+        name = f'Song {i}' if i % 500 else f'Song {i} ||| Live ::: Remix'
+        music.tracks[pid] = {'name': name, 'artist': f'Artist {i % 997}', 'path': f'/Music/Spotify/Bench/Artist {i % 997} - Song {i}.mp3'}
+        music.playlists['Bench'].append(pid)
+    return music
+
+
+def measure(parse, output):
+    start = time.perf_counter()
+    result = parse(output)
+    elapsed = time.perf_counter() - start
+    del result
+
+    # Separate pass for memory; tracemalloc slows parsing down too much to time it.
+    tracemalloc.start()
+    result = parse(output)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--event-cost', type=float, default=0.002, help="Seconds per Apple event")
+    args = parser.parse_args()
+
+    print(f"{'tracks':>8}  {'mode':<8}{'events':>8}{'music s':>10}{'parse s':>10}{'peak MB':>10}{'correct':>9}")
+    for size in args.sizes:
+        music = make_library(size)
+        expected = [music.tracks[pid]['name'] for pid in music.playlists['Bench']]
+
+        output, events = legacy_output(music, 'Bench')
+        tracks, elapsed, peak = measure(legacy_parse, output)
+        correct = sum(1 for t, name in zip(tracks, expected) if t['name'] == name) if len(tracks) == size else 0
+        print(f"{size:>8}  {'legacy':<8}{events:>8}{events * args.event_cost:>10.2f}{elapsed:>10.3f}{peak / 2**20:>10.1f}{correct:>9}")
+
+        output = music.fetch_tracks('Bench')
+        tracks, elapsed, peak = measure(lambda o: list(apple_music.parse_track_columns(o)), output)
+        correct = sum(1 for t, name in zip(tracks, expected) if t.name == name)
+        print(f"{size:>8}  {'bulk':<8}{6:>8}{6 * args.event_cost:>10.2f}{elapsed:>10.3f}{peak / 2**20:>10.1f}{correct:>9}")
+
+
+if __name__ == '__main__':
+    main()
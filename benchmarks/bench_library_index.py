@@ -0,0 +1,82 @@
+"""
+Cost of knowing what Music already has for N playlist jobs: a full
+get_existing_tracks dump per playlist vs one library-wide index plus a
+persistent-ID fetch per playlist.
+
+    python benchmarks/bench_library_index.py --playlists 50 --tracks 500
+
+Music's side is modelled as (Apple events x --event-cost) and the bytes each
+approach sends back; the Python parsing is measured for real.
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks', 'fakes'))
+
+os.environ['FAKE_OSASCRIPT_EVENT_COST'] = '0'
+from fake_osascript import FakeMusic
+from src import apple_music
+
+
+def make_library(playlists, tracks, overlap):
+    """Playlists of `tracks` songs each; `overlap` of every playlist is shared with the others."""
+    music = FakeMusic('/nonexistent/library.json')
+    shared = []
+    for i in range(int(tracks * overlap)):
+        pid = f'S{i:015X}'
+        music.tracks[pid] = {'name': f'Shared {i}', 'artist': 'Artist', 'path': f'/Music/Spotify/.store/Shared {i}.mp3'}
+        shared.append(pid)
+    for p in range(playlists):
+        ids = list(shared)
+        for i in range(tracks - len(shared)):
+            pid = f'P{p:04d}{i:011X}'
+            music.tracks[pid] = {'name': f'Song {i}', 'artist': f'Artist {p}', 'path': f'/Music/Spotify/PL {p}/Song {i}.mp3'}
+            ids.append(pid)
+        music.playlists[f'PL {p}'] = ids
+    return music
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--playlists', type=int, default=50)
+    parser.add_argument('--tracks', type=int, default=500)
+    parser.add_argument('--overlap', type=float, default=0.3, help="Share of each playlist common to all")
+    parser.add_argument('--event-cost', type=float, default=0.002, help="Seconds per Apple event")
+    args = parser.parse_args()
+
+    music = make_library(args.playlists, args.tracks, args.overlap)
+    names = list(music.playlists)
+
+    # Per playlist: fetch_tracks is 6 events and returns names, artists, IDs and paths
+    start = time.perf_counter()
+    sent = 0
+    for name in names:
+        output = music.fetch_tracks(name)
+        sent += len(output)
+        {t.path: t.persistent_id for t in apple_music.parse_track_columns(output)}
+    per_playlist = (time.perf_counter() - start, 6 * len(names), sent)
+
+    # Library index: one fetch_library (2 events) plus playlist_ids (2 events) per playlist
+    start = time.perf_counter()
+    output = music.fetch_library()
+    sent = len(output)
+    split = output.index('\x1d')
+    by_path = dict(zip(output[split + 1:].split('\x1e'), output[:split].split('\x1e')))
+    for name in names:
+        output = music.playlist_ids(name)
+        sent += len(output)
+        set(output.split('\x1e'))
+    library_index = (time.perf_counter() - start, 2 + 2 * len(names), sent)
+
+    print(f"{args.playlists} playlists x {args.tracks} tracks, {len(music.tracks)} in the library ({len(by_path)} indexed)")
+    print(f"{'mode':<16}{'events':>8}{'music s':>10}{'parse s':>10}{'MB sent':>10}")
+    for label, (parse, events, sent) in (('per playlist', per_playlist), ('library index', library_index)):
+        print(f"{label:<16}{events:>8}{events * args.event_cost:>10.2f}{parse:>10.3f}{sent / 2**20:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Peak memory of the track bookkeeping for one huge playlist: the old URL lists,
+per-track dicts and split() copies vs Track records, generator fetchers and
+interned IDs.
+
+    python benchmarks/bench_memory.py --tracks 100000
+
+Each mode runs in a fresh process and reports that process's peak RSS, so the
+numbers include everything the interpreter allocated. 'baseline' builds the
+fake Spotify and Music data and nothing else; the other rows are compared to it.
+
+The workload, all of it kept alive until the end as it is during a job: fetch
+the playlist from an in-memory Spotify client, work out which songs are not on
+disk (half are), load the Music library index, and read the matching Music
+playlist's persistent IDs and full track listing.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks', 'fakes'))
+
+os.environ['FAKE_OSASCRIPT_EVENT_COST'] = '0'
+from fake_osascript import FakeMusic
+from src import apple_music
+from src.audio_tags import track_id_from_url
+from src.spotify_handler import SpotifyHandler, PAGE_SIZE, PLAYLIST_ITEM_FIELDS
+from src.tracks import intern_id
+
+PLAYLIST_URL = 'https://open.spotify.com/playlist/37i9dQZF1DXcBWIGoYBM5M'
+JOB = {'type': 'playlist', 'spotify_playlist_url': PLAYLIST_URL}
+
+
+def spotify_id(i):
+    return f'{i:022d}'
+
+
+class FakeClient:
+    """Builds each playlist_items page on request, like spotipy parsing a response."""
+
+    def __init__(self, total):
+        self.total = total
+
+    def playlist_items(self, url, limit=50, offset=0, fields=None, **kwargs):
+        end = min(offset + limit, self.total)
+        items = [{
+            'added_at': '2024-01-01T00:00:00Z',
+            'track': {
+                'id': spotify_id(i),
+                'name': f'Song {i}',
+                'external_urls': {'spotify': f'https://open.spotify.com/track/{spotify_id(i)}'},
+                'artists': [{'name': f'Artist {i % 997}'}],
+            },
+        } for i in range(offset, end)]
+        return {'items': items, 'total': self.total, 'next': None if end >= self.total else 'more'}
+
+
+class InProcessBackend:
+    """Answers apple_music.call() from a FakeMusic in this process."""
+
+    def __init__(self, music):
+        self.music = music
+
+    def run(self, script, args=(), repeat=True):
+        return True, self.music.dispatch(list(args))
+
+    def close(self):
+        pass
+
+
+def make_music(size):
+    music = FakeMusic('/nonexistent/library.json')
+    music.playlists['Bench'] = []
+    for i in range(size):
+        pid = f'{i:016X}'
+        music.tracks[pid] = {'name': f'Song {i}', 'artist': f'Artist {i % 997}',
+                             'path': f'/Music/Spotify/Bench/Artist {i % 997} - Song {i}.mp3'}
+        music.playlists['Bench'].append(pid)
+    return music
+
+
+def on_disk(size):
+    """{spotify_id: path} for every other song, as fresh strings like SQLite rows."""
+    return {spotify_id(i): f'/Music/Spotify/Bench/Artist {i % 997} - Song {i}.mp3' for i in range(0, size, 2)}
+
+
+def legacy(handler, size):
+    """get_tracks, the presence diff, the library index and the playlist reads as they were."""
+    def fetch_page(offset, page_size):
+        return handler._call(handler.sp.playlist_items, PLAYLIST_URL, limit=page_size, offset=offset,
+                             fields=PLAYLIST_ITEM_FIELDS)
+
+    def fetch_pages():
+        # Every remaining offset handed to map() at once, as _fetch_pages did
+        first = fetch_page(0, PAGE_SIZE)
+        yield first
+        with ThreadPoolExecutor(max_workers=handler.page_workers) as pool:
+            yield from pool.map(lambda offset: fetch_page(offset, PAGE_SIZE),
+                                range(len(first['items']), first['total'], PAGE_SIZE))
+
+    urls = []
+    for results in fetch_pages():
+        for item in results['items']:
+            if item.get('track') and item['track'].get('external_urls'):
+                urls.append(item['track']['external_urls']['spotify'])
+
+    present = on_disk(size)
+    missing = [url for url in urls if track_id_from_url(url) not in present]
+
+    output = apple_music.call('fetch_library')[1]
+    split = output.find(apple_music.GROUP_SEP)
+    by_path = {}
+    by_id = {}
+    for persistent_id, path in zip(apple_music._iter_fields(output, 0, split),
+                                   apple_music._iter_fields(output, split + 1, len(output))):
+        path = os.path.normcase(path)
+        by_path[path] = persistent_id
+        by_id[persistent_id] = path
+    del output
+
+    playlist_ids = set(apple_music.call('playlist_ids', 'Bench')[1].split(apple_music.RECORD_SEP))
+    existing = [{
+        'name': t.name,
+        'artist': t.artist,
+        'path': t.path,
+        'raw_location': t.path or 'MISSING_LOCATION',
+        'persistent_id': t.persistent_id,
+    } for t in apple_music.iter_playlist_tracks('Bench')]
+    return urls, present, missing, by_path, by_id, playlist_ids, existing
+
+
+def records(handler, size):
+    """The same steps through the current code."""
+    tracks = handler.get_tracks(JOB, limit=None)
+
+    # index_local_tracks interns its keys the same way
+    present = {intern_id(track_id): path for track_id, path in on_disk(size).items()}
+    missing = [track for track in tracks if track.spotify_id not in present]
+
+    library = apple_music.LibraryIndex()
+    library._load()
+    playlist_ids = library.playlist_ids('Bench')
+    existing = apple_music.get_existing_tracks('Bench')
+    return tracks, present, missing, library, playlist_ids, existing
+
+
+def peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def child(mode, size):
+    handler = SpotifyHandler({'requests_per_second': 1e9, 'request_burst': 1e9}, client=FakeClient(size))
+    apple_music.set_backend(InProcessBackend(make_music(size)))
+    start = time.perf_counter()
+    if mode == 'legacy':
+        kept = legacy(handler, size)
+    elif mode == 'records':
+        kept = records(handler, size)
+    else:
+        kept = None
+    elapsed = time.perf_counter() - start
+    missing = len(kept[2]) if kept else 0
+    print(json.dumps({'peak': peak_rss(), 'seconds': elapsed, 'missing': missing}))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tracks', type=int, default=100000)
+    parser.add_argument('--child', choices=['baseline', 'legacy', 'records'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.tracks)
+        return
+
+    rows = []
+    for mode in ('baseline', 'legacy', 'records'):
+        out = subprocess.run([sys.executable, __file__, '--child', mode, '--tracks', str(args.tracks)],
+                             capture_output=True, text=True, check=True).stdout
+        rows.append((mode, json.loads(out.strip().splitlines()[-1])))
+
+    base = rows[0][1]['peak']
+    print(f"\n{args.tracks} tracks")
+    print(f"{'mode':<10}{'peak MB':>10}{'+MB':>10}{'seconds':>10}{'missing':>10}")
+    for mode, row in rows:
+        print(f"{mode:<10}{row['peak'] / 2**20:>10.1f}{(row['peak'] - base) / 2**20:>10.1f}"
+              f"{row['seconds']:>10.2f}{row['missing']:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Time until the first song reaches Apple Music, waiting for every download
+first vs importing each SpotDL batch as it lands. Uses the fake spotdl and the
+fake osascript worker.
+
+    python benchmarks/bench_pipeline.py --tracks 200 --chunk-size 20 --workers 2
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+FAKES = os.path.join(ROOT, 'benchmarks', 'fakes')
+
+from src import apple_music, downloader
+from src.audio_store import AudioStore
+from src.importer import PlaylistImporter
+from src.journal import RunJournal
+from src.sync_state import SyncState
+import main as app
+
+first_add = []
+_add_chunk = apple_music._add_chunk
+
+
+def timed_add_chunk(file_paths, playlist_name):
+    result = _add_chunk(file_paths, playlist_name)
+    if not first_add and result[1]:
+        first_add.append(time.perf_counter())
+    return result
+
+
+def run(tmp, mode, args):
+    os.environ['FAKE_MUSIC_LIBRARY'] = os.path.join(tmp, f'{mode}.json')
+    apple_music.set_backend(apple_music.WorkerBackend([sys.executable, os.path.join(FAKES, 'fake_osascript.py'), '--worker']))
+    apple_music.create_playlist(mode)
+    state = SyncState(os.path.join(tmp, f'{mode}.db'))
+    local_dir = os.path.join(tmp, mode)
+    os.makedirs(local_dir)
+    urls = [f"https://open.spotify.com/track/{i:022d}" for i in range(args.tracks)]
+
+    first_add.clear()
+    scheduler = downloader.DownloadScheduler(workers=args.workers, chunk_size=args.chunk_size, backend='command')
+    start = time.perf_counter()
+    download = scheduler.submit(mode, urls, local_dir)
+    ctx = {
+        'job': {'name': mode}, 'local_dir': local_dir, 'apple_pl_name': mode,
+        'snapshot_id': None, 'liked_cursor': None, 'link_later': [], 'via_store': False,
+        'store': AudioStore(None, state), 'download': download, 'journal': RunJournal(None),
+    }
+    if mode == 'barrier':
+        # The old shape: every download, then one import of the whole folder
+        download.wait()
+        files = app.scan_directory_for_audio(local_dir, state)
+        path_ids = {p: s for s, p in app.index_local_tracks(files, local_dir, state).items()}
+        PlaylistImporter(mode, state).import_files(files, path_ids)
+    else:
+        app.import_playlist(ctx, state)
+    total = time.perf_counter() - start
+    scheduler.shutdown()
+    state.close()
+    apple_music.set_backend(None)
+    return first_add[0] - start, total
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tracks', type=int, default=200)
+    parser.add_argument('--chunk-size', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--per-song', type=float, default=0.05, help="Fake spotdl seconds per song")
+    args = parser.parse_args()
+
+    os.environ['FAKE_SPOTDL_STARTUP'] = '1.0'
+    os.environ['FAKE_SPOTDL_PER_SONG'] = str(args.per_song)
+    os.environ.setdefault('FAKE_OSASCRIPT_LATENCY', '0.15')
+    downloader.SPOTDL = os.path.join(FAKES, 'fake_spotdl.py')
+    apple_music._add_chunk = timed_add_chunk
+
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ('barrier', 'streaming'):
+            rows.append((mode, *run(tmp, mode, args)))
+
+    print(f"\n{args.tracks} songs, chunks of {args.chunk_size}, {args.workers} SpotDL workers")
+    print(f"{'mode':<12}{'first song (s)':>16}{'total (s)':>12}")
+    for mode, first, total in rows:
+        print(f"{mode:<12}{first:>16.2f}{total:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
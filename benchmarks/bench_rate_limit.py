@@ -0,0 +1,57 @@
+"""
+Behaviour under scripted 429 storms from the fake Spotify API.
+
+    python benchmarks/bench_rate_limit.py --playlists 8 --storm 6 --retry-after 1
+
+Fetches several playlists in parallel through one SpotifyHandler while the
+server answers the first --storm requests with 429 + Retry-After, then prints
+the scheduler's counters. Every playlist should still come back complete.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks', 'fakes'))
+
+import spotipy
+from fake_spotify import FakeSpotify
+from src.spotify_handler import SpotifyHandler, build_session
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--playlists', type=int, default=8)
+    parser.add_argument('--tracks', type=int, default=500)
+    parser.add_argument('--storm', type=int, default=6, help="Number of 429s served up front")
+    parser.add_argument('--retry-after', type=int, default=1)
+    parser.add_argument('--rate', type=float, default=20.0)
+    args = parser.parse_args()
+
+    server = FakeSpotify(playlists=args.playlists, tracks_per_playlist=args.tracks, latency=0.02).start()
+    server.scripted = [429] * args.storm
+    server.retry_after = args.retry_after
+
+    sp = spotipy.Spotify(auth='fake-token', requests_session=build_session(4))
+    sp.prefix = server.prefix
+    handler = SpotifyHandler({'page_workers': 4, 'requests_per_second': args.rate}, client=sp)
+
+    jobs = [{'type': 'playlist', 'spotify_playlist_url': f"https://open.spotify.com/playlist/{pl['id']}"}
+            for pl in server.playlists]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+        results = list(pool.map(lambda job: handler.get_tracks(job, limit=None), jobs))
+    elapsed = time.perf_counter() - start
+
+    complete = sum(1 for tracks in results if len(tracks) == args.tracks)
+    print(f"{complete}/{len(jobs)} playlists complete in {elapsed:.2f}s")
+    print("Scheduler:", handler.api_stats())
+    print("Server requests:", server.requests)
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""
+Folder scan cost on a large synthetic library: a full os.walk every run vs the
+incremental scanner, cold, warm, and after a handful of new downloads.
+
+    python benchmarks/bench_scanner.py --files 100000 --dirs 500
+
+Directory mtimes are backdated after creation, as they would be on a library
+that wasn't just written, so the scanner can trust them.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import main as app
+from src.scanner import DirectoryScanner
+from src.sync_state import SyncState
+
+
+def build_tree(root, files, dirs):
+    per_dir = max(1, files // dirs)
+    for d in range(dirs):
+        directory = os.path.join(root, f"Playlist {d:04d}")
+        os.makedirs(directory)
+        for i in range(per_dir):
+            open(os.path.join(directory, f"Artist {i % 97} - Song {d}-{i}.mp3"), 'wb').close()
+    backdate(root)
+    return [os.path.join(root, f"Playlist {d:04d}") for d in range(dirs)]
+
+
+def backdate(root):
+    old = time.time() - 3600
+    for path, _, _ in os.walk(root):
+        os.utime(path, (old, old))
+
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--files', type=int, default=100000)
+    parser.add_argument('--dirs', type=int, default=500)
+    parser.add_argument('--new', type=int, default=20, help="Files added before the last scan")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        library = os.path.join(tmp, 'library')
+        print(f"Creating {args.files} files in {args.dirs} folders...")
+        dirs = build_tree(library, args.files, args.dirs)
+        state = SyncState(os.path.join(tmp, 'state.db'))
+        scanner = DirectoryScanner(state)
+
+        rows = []
+        seconds, files = timed(lambda: app.scan_directory_for_audio(library))
+        rows.append(('os.walk', seconds, len(files), '-'))
+        seconds, changes = timed(lambda: list(scanner.changes(library)))
+        rows.append(('scanner, cold', seconds, len(scanner.listing), len(changes)))
+        seconds, changes = timed(lambda: list(scanner.changes(library)))
+        rows.append(('scanner, warm', seconds, len(scanner.listing), len(changes)))
+
+        touched = set()
+        for i in range(args.new):
+            directory = dirs[i % len(dirs)]
+            open(os.path.join(directory, f"New - Song {i}.mp3"), 'wb').close()
+            touched.add(directory)
+        for directory in touched:
+            backdate(directory)
+        seconds, changes = timed(lambda: list(scanner.changes(library)))
+        rows.append((f'scanner, +{args.new} new', seconds, len(scanner.listing), len(changes)))
+        state.close()
+
+    print(f"\n{'scan':<22}{'seconds':>10}{'files':>10}{'changes':>10}")
+    for label, seconds, count, changes in rows:
+        print(f"{label:<22}{seconds:>10.3f}{count:>10}{changes:>10}")
+
+
+if __name__ == '__main__':
+    main()
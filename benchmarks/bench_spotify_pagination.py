@@ -0,0 +1,72 @@
+"""
+Playlist pagination: sequential full-object pages vs concurrent, field-filtered pages,
+against a local fake Spotify Web API.
+
+    python benchmarks/bench_spotify_pagination.py --tracks 2000 --latency 0.08 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks', 'fakes'))
+
+import requests
+import spotipy
+from fake_spotify import FakeSpotify
+from src.spotify_handler import SpotifyHandler
+
+
+def legacy_get_tracks(sp, pl_url):
+    """The one-page-at-a-time loop get_tracks used before."""
+    tracks = []
+    offset = 0
+    while True:
+        results = sp.playlist_items(pl_url, limit=50, offset=offset)
+        if not results['items']:
+            break
+        for item in results['items']:
+            if item.get('track') and item['track'].get('external_urls'):
+                tracks.append(item['track']['external_urls']['spotify'])
+        if results['next'] is None:
+            break
+        offset += len(results['items'])
+    return tracks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--tracks', type=int, default=2000)
+    parser.add_argument('--latency', type=float, default=0.08, help="Server-side delay per request")
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    server = FakeSpotify(playlists=1, tracks_per_playlist=args.tracks, latency=args.latency).start()
+    sp = spotipy.Spotify(auth='fake-token', requests_session=requests.Session())
+    sp.prefix = server.prefix
+    handler = SpotifyHandler({'page_workers': args.workers}, client=sp)
+    pl_url = 'https://open.spotify.com/playlist/' + server.playlists[0]['id']
+
+    print(f"{'mode':<22}{'tracks':>8}{'requests':>10}{'KB':>10}{'seconds':>10}")
+    runs = [
+        ('sequential, full', lambda: legacy_get_tracks(sp, pl_url)),
+        (f'concurrent x{args.workers}, fields',
+         lambda: [t.url for t in handler.get_tracks({'type': 'playlist', 'spotify_playlist_url': pl_url}, limit=None)]),
+    ]
+    results = []
+    for name, run in runs:
+        server.requests = server.bytes_sent = 0
+        start = time.perf_counter()
+        tracks = run()
+        elapsed = time.perf_counter() - start
+        results.append(tracks)
+        print(f"{name:<22}{len(tracks):>8}{server.requests:>10}{server.bytes_sent / 1024:>10.0f}{elapsed:>10.2f}")
+
+    print("Same tracks in the same order:", results[0] == results[1])
+    server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Stand-in for macOS `osascript` so the Apple Music side can be exercised on Linux.
+
+It implements the handlers in src/apple_music.HANDLERS against a fake Music
+library kept in a JSON file. Point the app at it with:
+
+    OSASCRIPT=benchmarks/fakes/fake_osascript.py
+
+or run it as a persistent worker speaking the WorkerBackend protocol:
+
+    apple_music.set_backend(WorkerBackend([sys.executable, 'benchmarks/fakes/fake_osascript.py', '--worker']))
+
+Environment:
+    FAKE_MUSIC_LIBRARY          path of the JSON library (default: /tmp/fake_music_library.json)
+    FAKE_OSASCRIPT_LATENCY      seconds spent starting up and compiling (default: 0.15)
+    FAKE_OSASCRIPT_EVENT_COST   seconds per Apple event sent to Music (default: 0.002)
+    FAKE_OSASCRIPT_MAX_BATCH    adds larger than this time out after that many files, like a busy Music app (default: 0 = never)
+"""
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+
+LIBRARY_PATH = os.environ.get('FAKE_MUSIC_LIBRARY', '/tmp/fake_music_library.json')
+LATENCY = float(os.environ.get('FAKE_OSASCRIPT_LATENCY', '0.15'))
+EVENT_COST = float(os.environ.get('FAKE_OSASCRIPT_EVENT_COST', '0.002'))
+MAX_BATCH = int(os.environ.get('FAKE_OSASCRIPT_MAX_BATCH', '0'))
+
+US = '\x1f'
+RS = '\x1e'
+GS = '\x1d'
+
+
+class AppleScriptError(Exception):
+    pass
+
+
+class FakeMusic:
+    def __init__(self, path):
+        self.path = path
+        self.tracks = {}
+        self.playlists = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            self.tracks = data['tracks']
+            self.playlists = data['playlists']
+        self.by_path = {t['path']: pid for pid, t in self.tracks.items()}
+        self.dirty = False
+
+    def save(self):
+        if not self.dirty:
+            return
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'tracks': self.tracks, 'playlists': self.playlists}, f)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+    def events(self, count):
+        if EVENT_COST:
+            time.sleep(EVENT_COST * count)
+
+    def playlist(self, name):
+        if name not in self.playlists:
+            raise AppleScriptError(f"Can't get user playlist \"{name}\". (-1728)")
+        return self.playlists[name]
+
+    def add_file(self, path, playlist_name):
+        """Mimics `add (POSIX file path) to user playlist`. Returns the persistent ID."""
+        if not os.path.isfile(path):
+            raise AppleScriptError(f"File {path} wasn't found. (-43)")
+        self.events(1)
+        persistent_id = self.by_path.get(path)
+        if persistent_id is None:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            artist, _, name = stem.partition(' - ')
+            persistent_id = uuid.uuid4().hex[:16].upper()
+            self.tracks[persistent_id] = {
+                'name': name or stem,
+                'artist': artist if name else '',
+                'path': path,
+            }
+            self.by_path[path] = persistent_id
+        self.playlist(playlist_name).append(persistent_id)
+        self.dirty = True
+        return persistent_id
+
+    # --- handlers, named as in apple_music.HANDLERS ---
+
+    def playlist_exists(self, name):
+        self.events(1)
+        return 'true' if name in self.playlists else 'false'
+
+    def create_playlist(self, name):
+        self.events(1)
+        self.playlists.setdefault(name, [])
+        self.dirty = True
+        return ''
+
+    def delete_playlist(self, name):
+        self.events(1)
+        self.playlist(name)
+        del self.playlists[name]
+        self.dirty = True
+        return ''
+
+    def add_files(self, playlist_name, *paths):
+        # One `add fileList to pl`: Music works through the list and keeps what it
+        # added when it gives up, at a missing file or (past MAX_BATCH) a timeout.
+        self.playlist(playlist_name)
+        records = []
+        for i, path in enumerate(paths):
+            if MAX_BATCH and i == MAX_BATCH:
+                self.events(len(paths) - i)
+                raise AppleScriptError('Music got an error: AppleEvent timed out. (-1712)')
+            persistent_id = self.add_file(path, playlist_name)
+            records.append(path + US + persistent_id)
+        return RS.join(records)
+
+    def add_tracks_by_id(self, playlist_name, *ids):
+        playlist = self.playlist(playlist_name)
+        added = []
+        for persistent_id in ids:
+            # `first track of library playlist 1 whose ...` is a search, not a lookup
+            self.events(2)
+            if persistent_id in self.tracks:
+                playlist.append(persistent_id)
+                added.append(persistent_id)
+        self.dirty = True
+        return RS.join(added)
+
+    def fetch_tracks(self, name):
+        # Five bulk property reads, regardless of playlist size.
+        self.events(1)
+        if name not in self.playlists:
+            return 'PLAYLIST_NOT_FOUND'
+        self.events(5)
+        ids = self.playlists[name]
+        tracks = [self.tracks[pid] for pid in ids]
+        columns = [
+            str(len(ids)),
+            RS.join(t['name'] for t in tracks),
+            RS.join(t['artist'] for t in tracks),
+            RS.join(ids),
+            RS.join(ids),
+            RS.join(t['path'] for t in tracks),
+        ]
+        return GS.join(columns)
+
+    def fetch_library(self):
+        # Two bulk property reads over the whole library
+        self.events(2)
+        return GS.join([RS.join(self.tracks), RS.join(t['path'] for t in self.tracks.values())])
+
+    def playlist_ids(self, name):
+        self.events(1)
+        if name not in self.playlists:
+            return 'PLAYLIST_NOT_FOUND'
+        self.events(1)
+        return RS.join(self.playlists[name])
+
+    def track_location(self, persistent_id):
+        self.events(2)
+        track = self.tracks.get(persistent_id)
+        return track['path'] if track else ''
+
+    def library_id(self):
+        self.events(1)
+        return 'FAKE0LIBRARY0001'
+
+    def playlist_summary(self, *wanted):
+        # Names and IDs in one read, every playlist's track IDs in another
+        self.events(2)
+        wanted = set(wanted)
+        return RS.join(
+            US.join([name, self.playlist_id(name), str(len(ids)), GS.join(ids) if name in wanted else ''])
+            for name, ids in self.playlists.items()
+        )
+
+    def playlist_id(self, name):
+        # Stable per name, like a persistent ID
+        return hashlib.md5(name.encode()).hexdigest()[:16].upper()
+
+    def dispatch(self, argv):
+        if not argv or argv[0].startswith('_') or not hasattr(self, argv[0]):
+            raise AppleScriptError(f"Unknown command: {argv[0] if argv else ''}")
+        return getattr(self, argv[0])(*argv[1:])
+
+
+def run_once(argv):
+    """`osascript -e script arg ...` mode: one call per process."""
+    time.sleep(LATENCY)
+    music = FakeMusic(LIBRARY_PATH)
+    try:
+        output = music.dispatch(argv)
+    except AppleScriptError as e:
+        sys.stderr.write(f'execution error: {e}\n')
+        return 1
+    finally:
+        music.save()
+    sys.stdout.write(output + '\n')
+    return 0
+
+
+def reply(status, text):
+    body = json.dumps(text).encode('ascii')
+    sys.stdout.buffer.write(b'%s %d\n' % (status.encode('ascii'), len(body)) + body)
+    sys.stdout.buffer.flush()
+
+
+def run_worker():
+    """Persistent mode: speaks the WorkerBackend protocol on stdin/stdout."""
+    time.sleep(LATENCY)
+    music = FakeMusic(LIBRARY_PATH)
+    compiled = set()
+    stdin = sys.stdin.buffer
+    try:
+        while True:
+            header = stdin.readline()
+            if not header:
+                return 0
+            request = json.loads(stdin.read(int(header)))
+            if 'source' in request and request['id'] not in compiled:
+                time.sleep(LATENCY / 3)
+                compiled.add(request['id'])
+            if request['id'] not in compiled:
+                reply('unknown', '')
+                continue
+            try:
+                reply('ok', music.dispatch(request['argv']))
+            except AppleScriptError as e:
+                reply('err', str(e))
+            music.save()
+    finally:
+        music.save()
+
+
+def main():
+    args = sys.argv[1:]
+    if args == ['--worker']:
+        return run_worker()
+    if len(args) < 2 or args[0] != '-e':
+        sys.stderr.write('usage: fake_osascript.py -e script [arg ...] | --worker\n')
+        return 1
+    return run_once(args[2:])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
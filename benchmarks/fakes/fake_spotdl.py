@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Stand-in for `spotdl download url ...` so the download pipeline can be exercised
+without YouTube. Each URL becomes "Artist - Song <id>.mp3" in the current
+directory, carrying the same WOAS (source URL) tag spotdl writes. Point the app
+at it with:
+
+    SPOTDL=benchmarks/fakes/fake_spotdl.py
+
+Other spotdl options (--yt-dlp-args, --threads, ...) are accepted and ignored.
+
+Environment:
+    FAKE_SPOTDL_STARTUP     seconds spent starting up (default: 1.0)
+    FAKE_SPOTDL_PER_SONG    seconds spent per song (default: 0.5)
+    FAKE_SPOTDL_SIZE        bytes of fake audio per file (default: 4096)
+    FAKE_SPOTDL_FAIL        comma-separated track IDs that never download
+"""
+import os
+import struct
+import sys
+import time
+
+STARTUP = float(os.environ.get('FAKE_SPOTDL_STARTUP', '1.0'))
+PER_SONG = float(os.environ.get('FAKE_SPOTDL_PER_SONG', '0.5'))
+SIZE = int(os.environ.get('FAKE_SPOTDL_SIZE', '4096'))
+FAIL = set(filter(None, os.environ.get('FAKE_SPOTDL_FAIL', '').split(',')))
+
+# Options that take a value, so it isn't mistaken for a URL.
+VALUE_OPTIONS = {'--yt-dlp-args', '--threads', '--output', '--format', '--bitrate'}
+
+
+def syncsafe(n):
+    return bytes([(n >> 21) & 0x7f, (n >> 14) & 0x7f, (n >> 7) & 0x7f, n & 0x7f])
+
+
+def id3_with_woas(url):
+    """Minimal ID3v2.3 tag holding a single WOAS frame."""
+    data = url.encode('latin-1')
+    frame = b'WOAS' + struct.pack('>I', len(data)) + b'\x00\x00' + data
+    return b'ID3\x03\x00\x00' + syncsafe(len(frame)) + frame
+
+
+def parse_urls(args):
+    urls = []
+    skip = False
+    for arg in args:
+        if skip:
+            skip = False
+        elif arg in VALUE_OPTIONS:
+            skip = True
+        elif not arg.startswith('-'):
+            urls.append(arg)
+    return urls
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] != 'download':
+        sys.stderr.write('usage: fake_spotdl.py download url [url ...]\n')
+        return 2
+    time.sleep(STARTUP)
+
+    failures = 0
+    for url in parse_urls(args[1:]):
+        track_id = url.rstrip('/').split('/')[-1].split('?')[0]
+        time.sleep(PER_SONG)
+        if track_id in FAIL:
+            print(f'LookupError: No results found for song: {url}')
+            failures += 1
+            continue
+        path = f'Artist - Song {track_id}.mp3'
+        if os.path.exists(path):
+            print(f'Skipping {path} (file already exists)')
+            continue
+        with open(path, 'wb') as f:
+            f.write(id3_with_woas(url))
+            f.write(b'\x00' * SIZE)
+        print(f'Downloaded "{path[:-4]}": {url}')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
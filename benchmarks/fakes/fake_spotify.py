@@ -0,0 +1,220 @@
+"""
+Minimal local stand-in for the Spotify Web API endpoints this tool uses.
+
+    server = FakeSpotify(playlists=20, tracks_per_playlist=500, liked=2000, latency=0.05)
+    server.start()
+    sp = spotipy.Spotify(auth='fake-token', requests_session=requests.Session())
+    sp.prefix = server.prefix
+    ...
+    server.stop()
+
+Serves /me/playlists, /me/tracks, /playlists/{id} and /playlists/{id}/tracks
+(also /items) with full-size track objects, honours `fields=`, and counts
+requests and bytes sent. Run it directly to serve on a fixed port.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+
+def track_object(i):
+    """A track object of roughly the size the real API returns."""
+    track_id = f'{i:022d}'
+    artist = {
+        'id': f'{i % 997:022d}', 'name': f'Artist {i % 997}', 'type': 'artist',
+        'uri': f'spotify:artist:{i % 997:022d}',
+        'href': f'https://api.spotify.com/v1/artists/{i % 997:022d}',
+        'external_urls': {'spotify': f'https://open.spotify.com/artist/{i % 997:022d}'},
+    }
+    return {
+        'id': track_id, 'name': f'Song {i}', 'type': 'track', 'uri': f'spotify:track:{track_id}',
+        'href': f'https://api.spotify.com/v1/tracks/{track_id}',
+        'external_urls': {'spotify': f'https://open.spotify.com/track/{track_id}'},
+        'external_ids': {'isrc': f'USRC1{i:07d}'},
+        'artists': [artist],
+        'album': {
+            'id': f'{i // 12:022d}', 'name': f'Album {i // 12}', 'album_type': 'album',
+            'release_date': '2020-01-01', 'release_date_precision': 'day', 'total_tracks': 12,
+            'artists': [artist],
+            'images': [{'url': f'https://i.scdn.co/image/{i // 12:040d}', 'height': h, 'width': h} for h in (640, 300, 64)],
+            'external_urls': {'spotify': f'https://open.spotify.com/album/{i // 12:022d}'},
+            'available_markets': ['US', 'GB', 'DE', 'FR', 'SE', 'NL', 'CA', 'AU', 'JP', 'BR'],
+        },
+        'available_markets': ['US', 'GB', 'DE', 'FR', 'SE', 'NL', 'CA', 'AU', 'JP', 'BR'],
+        'disc_number': 1, 'track_number': i % 12 + 1, 'duration_ms': 180000 + i % 60000,
+        'explicit': False, 'popularity': i % 100, 'is_local': False,
+        'preview_url': f'https://p.scdn.co/mp3-preview/{i:040d}',
+    }
+
+
+def parse_fields(spec):
+    """Parses Spotify's `fields` syntax, e.g. 'items(track(name,album.id)),total', into a nested dict."""
+    def parse(pos):
+        fields = {}
+        while pos < len(spec):
+            end = pos
+            while end < len(spec) and spec[end] not in ',()':
+                end += 1
+            path = spec[pos:end].split('.')
+            node = fields
+            for part in path[:-1]:
+                node = node.setdefault(part, {})
+            leaf = node.setdefault(path[-1], {})
+            pos = end
+            if pos < len(spec) and spec[pos] == '(':
+                children, pos = parse(pos + 1)
+                leaf.update(children)
+                pos += 1  # ')'
+            if pos < len(spec) and spec[pos] == ',':
+                pos += 1
+            elif pos < len(spec) and spec[pos] == ')':
+                return fields, pos
+        return fields, pos
+    return parse(0)[0]
+
+
+def apply_fields(value, fields):
+    if not fields:
+        return value
+    if isinstance(value, list):
+        return [apply_fields(v, fields) for v in value]
+    if isinstance(value, dict):
+        return {k: apply_fields(value[k], sub) for k, sub in fields.items() if k in value}
+    return value
+
+
+class FakeSpotify:
+    def __init__(self, playlists=10, tracks_per_playlist=200, liked=1000, latency=0.0, port=0):
+        self.latency = latency
+        self.playlists = [
+            {'id': f'pl{n:020d}', 'name': f'Playlist {n}', 'snapshot_id': f'snap-{n}-1',
+             'first_track': n * tracks_per_playlist, 'total': tracks_per_playlist}
+            for n in range(playlists)
+        ]
+        self.liked = liked
+        self.requests = 0
+        self.bytes_sent = 0
+        self.lock = threading.Lock()
+        # Scripted responses: status codes (e.g. 429) served before the next real ones.
+        self.scripted = []
+        self.retry_after = 1
+        self.server = ThreadingHTTPServer(('127.0.0.1', port), self._handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def prefix(self):
+        return f'http://127.0.0.1:{self.server.server_address[1]}/v1/'
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def page(self, url, items_for, total, offset, limit):
+        items = [items_for(i) for i in range(offset, min(offset + limit, total))]
+        next_url = None
+        if offset + limit < total:
+            next_url = f'{self.prefix}{url}?offset={offset + limit}&limit={limit}'
+        return {'href': f'{self.prefix}{url}', 'items': items, 'limit': limit,
+                'offset': offset, 'total': total, 'next': next_url, 'previous': None}
+
+    def route(self, path, query):
+        offset = int(query.get('offset', ['0'])[0])
+        limit = int(query.get('limit', ['20'])[0])
+        parts = path.strip('/').split('/')[1:]  # drop 'v1'
+
+        if parts == ['me', 'playlists']:
+            def playlist_item(i):
+                pl = self.playlists[i]
+                return {'id': pl['id'], 'name': pl['name'], 'snapshot_id': pl['snapshot_id'],
+                        'external_urls': {'spotify': f"https://open.spotify.com/playlist/{pl['id']}"},
+                        'tracks': {'total': pl['total']}}
+            return self.page('me/playlists', playlist_item, len(self.playlists), offset, limit)
+
+        if parts == ['me', 'tracks']:
+            def saved_item(i):
+                # Newest first: index 0 is the most recently liked song.
+                n = self.liked - 1 - i
+                return {'added_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(1600000000 + n * 60)),
+                        'track': track_object(n)}
+            return self.page('me/tracks', saved_item, self.liked, offset, limit)
+
+        if len(parts) >= 2 and parts[0] == 'playlists':
+            pl = next((p for p in self.playlists if p['id'] == parts[1]), None)
+            if pl is None:
+                return None
+            if len(parts) == 2:
+                return {'id': pl['id'], 'name': pl['name'], 'snapshot_id': pl['snapshot_id']}
+            if parts[2] in ('tracks', 'items'):
+                def playlist_track(i):
+                    return {'added_at': '2020-01-01T00:00:00Z', 'track': track_object(pl['first_track'] + i)}
+                return self.page(f"playlists/{pl['id']}/{parts[2]}", playlist_track, pl['total'], offset, limit)
+        return None
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def send(self, status, payload, headers=()):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for key, value in headers:
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+                with fake.lock:
+                    fake.bytes_sent += len(body)
+
+            def do_GET(self):
+                if fake.latency:
+                    time.sleep(fake.latency)
+                with fake.lock:
+                    fake.requests += 1
+                    scripted = fake.scripted.pop(0) if fake.scripted else None
+                if scripted == 429:
+                    self.send(429, {'error': {'status': 429, 'message': 'API rate limit exceeded'}},
+                              [('Retry-After', str(fake.retry_after))])
+                    return
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                payload = fake.route(url.path, query)
+                if payload is None:
+                    self.send(404, {'error': {'status': 404, 'message': 'Not found'}})
+                    return
+                if 'fields' in query:
+                    payload = apply_fields(payload, parse_fields(query['fields'][0]))
+                self.send(200, payload)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--playlists', type=int, default=10)
+    parser.add_argument('--tracks', type=int, default=200, help="Tracks per playlist")
+    parser.add_argument('--liked', type=int, default=1000)
+    parser.add_argument('--latency', type=float, default=0.05)
+    args = parser.parse_args()
+    server = FakeSpotify(args.playlists, args.tracks, args.liked, args.latency, args.port)
+    print(f"Serving fake Spotify API at {server.prefix}")
+    server.server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,8 @@
+"""
+Stand-in for the parts of the spotdl package the in-process backend uses
+(src/spotdl_library.py), with the same timings and output as fake_spotdl.py.
+Put benchmarks/fakes on sys.path ahead of any real spotdl to use it.
+
+Environment: the FAKE_SPOTDL_* variables of fake_spotdl.py. STARTUP is paid
+once per worker process, when its Downloader is built.
+"""
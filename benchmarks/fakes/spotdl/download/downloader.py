@@ -0,0 +1,24 @@
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from fake_spotdl import FAIL, PER_SONG, SIZE, STARTUP, id3_with_woas
+
+
+class Downloader:
+    def __init__(self, settings=None):
+        self.settings = dict(settings or {})
+        time.sleep(STARTUP)
+
+    def search_and_download(self, song):
+        time.sleep(PER_SONG)
+        if song.song_id in FAIL:
+            raise LookupError(f'No results found for song: {song.url}')
+        path = Path(os.path.dirname(self.settings['output'])) / f'Artist - Song {song.song_id}.mp3'
+        if not path.exists():
+            with open(path, 'wb') as f:
+                f.write(id3_with_woas(song.url))
+                f.write(b'\x00' * SIZE)
+        return song, path
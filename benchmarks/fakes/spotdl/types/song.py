@@ -0,0 +1,11 @@
+from types import SimpleNamespace
+
+
+class Song(SimpleNamespace):
+    @classmethod
+    def from_missing_data(cls, **kwargs):
+        return cls(**kwargs)
+
+    @classmethod
+    def from_url(cls, url):
+        return cls(url=url, song_id=url.rstrip('/').split('/')[-1].split('?')[0])
@@ -0,0 +1 @@
+DEFAULT_CONFIG = {'client_id': 'fake-client-id', 'client_secret': 'fake-client-secret'}
@@ -0,0 +1,4 @@
+class SpotifyClient:
+    @classmethod
+    def init(cls, client_id, client_secret, user_auth=False, **kwargs):
+        return cls()
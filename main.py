@@ -1,14 +1,36 @@
 import os
 import sys
+import json
+import contextlib
+import time
+import signal
+import argparse
 from src.config_manager import load_config
 from src.spotify_handler import SpotifyHandler
-from src import apple_music
-from src.utils import log_info, log_success, log_error, log_warning, ask_user, ensure_dir
+from src import apple_music, metrics
+from src.sync_state import SyncState, DEFAULT_PATH, file_entry
+from src.audio_tags import track_id_from_url
+from src.tracks import Track
+from src.presence_index import index_local_tracks
+from src.downloader import DownloadScheduler
+from src.audio_store import AudioStore
+from src.importer import PlaylistImporter, SettingsError
+from src.scanner import DirectoryScanner, AUDIO_EXTS
+from src.journal import RunJournal
+from src.daemon import PollSchedule, FolderWatcher
+from src.diagnose_playlists import diagnose
+from src.utils import log_info, log_success, log_error, log_warning, ask_user, ensure_dir, answer_automatically
 
-AUDIO_EXTS = {'.mp3', '.m4a', '.opus', '.flac'}
+DEFAULT_STORE_DIR = "~/Music/Spotify/.store"
 
-def scan_directory_for_audio(directory):
-    """Returns a list of absolute paths to audio files in the directory."""
+@metrics.timed('scan')
+def scan_directory_for_audio(directory, state=None):
+    """
+    Returns a list of absolute paths to audio files in the directory. With a
+    sync state, only the subdirectories that changed since the last scan are read.
+    """
+    if state is not None:
+        return DirectoryScanner(state).scan(directory)
     audio_files = []
     for root, _, files in os.walk(directory):
         for file in files:
@@ -16,174 +38,369 @@ def scan_directory_for_audio(directory):
                 audio_files.append(os.path.abspath(os.path.join(root, file)))
     return audio_files
 
-def process_playlist(job, spotify_handler, global_limit):
-    name = job['name']
-    local_dir = ensure_dir(job['local_dir'])
+def fetch_liked_songs(job, spotify_handler, state, limit, full, reconcile_days):
+    """
+    Liked Songs has no snapshot_id, but Spotify returns it newest first. Between
+    full reconciliation passes we only page back to the newest song we already
+    synced. Returns (tracks, new_cursor); the cursor is saved once the job completes.
+    """
     apple_pl_name = job['apple_playlist_name']
-    
-    print("\n" + "="*60)
-    log_info(f"Processing: {name}")
-    print("="*60)
+    cursor = state.get_liked_cursor(apple_pl_name)
+    now = time.time()
+
+    if not full and cursor is not None and now - cursor['reconciled_at'] < reconcile_days * 86400:
+        tracks = spotify_handler.fetch_saved_tracks(limit=limit, since=(cursor['added_at'], cursor['track_id']))
+        log_info(f"{len(tracks)} new Liked Songs since the last sync.")
+        new_cursor = (tracks[0].added_at, tracks[0].spotify_id, None) if tracks else None
+        # The songs that failed last time are older than the cursor, so they are added back by hand
+        fetched = {track.spotify_id for track in tracks}
+        tracks += [Track(spotify_id) for spotify_id in state.get_retry_tracks(apple_pl_name) if spotify_id not in fetched]
+        return tracks, new_cursor
+
+    # Full pass: read the whole library so we can spot songs that were un-liked.
+    log_info("Reconciling the full Liked Songs library...")
+    tracks = spotify_handler.fetch_saved_tracks()
+    liked = {track.spotify_id for track in tracks}
+    gone = [
+        row['path'] for row in state.get_tracks(apple_pl_name).values()
+        if row['spotify_id'] and row['spotify_id'] not in liked
+    ]
+    if gone:
+        log_warning(f"{len(gone)} local songs are no longer in your Spotify Liked Songs:")
+        for path in gone:
+            log_warning(f"   {os.path.basename(path)}")
+
+    new_cursor = (tracks[0].added_at, tracks[0].spotify_id, now) if tracks else None
+    return (tracks if limit is None else tracks[:limit]), new_cursor
+
+def mark_synced(state, apple_pl_name, local_dir, snapshot_id, liked_cursor, retry=None):
+    """
+    Records a completed sync so the next run can skip what hasn't changed.
+    retry is the Spotify IDs of the songs that failed; the next run fetches
+    only what is new and downloads those again.
+    """
+    state.touch_playlist(apple_pl_name, local_dir, snapshot_id)
+    if liked_cursor:
+        state.set_liked_cursor(apple_pl_name, *liked_cursor)
+    if retry is not None:
+        state.set_retry_tracks(apple_pl_name, retry)
+
+def fetch_job_tracks(job, spotify_handler, global_limit, state, local_dir, force=False, reconcile_days=7):
+    """
+    Checks, prompts and the Spotify fetch for one job. Returns (tracks,
+    snapshot_id, liked_cursor), or None if there is nothing to do. tracks is a
+    list of Track records.
+    """
+    apple_pl_name = job['apple_playlist_name']
+
+    # 0. Nothing to do if the Spotify playlist hasn't changed since our last complete sync
+    snapshot_id = spotify_handler.get_snapshot_id(job)
+    if snapshot_id and not force and snapshot_id == state.get_snapshot_id(apple_pl_name):
+        retry = state.get_retry_tracks(apple_pl_name)
+        if retry:
+            log_info(f"Spotify playlist unchanged since the last sync. Retrying the {len(retry)} songs that failed.")
+            return [Track(spotify_id) for spotify_id in retry], snapshot_id, None
+        log_success("Spotify playlist unchanged since the last sync. Skipping (use --force to sync anyway).")
+        return None
 
     # 1. Check Apple Music Playlist State
     if not apple_music.playlist_exists(apple_pl_name):
         log_warning(f"Apple Music playlist '{apple_pl_name}' does not exist.")
-        if ask_user("Create this playlist in Apple Music?"):
+        if ask_user("Create this playlist in Apple Music?", key='create_playlist'):
             if apple_music.create_playlist(apple_pl_name):
                 log_success(f"Created playlist '{apple_pl_name}'")
             else:
                 log_error("Failed to create playlist. Skipping this job.")
-                return
+                return None
         else:
             log_warning("Skipping job because target playlist is missing.")
-            return
+            return None
 
     # 2. Determine Download Mode (Fresh vs Update)
-    is_empty = len(os.listdir(local_dir)) == 0
+    is_empty = not scan_directory_for_audio(local_dir, state)
     download_limit = job.get('sync_limit', global_limit)
     
     if is_empty:
         log_info("Local directory is empty.")
-        if ask_user("Attempt to download ALL songs from this Spotify playlist? (No = use limit)"):
+        if ask_user("Attempt to download ALL songs from this Spotify playlist? (No = use limit)", key='download_all'):
             download_limit = None # No limit
             log_info("Preparing to download entire playlist...")
 
     # 3. Fetch URLs from Spotify
     log_info("Fetching track list from Spotify...")
-    track_urls = spotify_handler.get_tracks(job, limit=download_limit)
+    liked_cursor = None
+    with metrics.span('spotify_fetch', job['name']):
+        if job['type'] == 'saved_tracks':
+            tracks, liked_cursor = fetch_liked_songs(
+                job, spotify_handler, state, download_limit, force or is_empty, reconcile_days
+            )
+        else:
+            tracks = spotify_handler.get_tracks(job, limit=download_limit)
+    if job['type'] == 'saved_tracks' and not tracks and state.get_liked_cursor(apple_pl_name):
+        mark_synced(state, apple_pl_name, local_dir, snapshot_id, liked_cursor)
+        log_success("No new Liked Songs. Nothing to do.")
+        return None
     
-    if not track_urls:
+    if not tracks:
         log_warning("No tracks found in Spotify source.")
-        return
+        return None
 
-    # 4. Download (SpotDL handles skipping existing files)
-    spotify_handler.download_tracks(track_urls, local_dir)
+    return tracks, snapshot_id, liked_cursor
 
-    # 5. Sync to Apple Music
-    log_info("Syncing local files to Apple Music...")
-    
-    # Get what is currently on disk
-    local_files = scan_directory_for_audio(local_dir)
-    
-    # Get what is currently in Apple Music
-    existing_tracks = apple_music.get_existing_tracks(apple_pl_name)
-    
-    # Create lookup sets for fast matching
-    existing_paths = {t['path'] for t in existing_tracks if t['path']}
+def prepare_playlist(job, spotify_handler, global_limit, state, downloads, store, force=False, reconcile_days=7,
+                     journal=None):
+    """
+    Everything up to the download: checks, prompts and the Spotify fetch. Missing
+    songs are queued on the shared download scheduler and the job context is
+    returned for import_playlist(), or None if there is nothing left to do.
+    """
+    name = job['name']
+    local_dir = ensure_dir(job['local_dir'])
+    apple_pl_name = job['apple_playlist_name']
+    journal = journal or RunJournal(None)
     
-    # Determine diff
-    files_to_add = []
-    for f in local_files:
-        # Strict File Path Check
-        if os.path.normcase(f) in existing_paths:
-            continue
-            
-        files_to_add.append(f)
+    print("\n" + "="*60)
+    log_info(f"Processing: {name}")
+    print("="*60)
 
-    if files_to_add:
-        log_info(f"Found {len(files_to_add)} songs to add to Apple Music.")
-        
-        # --- SETTING CHECK START ---
-        # We use the first file to verify the "Copy files" setting
-        first_file = files_to_add[0]
-        remaining_files = files_to_add[1:]
-        
-        log_info(f"Adding first file to verify settings: {os.path.basename(first_file)}")
-        if apple_music.add_files_to_playlist([first_file], apple_pl_name, delay=2.0) == 1:
-            # Verify path immediately
-            import time
-            # Give it a moment to update
-            time.sleep(1.0) 
-            
-            updated_tracks = apple_music.get_existing_tracks(apple_pl_name)
-            
-            # Find the track we just added
-            added_track = None
-            for t in updated_tracks:
-                # We can't rely on path being correct yet, so we have to look for name/artist match 
-                # OR just look for the path if it WAS copied (which is what we want to detect)
-                # But wait, if it was copied, the path will be different.
-                # If it wasn't copied, the path will be the same.
-                # So we just look for a track with the SAME path.
-                if t['path'] and os.path.normcase(t['path']) == os.path.normcase(first_file):
-                    added_track = t
-                    break
-            
-            if not added_track:
-                # If we can't find the track with the exact path, it might have been copied.
-                # Let's try to find it by metadata to confirm it was added but has wrong path.
-                # This is tricky because metadata might not match exactly what we expect from filename.
-                # But if we just added it, it should be there.
-                
-                # Let's check if ANY track has the wrong path (i.e. inside Music Media folder)
-                # This is hard to generalize.
-                
-                # Simpler check: If we added it, and it's not in our 'existing_paths' (which we updated?),
-                # actually we need to re-fetch.
-                
-                # Let's look for the file we just added.
-                # If we can't find it by path, then the setting is likely ON.
-                log_error("CRITICAL: Added file not found by path in Apple Music.")
-                log_error(f"Expected Path: {first_file}")
-                log_error(f"Normalized Expected: {os.path.normcase(first_file)}")
-                
-                log_info("Dumping found tracks in Apple Music for debugging:")
-                for t in updated_tracks:
-                    log_info(f" - Name: {t['name']}")
-                    log_info(f"   Artist: {t['artist']}")
-                    log_info(f"   Path: {t['path']}")
-                    log_info(f"   Raw Location: {t.get('raw_location', 'N/A')}")
-                    if t['path']:
-                        log_info(f"   Normalized Path: {os.path.normcase(t['path'])}")
-                        
-                log_error("This likely means 'Copy files to Music Media folder' is ON.")
-                log_error("Please UNCHECK 'Copy files to Music Media folder when adding to library' in Music > Settings > Files.")
-                
-                # Try to clean up if possible? Hard to know which track it is if path doesn't match.
-                return
-            else:
-                log_success("Settings verified: File added with correct path.")
-                
-        else:
-            log_error("Failed to add the first file. Aborting sync.")
-            return
-            
-        # --- SETTING CHECK END ---
+    if journal.is_done(apple_pl_name):
+        log_success("Already finished before the last run was interrupted. Skipping.")
+        return None
 
-        if remaining_files:
-            log_info(f"Adding remaining {len(remaining_files)} songs...")
-            count = apple_music.add_files_to_playlist(remaining_files, apple_pl_name, delay=2.0)
-            log_success(f"Successfully added {count + 1} songs to '{apple_pl_name}'.") # +1 for the first one
-        else:
-            log_success(f"Successfully added 1 song to '{apple_pl_name}'.")
-            
+    resumed = journal.resume_data(apple_pl_name)
+    if resumed is not None:
+        # The interrupted run already got this far; don't ask Spotify (or the user) again
+        tracks = [track for track in map(Track.from_url, resumed['track_urls']) if track]
+        snapshot_id = resumed['snapshot_id']
+        liked_cursor = tuple(resumed['liked_cursor']) if resumed['liked_cursor'] else None
+        log_info(f"Resuming with the {len(tracks)} tracks fetched by the interrupted run.")
     else:
-        log_success("Apple Music playlist is already up to date with local files.")
+        fetched = fetch_job_tracks(job, spotify_handler, global_limit, state, local_dir, force, reconcile_days)
+        if fetched is None:
+            journal.done(apple_pl_name)
+            return None
+        tracks, snapshot_id, liked_cursor = fetched
+        journal.fetched(apple_pl_name, track_urls=[track.url for track in tracks],
+                        snapshot_id=snapshot_id, liked_cursor=liked_cursor)
 
-def main():
-    # Load Config
-    config = load_config()
-    sp_config = config['spotify']
-    playlists = config.get('playlists', [])
-    default_limit = config.get('sync_limit_default', 50)
-    sync_all_playlists = config.get('sync_all_playlists', False)
+    # 4. Download only what isn't on disk yet. SpotDL would skip those files too,
+    # but only after looking each one up again.
+    # Both sides hold interned IDs, so this is a plain set difference (kept in playlist order).
+    present = index_local_tracks(scan_directory_for_audio(local_dir, state), local_dir, state)
+    missing = [track for track in tracks if track.spotify_id not in present]
+    if len(missing) < len(tracks):
+        log_info(f"{len(tracks) - len(missing)} songs are already downloaded.")
 
-    # Check Apple Music Settings First
-    # Use a temp directory for the check
-    import tempfile
-    # We can skip the temp dir check here since we do it inline now, 
-    # but let's keep the imports if needed later.
-    pass
+    # 5. Songs another playlist already has are linked in rather than downloaded
+    # again. Ones another playlist queued this run get linked once they land.
+    to_download = []
+    # Only the songs we download keep their SpotDL metadata past this point
+    metadata = {}
+    link_later = []
+    linked = 0
+    download_dir = store.download_dir(local_dir)
+    via_store = download_dir != local_dir
+    for track in missing:
+        track_id = track.spotify_id
+        if store.link_into(track_id, local_dir):
+            linked += 1
+        else:
+            claimed = store.claim(track_id)
+            if claimed:
+                to_download.append(track.url)
+                if track.metadata:
+                    metadata[track_id] = track.metadata
+            # Through the store, even our own downloads land outside the playlist folder
+            if via_store or not claimed:
+                link_later.append(track_id)
+    if linked:
+        log_info(f"Linked {linked} songs that were already downloaded for another playlist.")
 
-    # Initialize Spotify
+    return {
+        'job': job,
+        'local_dir': local_dir,
+        'apple_pl_name': apple_pl_name,
+        'snapshot_id': snapshot_id,
+        'liked_cursor': liked_cursor,
+        'store': store,
+        'journal': journal,
+        'link_later': link_later,
+        'via_store': via_store,
+        # Runs in the background while the other jobs are prepared.
+        'download': downloads.submit(name, to_download, download_dir, metadata or None),
+    }
+
+def import_playlist(ctx, state, library=None):
+    """
+    Brings Apple Music in line with the job's folder while SpotDL is still
+    working: what is already on disk goes in first, then each batch of new
+    songs as soon as it is downloaded.
+    """
+    job = ctx['job']
+    local_dir = ctx['local_dir']
+    apple_pl_name = ctx['apple_pl_name']
+    snapshot_id = ctx['snapshot_id']
+    liked_cursor = ctx['liked_cursor']
+    download = ctx['download']
+    store = ctx['store']
+    via_store = ctx['via_store']
+    journal = ctx['journal']
+
+    print("\n" + "="*60)
+    log_info(f"Importing: {job['name']}")
+    print("="*60)
+
+    importer = PlaylistImporter(apple_pl_name, state, library)
+    streamed = set()
     try:
-        handler = SpotifyHandler(sp_config)
-    except Exception as e:
-        log_error(f"Failed to initialize Spotify Client: {e}")
+        # 6. Sync what is already on disk to Apple Music
+        log_info("Syncing local files to Apple Music...")
+        local_files = scan_directory_for_audio(local_dir, state)
+        path_ids = {path: spotify_id for spotify_id, path in index_local_tracks(local_files, local_dir, state).items()}
+        # Files the last run recorded that have since disappeared
+        importer.forget_missing(set(local_files))
+        importer.import_files(local_files, path_ids)
+
+        # 7. Then every batch as soon as SpotDL finishes it
+        if download.chunks:
+            log_info("Importing new songs as SpotDL finishes them...")
+        for result in download.completed():
+            new_files = {}
+            for track_id, path in result['files'].items():
+                if via_store:
+                    path = store.link_into(track_id, local_dir, source=path)
+                if path:
+                    new_files[path] = track_id
+                    streamed.add(track_id)
+            if not via_store and new_files:
+                state.record_file_ids([{**file_entry(path), 'spotify_id': track_id} for path, track_id in new_files.items()])
+            importer.import_files(list(new_files), new_files)
+            journal.progress(apple_pl_name, 'downloading', download.consumed, len(download.chunks))
+    except SettingsError as e:
+        log_error(str(e))
+        download.cancel()
+        return
+    except BaseException:
+        download.cancel()
+        raise
+
+    # Songs another playlist downloaded for us
+    failed = download.failed_urls
+    failed_ids = {track_id_from_url(url) for url in failed}
+    link_later = [t for t in ctx['link_later'] if t not in failed_ids and t not in streamed]
+    unlinked = []
+    if link_later:
+        store.refresh()
+        unlinked = store.link_missing(link_later, local_dir)
+
+    # The snapshot and cursor are saved regardless; only these songs are tried again
+    retry = failed_ids | set(unlinked)
+    if retry:
+        log_warning(f"{len(retry)} songs could not be downloaded. They will be retried next run.")
+    elif download.chunks:
+        log_success(f"All {sum(len(c) for c in download.chunks)} new songs downloaded.")
+
+    # 8. One last pass picks up whatever couldn't be followed as it landed:
+    # songs linked just now, or everything if mutagen isn't there to read tags.
+    local_files = scan_directory_for_audio(local_dir, state)
+    path_ids = {path: spotify_id for spotify_id, path in index_local_tracks(local_files, local_dir, state).items()}
+    journal.progress(apple_pl_name, 'importing', importer.added, len(local_files))
+    try:
+        importer.import_files(local_files, path_ids)
+    except SettingsError as e:
+        log_error(str(e))
         return
 
+    if importer.added:
+        log_success(f"Successfully added {importer.added} songs to '{apple_pl_name}'.")
+    else:
+        log_success("Apple Music playlist is already up to date with local files.")
+    mark_synced(state, apple_pl_name, local_dir, snapshot_id, liked_cursor, retry)
+    journal.done(apple_pl_name)
+
+def process_playlist(job, spotify_handler, global_limit, state, force=False, reconcile_days=7,
+                     downloads=None, store=None, library=None):
+    """Runs one job start to finish."""
+    own_scheduler = downloads is None
+    if own_scheduler:
+        downloads = DownloadScheduler()
+    if store is None:
+        store = AudioStore(None, state)
+    try:
+        with metrics.span('prepare', job['name']):
+            ctx = prepare_playlist(job, spotify_handler, global_limit, state, downloads, store, force, reconcile_days)
+        if ctx:
+            with metrics.span('import', job['name']):
+                import_playlist(ctx, state, library)
+    finally:
+        if own_scheduler:
+            downloads.shutdown()
+
+def order_jobs(playlists, state):
+    """
+    Cheapest, most likely changed jobs first, so a run that gets cut short has
+    still finished as many playlists as it could. Playlists whose snapshot
+    matches the last sync are probably no-ops and go last; within each group
+    smaller playlists come first. Ties keep the settings.yaml order.
+    """
+    def cost(job):
+        snapshot_id = job.get('snapshot_id')
+        unchanged = bool(snapshot_id) and snapshot_id == state.get_snapshot_id(job['apple_playlist_name'])
+        size = job.get('track_count')
+        if size is None:
+            size = state.count_tracks(job['apple_playlist_name'])
+        return (unchanged, size)
+    return sorted(playlists, key=cost)
+
+def import_folder(job, state, library):
+    """Imports files that turned up in a job's folder outside of a sync (copied in by hand, say)."""
+    local_dir = os.path.expanduser(job['local_dir'])
+    apple_pl_name = job['apple_playlist_name']
+    importer = PlaylistImporter(apple_pl_name, state, library)
+    with metrics.span('folder_import', job['name']):
+        local_files = scan_directory_for_audio(local_dir, state)
+        path_ids = {path: spotify_id for spotify_id, path in index_local_tracks(local_files, local_dir, state).items()}
+        importer.forget_missing(set(local_files))
+        importer.import_files(local_files, path_ids)
+    if importer.added:
+        log_success(f"Added {importer.added} new files from '{local_dir}' to '{apple_pl_name}'.")
+
+def rebuild_state(job, state, library):
+    """Reconstructs a job's sync state from the files on disk and the Music library index."""
+    local_dir = os.path.expanduser(job['local_dir'])
+    apple_pl_name = job['apple_playlist_name']
+    log_info(f"Rebuilding state for: {job['name']}")
+
+    local_files = scan_directory_for_audio(local_dir, state) if os.path.isdir(local_dir) else []
+    path_ids = {path: spotify_id for spotify_id, path in index_local_tracks(local_files, local_dir, state).items()}
+    in_playlist = library.playlist_ids(apple_pl_name)
+    # Songs shared with other playlists may point at another folder's file
+    known_ids = state.find_apple_ids(set(path_ids.values()))
+
+    def apple_id_for(f):
+        persistent_id = library.lookup(f)
+        if persistent_id not in in_playlist:
+            persistent_id = known_ids.get(path_ids.get(f))
+        return persistent_id if persistent_id in in_playlist else None
+
+    entries = [
+        file_entry(f, apple_id=apple_id_for(f), spotify_id=path_ids.get(f))
+        for f in local_files
+    ]
+    state.clear_playlist(apple_pl_name)
+    state.record_tracks(apple_pl_name, entries)
+    state.touch_playlist(apple_pl_name, local_dir)
+
+    in_apple = sum(1 for e in entries if e['apple_id'])
+    log_success(f"Recorded {len(entries)} local files ({in_apple} already in Apple Music).")
+
+def build_jobs(config, handler):
+    """The jobs from settings.yaml, plus one per Spotify playlist if sync_all_playlists is on."""
+    playlists = list(config.get('playlists') or [])
+    default_limit = config.get('sync_limit_default', 50)
+
     # Handle "Sync All Playlists"
-    if sync_all_playlists:
+    if config.get('sync_all_playlists', False):
         log_info("Sync All Playlists is ENABLED. Fetching all user playlists...")
         user_playlists = handler.get_all_user_playlists()
         log_info(f"Found {len(user_playlists)} playlists on Spotify.")
@@ -199,23 +416,253 @@ def main():
                 'spotify_playlist_url': pl['spotify_playlist_url'],
                 'local_dir': os.path.expanduser(f"~/Music/Spotify/{safe_name}"),
                 'apple_playlist_name': pl['name'],
-                'sync_limit': default_limit
+                'sync_limit': default_limit,
+                'snapshot_id': pl['snapshot_id'],
+                'track_count': pl['track_count'],
             }
             playlists.append(job)
+    return playlists
+
+def run_jobs(jobs, handler, state, downloads, store, library, journal, default_limit, force=False, reconcile_days=7):
+    """
+    Every job is prepared first so its downloads can start on the shared SpotDL
+    workers, then each one is imported in order, batch by batch as its
+    downloads land. Returns how many jobs failed.
+    """
+    prepared = []
+    errors = 0
+    for job in order_jobs(jobs, state):
+        try:
+            with metrics.span('prepare', job['name']):
+                ctx = prepare_playlist(job, handler, default_limit, state, downloads, store,
+                                       force=force, reconcile_days=reconcile_days, journal=journal)
+            if ctx:
+                prepared.append(ctx)
+        except Exception as e:
+            errors += 1
+            log_error(f"Critical error processing '{job['name']}': {e}")
+
+    for ctx in prepared:
+        try:
+            with metrics.span('import', ctx['job']['name']):
+                import_playlist(ctx, state, library)
+        except Exception as e:
+            errors += 1
+            log_error(f"Critical error processing '{ctx['job']['name']}': {e}")
+    return errors
+
+def run_daemon(playlists, config, handler, state, downloads, store, library, default_limit, reconcile_days=7):
+    """
+    Keeps running with everything warm: each playlist is polled on its own
+    schedule (`poll_minutes` on the job, or daemon.poll_minutes), and files
+    that appear in a playlist folder are imported straight away. Prompts are
+    answered from daemon.answers. Stop it with Ctrl-C or SIGTERM.
+    """
+    daemon_config = config.get('daemon') or {}
+    # Keys left out of daemon.answers keep the daemon's defaults, not the prompts' own
+    answer_automatically({'create_playlist': True, 'download_all': False, **(daemon_config.get('answers') or {})})
+    schedule = PollSchedule(daemon_config.get('poll_minutes', 30), daemon_config.get('jitter', 0.1))
+    watcher = FolderWatcher(state, poll_seconds=daemon_config.get('folder_poll_seconds', 30))
+    library_refresh = daemon_config.get('library_refresh_hours', 6) * 3600
+    library_loaded = time.time()
+
+    jobs = {}
+    for job in playlists:
+        jobs[job['apple_playlist_name']] = job
+        schedule.add(job['apple_playlist_name'], job.get('poll_minutes'))
+        watcher.watch(job['local_dir'])
+    # Snapshots from a playlist listing are only trusted right after it was read
+    listed = True
+
+    # With sync_all_playlists the job list itself is re-read on the default schedule
+    LISTING = object()
+    if config.get('sync_all_playlists', False):
+        schedule.add(LISTING, delay=schedule.minutes * 60)
+
+    log_info(f"Daemon started. Checking Spotify every {schedule.minutes} minutes (Ctrl-C to stop).")
+    try:
+        while True:
+            due = schedule.due()
+            if LISTING in due:
+                try:
+                    listing = {job['apple_playlist_name']: job for job in build_jobs(config, handler)}
+                except Exception as e:
+                    log_error(f"Failed to list Spotify playlists: {e}")
+                    listing = jobs
+                for name in jobs.keys() - listing.keys():
+                    schedule.remove(name)
+                for name, job in listing.items():
+                    if name not in jobs:
+                        schedule.add(name, job.get('poll_minutes'))
+                        watcher.watch(job['local_dir'])
+                jobs = listing
+                listed = True
+                due = schedule.due()
+
+            batch = []
+            for name in due:
+                if name in jobs:
+                    job = dict(jobs[name])
+                    if not listed:
+                        # The listing's snapshot is stale by now; ask for the playlist's own
+                        job.pop('snapshot_id', None)
+                    batch.append(job)
+            listed = False
 
-    if not playlists:
+            if batch:
+                store.start_run()
+                full = time.time() - library_loaded >= library_refresh
+                library.refresh(full=full)
+                if full:
+                    library_loaded = time.time()
+                with metrics.span('sync_cycle'):
+                    errors = run_jobs(batch, handler, state, downloads, store, library, RunJournal(None),
+                                      default_limit, reconcile_days=reconcile_days)
+                metrics.write()
+                log_info(f"Synced {len(batch) - errors} of {len(batch)} playlists. "
+                         f"Next check in {schedule.next_in() / 60:.0f} minutes.")
+
+            timeout = schedule.next_in()
+            changed = watcher.wait(60 if timeout is None else timeout)
+            for folder in changed:
+                for job in jobs.values():
+                    if os.path.abspath(os.path.expanduser(job['local_dir'])) == folder:
+                        try:
+                            import_folder(job, state, library)
+                        except Exception as e:
+                            log_error(f"Failed to import new files for '{job['name']}': {e}")
+            if changed:
+                metrics.write()
+    except KeyboardInterrupt:
+        log_info("Stopping the daemon.")
+    finally:
+        watcher.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Sync Spotify playlists to Apple Music.")
+    parser.add_argument('command', nargs='?', default='sync', choices=['sync', 'rebuild', 'daemon', 'diagnose'],
+                        help="'sync' (default) runs the jobs once; 'daemon' keeps syncing on a schedule; "
+                             "'rebuild' reconstructs the local sync state; 'diagnose' prints a JSON report "
+                             "comparing Music, the sync state and the local folders")
+    parser.add_argument('--force', action='store_true',
+                        help="Sync every playlist, even ones Spotify reports as unchanged")
+    parser.add_argument('--restart', action='store_true',
+                        help="Start over instead of resuming a run that was interrupted")
+    args = parser.parse_args()
+
+    if args.command == 'diagnose':
+        # stdout is kept for the JSON report alone. Everything logged on the way,
+        # from loading the config to listing playlists, goes to stderr.
+        report_out = sys.stdout
+        with contextlib.redirect_stdout(sys.stderr):
+            run(args, report_out)
+    else:
+        run(args)
+
+def run(args, report_out=None):
+    """Runs one command (see main()). diagnose writes its report to report_out."""
+    # Load Config
+    config = load_config()
+    sp_config = config['spotify']
+    default_limit = config.get('sync_limit_default', 50)
+    reconcile_days = config.get('liked_songs_reconcile_days', 7)
+    apple_music.configure(config.get('apple_music'))
+    metrics.configure(config.get('metrics'))
+
+    # Check Apple Music Settings First
+    # Use a temp directory for the check
+    import tempfile
+    # We can skip the temp dir check here since we do it inline now, 
+    # but let's keep the imports if needed later.
+    pass
+
+    # Initialize Spotify
+    try:
+        handler = SpotifyHandler(sp_config)
+    except Exception as e:
+        log_error(f"Failed to initialize Spotify Client: {e}")
+        return
+
+    playlists = build_jobs(config, handler)
+
+    # The daemon may find playlists later; diagnose still covers everything in the sync state
+    listing_later = args.command == 'daemon' and config.get('sync_all_playlists', False)
+    if not playlists and not listing_later and args.command != 'diagnose':
         log_warning("No playlists defined in settings.yaml and sync_all_playlists is False.")
         return
 
-    # Run Jobs
-    for job in playlists:
+    state = SyncState(config.get('state_path', DEFAULT_PATH))
+
+    # Where every file in the Music library is, read once and shared by all jobs
+    library = apple_music.LibraryIndex()
+
+    if args.command == 'rebuild':
         try:
-            process_playlist(job, handler, default_limit)
-        except Exception as e:
-            log_error(f"Critical error processing '{job['name']}': {e}")
+            for job in playlists:
+                rebuild_state(job, state, library)
+        except apple_music.MusicError as e:
+            log_error(str(e))
+            sys.exit(1)
+        return
+
+    if args.command == 'diagnose':
+        try:
+            report = diagnose(state, playlists, library)
+        except apple_music.MusicError as e:
+            log_error(str(e))
+            report = None
+        if report is None:
+            sys.exit(1)
+        json.dump(report, report_out, indent=2)
+        report_out.write('\n')
+        return
+
+    dl_config = config.get('downloads') or {}
+    downloads = DownloadScheduler(
+        workers=dl_config.get('workers', 2),
+        chunk_size=dl_config.get('chunk_size', 20),
+        max_bandwidth=dl_config.get('max_bandwidth'),
+        queue_size=dl_config.get('queue_size', 8),
+        backend=dl_config.get('backend', 'library'),
+        client_id=sp_config.get('client_id'),
+        client_secret=sp_config.get('client_secret'),
+    )
+    if downloads.library is not None:
+        # In-process SpotDL downloads with the track details we fetch anyway
+        handler.keep_track_metadata()
+    # Songs shared between playlists are downloaded once into the store and linked
+    store = AudioStore(config.get('store_dir', DEFAULT_STORE_DIR), state)
+    if args.command == 'daemon':
+        # Stop cleanly (finishing the current write) when launchd/systemd stops us
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            run_daemon(playlists, config, handler, state, downloads, store, library, default_limit, reconcile_days)
+        finally:
+            downloads.shutdown()
+        return
+
+    # Picks up where an interrupted run stopped
+    journal = RunJournal(state, resume=not args.restart, max_age_hours=config.get('resume_hours', 12))
+    try:
+        with metrics.span('run'):
+            errors = run_jobs(playlists, handler, state, downloads, store, library, journal, default_limit,
+                              force=args.force, reconcile_days=reconcile_days)
+    finally:
+        downloads.shutdown()
+        # Even a failed or interrupted run is worth a report
+        for path in metrics.write():
+            log_info(f"Metrics written to {path}")
+
+    # Only an interrupted run is resumed; failed jobs are simply synced again next time
+    journal.finish()
+    if errors:
+        log_warning(f"{errors} jobs failed. They will be synced again next run.")
 
     print("\n" + "="*60)
     log_success("All sync jobs completed.")
+    stats = handler.api_stats()
+    log_info(f"Spotify API: {stats['requests']} requests, {stats['throttled']} rate-limited, "
+             f"{stats['wait_seconds']}s spent waiting.")
     print("="*60)
 
 if __name__ == "__main__":
@@ -1,142 +1,740 @@
 import subprocess
+import hashlib
+import atexit
+import json
 import os
+import threading
+import time
+from . import metrics
+from .tracks import Track, intern_id
 from .utils import log_warning, log_error, log_info
 
-def run_applescript(script):
-    """Executes raw AppleScript."""
-    try:
-        result = subprocess.run(
-            ['osascript', '-e', script],
-            capture_output=True, text=True, check=True
-        )
-        return True, result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        return False, e.stderr
+# Lets the benchmarks point us at a stand-in osascript on Linux.
+OSASCRIPT = os.environ.get('OSASCRIPT', 'osascript')
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'applescript_worker.js')
+
+# Separators used in script output. Neither can appear in a file path or a track title.
+FIELD_SEP = '\x1f'
+RECORD_SEP = '\x1e'
+GROUP_SEP = '\x1d'
+
+# Tunables from the `apple_music` section of settings.yaml
+settings = {
+    'add_batch_size': 25,
+    'max_add_batch_size': 200,
+    # 'worker' keeps one scripting process alive for the whole run,
+    # 'osascript' starts a new process for every call.
+    'backend': 'worker',
+    'worker_command': None,
+    # How long a passed "Copy files to Music Media folder" check is trusted, per library
+    'settings_check_hours': 24,
+    # Dump the whole playlist when that check fails
+    'debug_dump': False,
+}
+
+def configure(overrides):
+    """Applies the `apple_music` section of the config."""
+    settings.update(overrides or {})
+    set_backend(None)
+
+# Every command we send to Music lives in this one script. A call is a command
+# name plus string arguments, so the worker only has to compile it once.
+HANDLERS = '''
+on run argv
+    return dispatch(argv)
+end run
+
+on dispatch(argv)
+    set cmd to item 1 of argv
+    set args to rest of argv
+    if cmd is "playlist_exists" then return playlist_exists(item 1 of args)
+    if cmd is "create_playlist" then return create_playlist(item 1 of args)
+    if cmd is "delete_playlist" then return delete_playlist(item 1 of args)
+    if cmd is "add_files" then return add_files(item 1 of args, rest of args)
+    if cmd is "add_tracks_by_id" then return add_tracks_by_id(item 1 of args, rest of args)
+    if cmd is "fetch_tracks" then return fetch_tracks(item 1 of args)
+    if cmd is "fetch_library" then return fetch_library()
+    if cmd is "playlist_ids" then return playlist_ids(item 1 of args)
+    if cmd is "track_location" then return track_location(item 1 of args)
+    if cmd is "library_id" then return library_id()
+    if cmd is "playlist_summary" then return playlist_summary(args)
+    error "Unknown command: " & cmd
+end dispatch
+
+on playlist_exists(plName)
+    tell application "Music" to return (exists user playlist plName) as text
+end playlist_exists
+
+on create_playlist(plName)
+    tell application "Music" to make new user playlist with properties {name:plName}
+    return ""
+end create_playlist
+
+on delete_playlist(plName)
+    tell application "Music" to delete user playlist plName
+    return ""
+end delete_playlist
+
+-- Adds the files in a single `add` call. Returns one "path<US>persistent ID"
+-- record per track that landed in the playlist. If Music rejects the list or
+-- times out, the error is passed on: Music may have added some of the files
+-- already, so add_files_batched looks those up before retrying the rest.
+on add_files(plName, paths)
+    set fileList to {}
+    repeat with p in paths
+        set end of fileList to (POSIX file (contents of p))
+    end repeat
+    set US to character id 31
+    set RS to character id 30
+    set outputList to {}
+    tell application "Music"
+        set pl to user playlist plName
+        set addedTracks to add fileList to pl
+        if class of addedTracks is not list then set addedTracks to {addedTracks}
+        repeat with t in addedTracks
+            try
+                set end of outputList to (POSIX path of (location of t)) & US & (persistent ID of t)
+            end try
+        end repeat
+    end tell
+    set AppleScript's text item delimiters to RS
+    return outputList as text
+end add_files
+
+-- Puts tracks that are already in the library into the playlist by persistent
+-- ID, so their files aren't imported a second time. Returns the IDs that made
+-- it, separated by RS.
+on add_tracks_by_id(plName, ids)
+    set RS to character id 30
+    set outputList to {}
+    tell application "Music"
+        set pl to user playlist plName
+        repeat with pid in ids
+            try
+                duplicate (first track of library playlist 1 whose persistent ID is (contents of pid)) to pl
+                set end of outputList to (contents of pid)
+            end try
+        end repeat
+    end tell
+    set AppleScript's text item delimiters to RS
+    return outputList as text
+end add_tracks_by_id
+
+-- Reads every property we need with a handful of bulk Apple events instead of
+-- several per track. Output is column-major: the track count, then the name,
+-- artist and persistent ID columns for every track, then persistent IDs and
+-- POSIX paths of the file tracks. Columns are separated by GS, fields by RS.
+on fetch_tracks(plName)
+    set RS to character id 30
+    set GS to character id 29
+    tell application "Music"
+        if not (exists user playlist plName) then return "PLAYLIST_NOT_FOUND"
+        set pl to user playlist plName
+        set {tNames, tArtists, tIDs} to {name, artist, persistent ID} of every track of pl
+        set {fIDs, fLocs} to {persistent ID, location} of every file track of pl
+    end tell
+    repeat with i from 1 to count of fLocs
+        try
+            set item i of fLocs to POSIX path of (item i of fLocs)
+        on error
+            set item i of fLocs to ""
+        end try
+    end repeat
+    set AppleScript's text item delimiters to RS
+    set columns to {(count of tIDs) as text, tNames as text, tArtists as text, tIDs as text, fIDs as text, fLocs as text}
+    set AppleScript's text item delimiters to GS
+    return columns as text
+end fetch_tracks
+
+-- Persistent ID and POSIX path of every file track in the library, in two
+-- bulk reads. Output is the ID column and the path column, separated by GS.
+on fetch_library()
+    set RS to character id 30
+    set GS to character id 29
+    -- A big library takes longer than the default two minutes to answer
+    with timeout of 900 seconds
+        tell application "Music"
+            set {fIDs, fLocs} to {persistent ID, location} of every file track of library playlist 1
+        end tell
+    end timeout
+    repeat with i from 1 to count of fLocs
+        try
+            set item i of fLocs to POSIX path of (item i of fLocs)
+        on error
+            set item i of fLocs to ""
+        end try
+    end repeat
+    set AppleScript's text item delimiters to RS
+    set columns to {fIDs as text, fLocs as text}
+    set AppleScript's text item delimiters to GS
+    return columns as text
+end fetch_library
+
+-- Just the persistent IDs of a playlist's tracks, RS-separated.
+on playlist_ids(plName)
+    set RS to character id 30
+    tell application "Music"
+        if not (exists user playlist plName) then return "PLAYLIST_NOT_FOUND"
+        set tIDs to persistent ID of every track of user playlist plName
+    end tell
+    set AppleScript's text item delimiters to RS
+    return tIDs as text
+end playlist_ids
+
+-- POSIX path of one library track, looked up by persistent ID. Empty if the
+-- track or its file is gone.
+on track_location(pid)
+    tell application "Music"
+        try
+            return POSIX path of (location of (first track of library playlist 1 whose persistent ID is pid))
+        on error
+            return ""
+        end try
+    end tell
+end track_location
+
+-- Identifies the Music library itself, so per-library results can be cached.
+on library_id()
+    tell application "Music" to return persistent ID of library playlist 1
+end library_id
+
+-- Name, persistent ID and track count of every user playlist, from bulk reads
+-- instead of a count per playlist. The track IDs of the playlists named in
+-- `wanted` come along too. One RS-separated record per playlist:
+-- name US persistent ID US track count US track IDs (GS-separated).
+on playlist_summary(wanted)
+    set US to character id 31
+    set RS to character id 30
+    set GS to character id 29
+    with timeout of 900 seconds
+        tell application "Music"
+            set {pNames, pIDs} to {name, persistent ID} of every user playlist
+            try
+                set trackIDs to persistent ID of every track of every user playlist
+                if (count of trackIDs) is not (count of pNames) then error "misaligned"
+            on error
+                -- Not every Music version answers the nested read; ask playlist by playlist
+                set trackIDs to {}
+                repeat with p in every user playlist
+                    set end of trackIDs to (persistent ID of every track of p)
+                end repeat
+            end try
+        end tell
+    end timeout
+    set rows to {}
+    repeat with i from 1 to count of pNames
+        set ids to item i of trackIDs
+        set idText to ""
+        if wanted contains (item i of pNames) then
+            set AppleScript's text item delimiters to GS
+            set idText to ids as text
+        end if
+        set end of rows to (item i of pNames) & US & (item i of pIDs) & US & ((count of ids) as text) & US & idText
+    end repeat
+    set AppleScript's text item delimiters to RS
+    return rows as text
+end playlist_summary
+'''
+
+class MusicError(Exception):
+    """Music couldn't be read, so anything decided from what it returned would be a guess."""
+
+class WorkerError(Exception):
+    """The worker failed. `sent` is True if it got the request and may have run it."""
+
+    def __init__(self, message, sent=False):
+        super().__init__(message)
+        self.sent = sent
+
+# Handlers that change the library or a playlist. Running one twice duplicates
+# tracks, so they are never sent again once the worker may have run them.
+CHANGES_MUSIC = {'create_playlist', 'delete_playlist', 'add_files', 'add_tracks_by_id'}
+
+class OsascriptBackend:
+    """Starts a fresh osascript process for every call."""
+
+    def run(self, script, args=(), repeat=True):
+        metrics.count('subprocesses', command='osascript')
+        try:
+            result = subprocess.run(
+                [OSASCRIPT, '-e', script, *args],
+                capture_output=True, text=True, check=True
+            )
+            # Only drop osascript's trailing newline: strip() would also eat our separators.
+            return True, result.stdout.rstrip('\n')
+        except subprocess.CalledProcessError as e:
+            return False, e.stderr
+
+    def close(self):
+        pass
+
+class WorkerBackend:
+    """
+    Talks to a long-lived scripting process (src/applescript_worker.js by default).
+
+    Requests are `<length>\\n<json>` with {"id", "argv"} and, the first time a script
+    is used, its "source". Replies are `<ok|err|unknown> <length>\\n<json string>`.
+    Both directions are pure ASCII, so lengths are byte counts. The worker keeps
+    every script it has compiled, keyed by id.
+    """
+
+    def __init__(self, command=None):
+        self.command = command or [OSASCRIPT, '-l', 'JavaScript', WORKER_SCRIPT]
+        self.proc = None
+        self.loaded = set()
+        self.lock = threading.Lock()
+
+    def _start(self):
+        self.close()
+        metrics.count('subprocesses', command='applescript_worker')
+        try:
+            self.proc = subprocess.Popen(self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        except OSError as e:
+            raise WorkerError(f"Could not start AppleScript worker: {e}")
+
+    def _send(self, message):
+        body = json.dumps(message).encode('ascii')
+        self.proc.stdin.write(b'%d\n' % len(body) + body)
+        self.proc.stdin.flush()
+
+    def _reply(self):
+        header = self.proc.stdout.readline().split()
+        if len(header) != 2:
+            raise WorkerError("AppleScript worker exited unexpectedly")
+        status, length = header[0].decode('ascii'), int(header[1])
+        payload = self.proc.stdout.read(length)
+        if len(payload) != length:
+            raise WorkerError("AppleScript worker sent a truncated reply")
+        return status, json.loads(payload)
+
+    def run(self, script, args=(), repeat=True):
+        """
+        Runs the script in the worker, restarting it once if it died. With
+        repeat=False the request is only sent again if the worker never got
+        it; a failure while waiting for the reply raises WorkerError(sent=True).
+        """
+        script_id = hashlib.sha1(script.encode('utf-8')).hexdigest()[:16]
+        with self.lock:
+            for attempt in range(2):
+                sent = False
+                try:
+                    if self.proc is None or self.proc.poll() is not None:
+                        self._start()
+                    message = {'id': script_id, 'argv': list(args)}
+                    if script_id not in self.loaded:
+                        message['source'] = script
+                    self._send(message)
+                    sent = True
+                    status, output = self._reply()
+                    if status == 'unknown':
+                        # Worker lost its cache (e.g. restarted) and ran nothing. Send the source again.
+                        message['source'] = script
+                        sent = False
+                        self._send(message)
+                        sent = True
+                        status, output = self._reply()
+                except (OSError, ValueError, WorkerError) as e:
+                    self.close()
+                    if attempt or (sent and not repeat):
+                        raise WorkerError(f"AppleScript worker failed ({e})", sent=sent)
+                    continue
+                self.loaded.add(script_id)
+                return status == 'ok', output
+
+    def close(self):
+        proc, self.proc = self.proc, None
+        self.loaded = set()
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            proc.kill()
+
+_backend = None
+_backend_lock = threading.Lock()
+
+def set_backend(backend):
+    """Replaces the scripting backend. Passing None re-creates it from settings on next use."""
+    global _backend
+    with _backend_lock:
+        if _backend is not None:
+            _backend.close()
+        _backend = backend
+
+def get_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if settings['backend'] == 'worker':
+                _backend = WorkerBackend(settings['worker_command'])
+            else:
+                _backend = OsascriptBackend()
+        return _backend
+
+atexit.register(set_backend, None)
+
+def run_applescript(script, args=(), repeat=True):
+    """
+    Executes raw AppleScript. Extra args are passed to the script's run handler.
+    With repeat=False a script the worker may already have run is not run again
+    through osascript; MusicError is raised instead, since whether it took
+    effect is unknown.
+    """
+    backend = get_backend()
+    metrics.count('apple_calls')
+    with metrics.span('apple_script'):
+        try:
+            return backend.run(script, args, repeat)
+        except WorkerError as e:
+            log_warning(f"{e}. Falling back to one osascript process per call.")
+            set_backend(OsascriptBackend())
+            if e.sent and not repeat:
+                raise MusicError(f"{e} while Music may have been running it; not sending it again")
+            return get_backend().run(script, args)
+
+def call(command, *args):
+    """
+    Runs one of the handlers in HANDLERS. Returns (success, output). Raises
+    MusicError if one of CHANGES_MUSIC may or may not have run.
+    """
+    return run_applescript(HANDLERS, [command, *args], repeat=command not in CHANGES_MUSIC)
 
 def playlist_exists(playlist_name):
-    script = f'tell application "Music" to return exists user playlist "{playlist_name}"'
-    success, output = run_applescript(script)
+    success, output = call('playlist_exists', playlist_name)
     return success and output == 'true'
 
 def create_playlist(playlist_name):
-    script = f'tell application "Music" to make new user playlist with properties {{name:"{playlist_name}"}}'
-    return run_applescript(script)[0]
+    return call('create_playlist', playlist_name)[0]
+
+def _iter_fields(text, start, end):
+    """Yields the RS-separated fields of text[start:end] without splitting it all up front."""
+    while True:
+        stop = text.find(RECORD_SEP, start, end)
+        if stop < 0:
+            yield text[start:end]
+            return
+        yield text[start:stop]
+        start = stop + 1
+
+def parse_track_columns(output):
+    """
+    Parses fetch_tracks output into a generator of Track records. path is
+    normcased, or None if the file is missing.
+    """
+    bounds = [-1]
+    for _ in range(5):
+        bounds.append(output.index(GROUP_SEP, bounds[-1] + 1))
+    bounds.append(len(output))
+
+    total = int(output[:bounds[1]])
+    if total == 0:
+        return
+
+    columns = [_iter_fields(output, bounds[i] + 1, bounds[i + 1]) for i in range(1, 6)]
+    names, artists, ids, file_ids, file_paths = columns
+    locations = {}
+    for persistent_id, path in zip(file_ids, file_paths):
+        if path:
+            locations[intern_id(persistent_id)] = os.path.normcase(path)
+
+    for name, artist, persistent_id in zip(names, artists, ids):
+        persistent_id = intern_id(persistent_id)
+        yield Track(name=name, artist=artist, path=locations.get(persistent_id), persistent_id=persistent_id)
+
+def iter_playlist_tracks(playlist_name):
+    """
+    Yields a Track for every track in the playlist, fetched in one bulk call.
+    Yields nothing (and logs why) if the playlist is missing or Music errors out.
+    """
+    success, output = call('fetch_tracks', playlist_name)
 
-def get_existing_tracks(playlist_name):
-    """Returns a set of normalized file paths currently in the Apple Music playlist."""
-    script = f'''
-    tell application "Music"
-        if exists user playlist "{playlist_name}" then
-            set outputList to {{}}
-            set trackCount to count of tracks of user playlist "{playlist_name}"
-            set playlistTracks to tracks of user playlist "{playlist_name}"
-            
-            repeat with t in playlistTracks
-                set tName to name of t
-                set tArtist to artist of t
-                try
-                    set tLoc to location of t
-                    if tLoc is not missing value then
-                        set tPath to POSIX path of tLoc
-                        copy (tName & "|||" & tArtist & "|||" & tPath) to end of outputList
-                    else
-                        copy (tName & "|||" & tArtist & "|||MISSING_LOCATION") to end of outputList
-                    end if
-                on error errMsg
-                    copy (tName & "|||" & tArtist & "|||ERROR: " & errMsg) to end of outputList
-                end try
-            end repeat
-            
-            set AppleScript's text item delimiters to ":::"
-            return (trackCount as text) & ":::" & (outputList as text)
-        else
-            return "PLAYLIST_NOT_FOUND"
-        end if
-    end tell
-    '''
-    success, output = run_applescript(script)
-    
     if not success:
         log_error(f"AppleScript error checking playlist '{playlist_name}': {output}")
-        return []
-        
+        return
+
     if output == "PLAYLIST_NOT_FOUND":
         log_warning(f"Playlist '{playlist_name}' not found during track check.")
-        return []
+        return
 
-    # Output format: "TrackCount:::Name|||Artist|||Location:::Name|||Artist|||Location..."
-    parts = output.split(":::")
-    track_count_str = parts[0]
-    track_data = parts[1:]
-    
-    try:
-        total_tracks = int(track_count_str)
-    except:
-        total_tracks = 0
-        
-    log_info(f"Debug: Apple Music reports {total_tracks} tracks in '{playlist_name}'.")
-    
-    tracks = []
-    
-    for item in track_data:
-        if not item.strip():
-            continue
-            
-        if "|||" in item:
-            parts = item.split("|||")
-            if len(parts) >= 3:
-                name = parts[0].strip()
-                artist = parts[1].strip()
-                loc = parts[2].strip()
-                
-                track_info = {
-                    'name': name,
-                    'artist': artist,
-                    'path': None,
-                    'raw_location': loc
-                }
-                
-                if loc and not loc.startswith("MISSING_LOCATION") and not loc.startswith("ERROR"):
-                    track_info['path'] = os.path.normcase(loc)
-                
-                tracks.append(track_info)
-        else:
-            pass
+    yield from parse_track_columns(output)
 
+def get_existing_tracks(playlist_name):
+    """Returns the Track records (name, artist, normalized path, persistent ID) currently in the Apple Music playlist."""
+    tracks = list(iter_playlist_tracks(playlist_name))
     log_info(f"Debug: Parsed {len(tracks)} tracks from Apple Music.")
     return tracks
 
+def playlist_summary(wanted=()):
+    """
+    Every user playlist as a dict: name, persistent_id, tracks (the count) and
+    track_ids, the set of its tracks' persistent IDs for playlists named in
+    wanted (None for the rest). One call, however many playlists there are.
+    Returns None if Music errors out.
+    """
+    wanted = set(wanted)
+    success, output = call('playlist_summary', *wanted)
+    if not success:
+        log_error(f"AppleScript error listing playlists: {output}")
+        return None
+    playlists = []
+    for row in _iter_fields(output, 0, len(output)) if output else ():
+        name, persistent_id, count, ids = row.split(FIELD_SEP)
+        playlists.append({
+            'name': name,
+            'persistent_id': persistent_id,
+            'tracks': int(count),
+            'track_ids': set(map(intern_id, ids.split(GROUP_SEP))) if ids else (set() if name in wanted else None),
+        })
+    return playlists
+
+class LibraryIndex:
+    """
+    Where every file in the Music library lives and which tracks each playlist
+    holds, shared by all jobs in a run. The library is read in one bulk call the
+    first time it is needed and then kept current as we add tracks, so each
+    playlist only costs a fetch of its persistent IDs.
+    """
+
+    def __init__(self):
+        self.by_path = None
+        self.by_id = None
+        self.playlists = {}
+        self._library_id = None
+        # Why the last read failed; not tried again until the next refresh()
+        self.error = None
+
+    def _load(self):
+        """
+        Reads the library on first use. Raises MusicError if Music can't be
+        read: an empty index would make every file look new and get imported
+        again.
+        """
+        if self.by_path is not None:
+            return
+        if self.error:
+            raise MusicError(self.error)
+        with metrics.span('library_index'):
+            success, output = call('fetch_library')
+        split = output.find(GROUP_SEP) if success else -1
+        if split < 0:
+            self.error = f"AppleScript error reading the Music library: {output or 'no output'}"
+            raise MusicError(self.error)
+        by_path = {}
+        by_id = {}
+        ids = _iter_fields(output, 0, split)
+        paths = _iter_fields(output, split + 1, len(output))
+        for persistent_id, path in zip(ids, paths):
+            if persistent_id and path:
+                persistent_id = intern_id(persistent_id)
+                path = os.path.normcase(path)
+                by_path[path] = persistent_id
+                by_id[persistent_id] = path
+        self.by_path = by_path
+        self.by_id = by_id
+        log_info(f"Indexed {len(self.by_id)} tracks in the Music library.")
+
+    def refresh(self, full=False):
+        """
+        Forgets what each playlist holds, and with full=True the whole library,
+        so it is read again from Music. For processes that outlive one run.
+        """
+        self.playlists = {}
+        self.error = None
+        if full:
+            self.by_path = None
+            self.by_id = None
+
+    def library_id(self):
+        """Which Music library this is (asked once per run)."""
+        if self._library_id is None:
+            self._library_id = get_library_id() or ''
+        return self._library_id or None
+
+    def lookup(self, path):
+        """Persistent ID of the library track for this file, or None."""
+        self._load()
+        return self.by_path.get(os.path.normcase(path))
+
+    def has_track(self, persistent_id):
+        self._load()
+        return persistent_id in self.by_id
+
+    def playlist_ids(self, playlist_name):
+        """Set of persistent IDs in the playlist (empty if it doesn't exist)."""
+        if playlist_name not in self.playlists:
+            ids = set()
+            success, output = call('playlist_ids', playlist_name)
+            if not success:
+                log_error(f"AppleScript error checking playlist '{playlist_name}': {output}")
+            elif output != "PLAYLIST_NOT_FOUND" and output:
+                # Interned, so they are the same strings as the library index's keys
+                ids = set(map(intern_id, _iter_fields(output, 0, len(output))))
+            self.playlists[playlist_name] = ids
+        return self.playlists[playlist_name]
+
+    def added(self, playlist_name, persistent_id, path=None):
+        """Records a track we just put in a playlist (and, with path, in the library)."""
+        self._load()
+        persistent_id = intern_id(persistent_id)
+        if path:
+            path = os.path.normcase(path)
+            self.by_path[path] = persistent_id
+            self.by_id[persistent_id] = path
+        self.playlist_ids(playlist_name).add(persistent_id)
+
 def delete_playlist(playlist_name):
-    script = f'tell application "Music" to delete user playlist "{playlist_name}"'
-    return run_applescript(script)[0]
+    return call('delete_playlist', playlist_name)[0]
+
+def track_location(persistent_id):
+    """Normalized path of the library track's file, or None."""
+    success, output = call('track_location', persistent_id)
+    return os.path.normcase(output) if success and output else None
+
+def get_library_id():
+    """Persistent ID of the Music library, or None if Music can't be asked."""
+    success, output = call('library_id')
+    return output if success and output else None
+
+def add_file(file_path, playlist_name):
+    """
+    Adds one file. Returns (persistent_id, normalized path Music recorded for
+    it), or None if it could not be added.
+    """
+    success, added = _add_chunk([file_path], playlist_name)
+    if not success or not added:
+        return None
+    location, persistent_id = next(iter(added.items()))
+    return persistent_id, location
 
 def add_files_to_playlist(file_paths, playlist_name, delay=1.0):
     """Adds a list of file paths to the playlist."""
     if not file_paths:
         return 0
 
-    import time
     count = 0
-    # Apple Music handles batches better than one-by-one
     for file_path in file_paths:
         file_name = os.path.basename(file_path)
         log_info(f"Adding: {file_name}")
         
-        # AppleScript requires POSIX file format
-        script = f'''
-        tell application "Music"
-            try
-                add (POSIX file "{file_path}") to user playlist "{playlist_name}"
-            on error
-                return "fail"
-            end try
-        end tell
-        '''
-        success, _ = run_applescript(script)
-        if success:
+        success, added = _add_chunk([file_path], playlist_name)
+        if success and added:
             count += 1
             time.sleep(delay)
         else:
             log_warning(f"Failed to add to Apple Music: {file_name}")
             
     return count
+
+def _add_chunk(file_paths, playlist_name):
+    """
+    Sends one chunk to Music. Returns (call_succeeded, {normalized path: persistent ID}).
+    """
+    success, output = call('add_files', playlist_name, *file_paths)
+    if not success:
+        return False, {}
+
+    added = {}
+    for record in output.split(RECORD_SEP):
+        if FIELD_SEP not in record:
+            continue
+        path, persistent_id = record.split(FIELD_SEP, 1)
+        added[os.path.normcase(path)] = persistent_id.strip()
+    return True, added
+
+def _find_in_playlist(file_paths, playlist_name):
+    """
+    {normalized path: persistent ID} of the given files the playlist already
+    holds, or None if Music can't tell us.
+    """
+    success, output = call('fetch_tracks', playlist_name)
+    if not success or output == "PLAYLIST_NOT_FOUND":
+        return None
+    wanted = {os.path.normcase(path) for path in file_paths}
+    return {track.path: track.persistent_id for track in parse_track_columns(output) if track.path in wanted}
+
+def add_files_batched(file_paths, playlist_name, batch_size=None, max_batch_size=None, max_pause=10.0):
+    """
+    Adds files to the playlist N at a time.
+    Returns a list of (file_path, persistent_id) in input order; persistent_id is None on failure.
+
+    The chunk size doubles while Music keeps up and is halved when a call fails or
+    comes back incomplete; it never grows back to a size that has already failed.
+    The pause between chunks does the opposite, so a healthy run never sleeps.
+    After a failed call the playlist is read once, so files Music added before
+    giving up aren't added a second time.
+    """
+    if not file_paths:
+        return []
+
+    batch_size = batch_size or settings['add_batch_size']
+    max_batch_size = max_batch_size or settings['max_add_batch_size']
+
+    results = {}
+    pending = list(file_paths)
+    chunk_size = max(1, batch_size)
+    ceiling = max_batch_size
+    pause = 0.0
+
+    while pending:
+        chunk = pending[:chunk_size]
+        log_info(f"Adding {len(chunk)} files ({len(file_paths) - len(pending)}/{len(file_paths)} done)...")
+        success, added = _add_chunk(chunk, playlist_name)
+        pending = pending[len(chunk):]
+
+        if not success:
+            # The whole call failed (usually an AppleEvent timeout), possibly halfway through
+            added = _find_in_playlist(chunk, playlist_name)
+            if added is None:
+                log_warning("Could not check which files Music added before the error. Not sending them again.")
+                added = {}
+            retry = [path for path in chunk if os.path.normcase(path) not in added]
+            if len(chunk) > 1 and retry:
+                for path in chunk:
+                    if os.path.normcase(path) in added:
+                        results[path] = added[os.path.normcase(path)]
+                pending = retry + pending
+                ceiling = len(chunk) - 1
+                chunk_size = max(1, len(chunk) // 2)
+                pause = min(max_pause, pause * 2 or 1.0)
+                log_warning(f"Music rejected a batch of {len(chunk)}. Retrying {len(retry)} of them "
+                            f"with {chunk_size} after {pause:.1f}s.")
+                metrics.count('apple_pause_seconds', pause)
+                time.sleep(pause)
+                continue
+
+        failed = 0
+        for path in chunk:
+            persistent_id = added.get(os.path.normcase(path))
+            results[path] = persistent_id
+            if persistent_id is None:
+                failed += 1
+                log_warning(f"Failed to add to Apple Music: {os.path.basename(path)}")
+
+        if failed or not success:
+            chunk_size = max(1, chunk_size // 2)
+            pause = min(max_pause, pause * 2 or 1.0)
+        else:
+            chunk_size = max(1, min(ceiling, chunk_size * 2))
+            pause = pause / 2 if pause > 0.25 else 0.0
+
+        if pending and pause:
+            metrics.count('apple_pause_seconds', pause)
+            time.sleep(pause)
+
+    return [(path, results.get(path)) for path in file_paths]
+
+def add_tracks_by_id(persistent_ids, playlist_name, batch_size=None):
+    """
+    Adds tracks already in the library to the playlist without importing their
+    files again. Returns the set of persistent IDs that were added.
+    """
+    batch_size = batch_size or settings['max_add_batch_size']
+    added = set()
+    for i in range(0, len(persistent_ids), batch_size):
+        success, output = call('add_tracks_by_id', playlist_name, *persistent_ids[i:i + batch_size])
+        if success:
+            added.update(pid for pid in output.split(RECORD_SEP) if pid)
+    return added
@@ -0,0 +1,108 @@
+// Long-lived AppleScript runner used by apple_music.WorkerBackend.
+//
+//   osascript -l JavaScript src/applescript_worker.js
+//
+// Reads `<length>\n<json>` requests from stdin: {"id", "argv", "source"?}.
+// The source is compiled once and kept under its id; later requests only send
+// the id. The script's run handler is called with argv, exactly like
+// `osascript -e source arg ...` would.
+//
+// Replies `<ok|err|unknown> <length>\n<json string>` on stdout. Everything on
+// the wire is ASCII so lengths are byte counts on both sides.
+
+ObjC.import('Foundation');
+ObjC.import('OSAKit');
+
+const MAX_SCRIPTS = 32;
+
+const stdin = $.NSFileHandle.fileHandleWithStandardInput;
+const stdout = $.NSFileHandle.fileHandleWithStandardOutput;
+const scripts = new Map();
+let buffer = '';
+
+function readRequest() {
+    while (true) {
+        const newline = buffer.indexOf('\n');
+        if (newline >= 0) {
+            const length = parseInt(buffer.slice(0, newline), 10);
+            if (buffer.length - newline - 1 >= length) {
+                const body = buffer.slice(newline + 1, newline + 1 + length);
+                buffer = buffer.slice(newline + 1 + length);
+                return JSON.parse(body);
+            }
+        }
+        const data = stdin.availableData;
+        if (data.length === 0) {
+            return null;
+        }
+        buffer += $.NSString.alloc.initWithDataEncoding(data, $.NSUTF8StringEncoding).js;
+    }
+}
+
+function reply(status, text) {
+    const body = JSON.stringify(text).replace(/[\u007f-\uffff]/g,
+        c => '\\u' + ('0000' + c.charCodeAt(0).toString(16)).slice(-4));
+    const message = status + ' ' + body.length + '\n' + body;
+    stdout.writeData($(message).dataUsingEncoding($.NSUTF8StringEncoding));
+}
+
+function errorText(info) {
+    const message = info.objectForKey('OSAScriptErrorMessageKey');
+    return message.isNil() ? ObjC.unwrap(info.description) : ObjC.unwrap(message);
+}
+
+function compile(source) {
+    const language = $.OSALanguage.languageForName('AppleScript');
+    const script = $.OSAScript.alloc.initWithSourceLanguage(source, language);
+    const error = Ref();
+    if (!script.compileAndReturnError(error)) {
+        throw new Error(errorText(error[0]));
+    }
+    return script;
+}
+
+function runScript(script, argv) {
+    const args = $.NSAppleEventDescriptor.listDescriptor;
+    argv.forEach((arg, i) => {
+        args.insertDescriptorAtIndex($.NSAppleEventDescriptor.descriptorWithString(arg), i + 1);
+    });
+    // 'aevt'/'oapp' with a direct parameter is how osascript invokes `on run argv`.
+    const event = $.NSAppleEventDescriptor.appleEventWithEventClassEventIDTargetDescriptorReturnIDTransactionID(
+        0x61657674, 0x6f617070, $.NSAppleEventDescriptor.nullDescriptor, -1, 0);
+    event.setParamDescriptorForKeyword(args, 0x2d2d2d2d);
+
+    const error = Ref();
+    const result = script.executeAppleEventError(event, error);
+    if (result.isNil()) {
+        throw new Error(errorText(error[0]));
+    }
+    const text = result.stringValue;
+    return text.isNil() ? '' : text.js;
+}
+
+function main() {
+    while (true) {
+        const request = readRequest();
+        if (request === null) {
+            return;
+        }
+        try {
+            if (request.source !== undefined && !scripts.has(request.id)) {
+                if (scripts.size >= MAX_SCRIPTS) {
+                    scripts.delete(scripts.keys().next().value);
+                }
+                scripts.set(request.id, compile(request.source));
+            }
+            const script = scripts.get(request.id);
+            if (script === undefined) {
+                reply('unknown', '');
+                continue;
+            }
+            reply('ok', runScript(script, request.argv));
+        } catch (e) {
+            reply('err', String(e.message || e));
+        }
+    }
+}
+
+main();
@@ -0,0 +1,138 @@
+import errno
+import os
+import tempfile
+import threading
+from .presence_index import index_local_tracks
+from .scanner import DirectoryScanner
+from .sync_state import file_entry
+from .utils import ensure_dir, log_warning
+
+class AudioStore:
+    """
+    Keeps one copy of each song, keyed by Spotify track ID. New songs are
+    downloaded into the store directory once and every playlist folder that
+    wants them gets a hardlink to it. A playlist folder that can't hardlink to
+    the store (another disk, or a filesystem without hardlinks) gets its new
+    songs downloaded straight into it instead.
+
+    Without a store directory, songs already sitting in another playlist's
+    folder are still linked instead of downloaded again; new downloads just go
+    straight into the playlist folder like before.
+    """
+
+    def __init__(self, directory, state):
+        self.directory = os.path.abspath(ensure_dir(directory)) if directory else None
+        self.state = state
+        self.lock = threading.Lock()
+        self.index = {}
+        # Track IDs queued for download during this run
+        self.pending = set()
+        # Playlist folder -> whether files in the store can be hardlinked into it
+        self.linkable = {}
+        self.refresh()
+
+    def refresh(self):
+        """Re-indexes the store directory. Tags are only read for new or changed files."""
+        if not self.directory:
+            return
+        paths = DirectoryScanner(self.state).scan(self.directory)
+        index = index_local_tracks(paths, self.directory, self.state)
+        with self.lock:
+            self.index = index
+
+    def start_run(self):
+        """Forgets the previous run's claims and re-indexes, for processes that sync more than once."""
+        with self.lock:
+            self.pending.clear()
+        self.refresh()
+
+    def download_dir(self, local_dir):
+        """Where SpotDL should put a playlist's new songs."""
+        if self.directory and self.can_link(local_dir):
+            return self.directory
+        return local_dir
+
+    def can_link(self, directory):
+        """Whether the store can hardlink into directory. Tried once per folder."""
+        directory = os.path.abspath(directory)
+        with self.lock:
+            linkable = self.linkable.get(directory)
+        if linkable is None:
+            linkable = self._try_link(directory)
+            with self.lock:
+                self.linkable[directory] = linkable
+        return linkable
+
+    def _try_link(self, directory):
+        fd, probe = tempfile.mkstemp(prefix='.linktest-', dir=self.directory)
+        os.close(fd)
+        target = os.path.join(directory, os.path.basename(probe))
+        try:
+            os.link(probe, target)
+        except OSError as e:
+            log_warning(f"Can't hardlink from {self.directory} into {directory} ({e.strerror}). "
+                        "Its new songs will be downloaded there directly.")
+            return False
+        else:
+            os.remove(target)
+            return True
+        finally:
+            os.remove(probe)
+
+    def find(self, spotify_id):
+        """Path of an existing copy of the song, or None."""
+        with self.lock:
+            path = self.index.get(spotify_id)
+        if path and os.path.isfile(path):
+            return path
+        # Any other folder we have already indexed
+        for row in self.state.find_files(spotify_id):
+            try:
+                st = os.stat(row['path'])
+            except OSError:
+                continue
+            if st.st_size == row['size'] and st.st_mtime == row['mtime']:
+                return row['path']
+        return None
+
+    def claim(self, spotify_id):
+        """
+        Marks a song as queued for download. Returns False if another playlist
+        already queued it this run, in which case this one just links it later.
+        """
+        with self.lock:
+            if spotify_id in self.pending:
+                return False
+            self.pending.add(spotify_id)
+            return True
+
+    def link_into(self, spotify_id, directory, source=None):
+        """Links the stored copy of a song (or `source`) into directory. Returns the new path, or None."""
+        source = source or self.find(spotify_id)
+        if source is None:
+            return None
+        target = os.path.join(directory, os.path.basename(source))
+        if os.path.lexists(target):
+            if os.path.exists(target) and os.path.samefile(source, target):
+                return target
+            # A different song with the same "Artist - Title" name
+            stem, ext = os.path.splitext(target)
+            target = f"{stem} [{spotify_id}]{ext}"
+            if os.path.lexists(target):
+                return target if os.path.exists(target) and os.path.samefile(source, target) else None
+        # Only hardlinks: a symlink's path isn't the one Music reports for the
+        # file, so the importer would never recognise it as added.
+        try:
+            os.link(source, target)
+        except OSError as e:
+            # A copy on another disk just means downloading the song again
+            if e.errno != errno.EXDEV:
+                log_warning(f"Could not link {os.path.basename(source)} into {directory}: {e}")
+            return None
+        # We already know the ID, no need to read the tags of the new name again
+        self.state.record_file_ids([{**file_entry(target), 'spotify_id': spotify_id}])
+        return target
+
+    def link_missing(self, spotify_ids, directory):
+        """Links every song that has a copy somewhere. Returns the IDs that don't."""
+        return [spotify_id for spotify_id in spotify_ids if self.link_into(spotify_id, directory) is None]
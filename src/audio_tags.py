@@ -0,0 +1,51 @@
+import os
+import re
+
+# mutagen ships with spotdl. Without it we simply can't read tags.
+try:
+    import mutagen
+    from mutagen.id3 import ID3
+except ImportError:
+    mutagen = None
+
+SPOTIFY_TRACK_RE = re.compile(r'open\.spotify\.com/track/([A-Za-z0-9]{22})')
+
+# spotdl stores the track's Spotify URL in the "WOAS" (official audio source) tag.
+WOAS_KEYS = ('WOAS', '----:spotdl:WOAS', 'woas')
+
+def track_id_from_url(url):
+    """Extracts the 22-character track ID from a Spotify track URL, or None."""
+    match = SPOTIFY_TRACK_RE.search(url or '')
+    return match.group(1) if match else None
+
+def read_spotify_id(path):
+    """Returns the Spotify track ID spotdl embedded in the file, or None."""
+    if mutagen is None:
+        return None
+    try:
+        if os.path.splitext(path)[1].lower() == '.mp3':
+            # Reads just the ID3 header instead of also parsing the audio stream
+            tags = ID3(path)
+        else:
+            audio = mutagen.File(path)
+            tags = audio.tags if audio is not None else None
+    except Exception:
+        return None
+    if tags is None:
+        return None
+
+    for key in WOAS_KEYS:
+        try:
+            value = tags[key]
+        except (KeyError, ValueError, TypeError):
+            continue
+        if isinstance(value, list):
+            value = value[0] if value else ''
+        # ID3 frames carry .url, MP4 freeform atoms are bytes, Vorbis comments are str.
+        value = getattr(value, 'url', value)
+        if isinstance(value, bytes):
+            value = value.decode('utf-8', 'replace')
+        track_id = track_id_from_url(str(value))
+        if track_id:
+            return track_id
+    return None
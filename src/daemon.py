@@ -0,0 +1,166 @@
+import heapq
+import itertools
+import os
+import random
+import threading
+import time
+from .scanner import DirectoryScanner, AUDIO_EXTS
+from .utils import log_info
+
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+# Events that can mean a file appeared, finished writing, moved or went away
+WATCHED_EVENTS = {'created', 'modified', 'moved', 'deleted', 'closed'}
+
+class PollSchedule:
+    """
+    When each playlist is next due for a Spotify check. Every poll is pushed
+    back by a random share (`jitter`) of its interval, so playlists that start
+    together drift apart instead of all hitting the API at the same moment.
+    """
+
+    def __init__(self, minutes=30, jitter=0.1):
+        self.minutes = minutes
+        self.jitter = jitter
+        self.intervals = {}
+        self.next_at = {}
+        self.heap = []
+        # Tie-breaker, so keys never need to be comparable
+        self.counter = itertools.count()
+
+    def add(self, key, minutes=None, delay=0):
+        """Schedules key, first due after `delay` seconds."""
+        self.intervals[key] = (minutes or self.minutes) * 60
+        self._push(key, time.time() + delay)
+
+    def remove(self, key):
+        # Its heap entry is skipped once next_at no longer matches
+        self.intervals.pop(key, None)
+        self.next_at.pop(key, None)
+
+    def _push(self, key, at):
+        self.next_at[key] = at
+        heapq.heappush(self.heap, (at, next(self.counter), key))
+
+    def due(self, now=None):
+        """Returns every key that is due and schedules its next poll."""
+        now = time.time() if now is None else now
+        keys = []
+        while self.heap and self.heap[0][0] <= now:
+            at, _, key = heapq.heappop(self.heap)
+            if self.next_at.get(key) == at:
+                keys.append(key)
+        for key in keys:
+            interval = self.intervals[key]
+            self._push(key, now + interval + random.uniform(0, interval * self.jitter))
+        return keys
+
+    def next_in(self, now=None):
+        """Seconds until the next poll is due (None if nothing is scheduled)."""
+        now = time.time() if now is None else now
+        while self.heap and self.next_at.get(self.heap[0][2]) != self.heap[0][0]:
+            heapq.heappop(self.heap)
+        if not self.heap:
+            return None
+        return max(0.0, self.heap[0][0] - now)
+
+class FolderWatcher:
+    """
+    Reports which playlist folders gained or lost audio files. Uses watchdog
+    (FSEvents on macOS, inotify on Linux) when it is installed; otherwise the
+    folders are rescanned every `poll_seconds`, which only lists directories
+    whose mtime changed.
+    """
+
+    def __init__(self, state, poll_seconds=30, settle=2.0):
+        self.folders = []
+        self.poll_seconds = poll_seconds
+        # A file still being copied in keeps firing events; wait for quiet
+        self.settle = settle
+        self.changed = set()
+        self.last_event = 0.0
+        self.lock = threading.Lock()
+        self.event = threading.Event()
+        self.observer = None
+        self.scanner = None
+        self.next_poll = 0.0
+
+        if Observer is not None:
+            self.observer = Observer()
+            self.observer.start()
+        else:
+            self.scanner = DirectoryScanner(state)
+            log_info(f"watchdog isn't installed; checking playlist folders for new files every {poll_seconds}s.")
+
+    def watch(self, folder):
+        folder = os.path.abspath(os.path.expanduser(folder))
+        if folder in self.folders:
+            return
+        os.makedirs(folder, exist_ok=True)
+        if self.observer is not None:
+            self.observer.schedule(self, folder, recursive=True)
+        # Longest first, so folder_for() finds the innermost match
+        self.folders = sorted(self.folders + [folder], key=len, reverse=True)
+
+    def folder_for(self, path):
+        """The watched folder path lives in, or None."""
+        for folder in self.folders:
+            if path == folder or path.startswith(folder + os.sep):
+                return folder
+        return None
+
+    def dispatch(self, event):
+        """Called by the watchdog observer thread for every filesystem event."""
+        if event.is_directory or event.event_type not in WATCHED_EVENTS:
+            return
+        for path in (event.src_path, getattr(event, 'dest_path', '')):
+            if path and os.path.splitext(path)[1].lower() in AUDIO_EXTS:
+                folder = self.folder_for(os.path.abspath(path))
+                if folder:
+                    with self.lock:
+                        self.changed.add(folder)
+                        self.last_event = time.monotonic()
+                        self.event.set()
+
+    def wait(self, timeout):
+        """
+        Blocks for up to timeout seconds. Returns the set of folders that
+        changed, as soon as they have been quiet for `settle` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        if self.observer is None:
+            return self._poll(deadline)
+        while True:
+            now = time.monotonic()
+            remaining = deadline - now
+            with self.lock:
+                if self.changed:
+                    quiet = now - self.last_event
+                    if quiet >= self.settle:
+                        changed, self.changed = self.changed, set()
+                        return changed
+                    remaining = min(remaining, self.settle - quiet)
+                self.event.clear()
+            if remaining <= 0:
+                return set()
+            self.event.wait(remaining)
+
+    def _poll(self, deadline):
+        while True:
+            now = time.monotonic()
+            if now >= self.next_poll:
+                self.next_poll = now + self.poll_seconds
+                changed = {folder for folder in self.folders if list(self.scanner.changes(folder))}
+                if changed:
+                    return changed
+            if now >= deadline:
+                return set()
+            time.sleep(max(0.0, min(deadline, self.next_poll) - now))
+
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer.join()
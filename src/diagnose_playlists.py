@@ -1,33 +1,92 @@
-import subprocess
-
-def run_applescript(script):
-    try:
-        result = subprocess.run(
-            ['osascript', '-e', script],
-            capture_output=True, text=True, check=True
-        )
-        return True, result.stdout.strip()
-    except subprocess.CalledProcessError as e:
-        return False, e.stderr
+import os
+import time
+from . import apple_music
+from .scanner import DirectoryScanner
 
 def list_playlists():
-    script = '''
-    tell application "Music"
-        set output to ""
-        repeat with p in user playlists
-            set pName to name of p
-            set tCount to count of tracks of p
-            set output to output & "Name: " & pName & " | Tracks: " & tCount & "\n"
-        end repeat
-        return output
-    end tell
-    '''
-    success, output = run_applescript(script)
-    if success:
-        print("=== Apple Music Playlists ===")
-        print(output)
-    else:
-        print(f"Error: {output}")
+    playlists = apple_music.playlist_summary()
+    if playlists is None:
+        return
+    print("=== Apple Music Playlists ===")
+    for playlist in playlists:
+        print(f"Name: {playlist['name']} | Tracks: {playlist['tracks']}")
+
+def diagnose(state, jobs=(), library=None):
+    """
+    Compares every Music playlist with the sync state and the local folders.
+    Returns a JSON-ready dict. Music is asked once for all playlists, plus once
+    for the library index unless `library` already has it loaded. Playlists
+    whose track IDs the index already holds aren't fetched again.
+    """
+    started = time.perf_counter()
+    library = library or apple_music.LibraryIndex()
+    synced = state.get_playlists()
+    # Where each playlist's files live: the config wins over what the last sync used
+    local_dirs = {name: row['local_dir'] for name, row in synced.items()}
+    for job in jobs:
+        local_dirs[job['apple_playlist_name']] = job['local_dir']
+    job_names = {job['apple_playlist_name']: job['name'] for job in jobs}
+
+    wanted = [name for name in local_dirs if name not in library.playlists]
+    playlists = apple_music.playlist_summary(wanted)
+    if playlists is None:
+        return None
+
+    scanner = DirectoryScanner(state)
+    report = []
+    seen = set()
+    for playlist in playlists:
+        name = playlist['name']
+        entry = {
+            'name': name,
+            'persistent_id': playlist['persistent_id'],
+            'tracks': playlist['tracks'],
+        }
+        report.append(entry)
+        # Music allows duplicate names; the sync state only knows the first
+        if name not in local_dirs or name in seen:
+            continue
+        seen.add(name)
+        track_ids = library.playlists.get(name)
+        if track_ids is None:
+            track_ids = library.playlists[name] = playlist['track_ids'] or set()
+        entry.update(_compare(name, track_ids, local_dirs[name], state, synced.get(name), scanner, library))
+        entry['job'] = job_names.get(name)
+
+    missing = [
+        {'name': name, 'job': job_names.get(name), 'local_dir': local_dirs[name], 'synced': name in synced}
+        for name in local_dirs if name not in seen
+    ]
+    return {
+        'generated_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'library_id': library.library_id(),
+        'duration_seconds': round(time.perf_counter() - started, 3),
+        'playlists': report,
+        # Synced or configured, but there is no Music playlist by that name
+        'missing_playlists': missing,
+    }
+
+def _compare(name, track_ids, local_dir, state, synced, scanner, library):
+    rows = state.get_tracks(name)
+    state_ids = {row['apple_id'] for row in rows.values() if row['apple_id']}
+    local_dir = os.path.abspath(os.path.expanduser(local_dir))
+    files = set(scanner.scan(local_dir)) if os.path.isdir(local_dir) else set()
+    return {
+        'local_dir': local_dir,
+        'synced_at': synced['synced_at'] if synced else None,
+        'snapshot_id': synced['snapshot_id'] if synced else None,
+        'state_tracks': len(rows),
+        'local_files': len(files),
+        # Recorded as added, but no longer in the Music playlist
+        'missing_from_playlist': len(state_ids - track_ids),
+        # Recorded as added, but gone from the Music library altogether
+        'missing_from_library': sum(1 for apple_id in state_ids if not library.has_track(apple_id)),
+        # In the Music playlist, but not added by us (or not recorded)
+        'not_in_state': len(track_ids - state_ids),
+        # On disk but never synced, and recorded but deleted from disk
+        'untracked_files': len(files - rows.keys()),
+        'missing_files': len(rows.keys() - files),
+    }
 
 if __name__ == "__main__":
     list_playlists()
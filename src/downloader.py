@@ -0,0 +1,274 @@
+import subprocess
+import os
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from . import audio_tags, metrics, spotdl_library
+from .scanner import AUDIO_EXTS
+from .utils import log_info, log_success, log_warning
+
+# Lets the benchmarks point us at a stand-in spotdl.
+SPOTDL = os.environ.get('SPOTDL', 'spotdl')
+
+def parse_rate(value):
+    """'4M' / '500K' / 1048576 -> bytes per second (None stays None)."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    value = str(value).strip().upper()
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    if value[-1:] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+class DownloadJob:
+    """
+    Progress of one playlist's downloads. Returned by DownloadScheduler.submit().
+
+    Finished chunks are handed over through a bounded queue, so an importer can
+    start on them while later chunks are still downloading. When it falls
+    behind, the workers wait instead of piling up more finished chunks.
+    """
+
+    def __init__(self, name, urls, output_dir, chunk_size, queue_size=8, metadata=None):
+        self.name = name
+        self.output_dir = output_dir
+        # {track_id: track_metadata()} for the in-process backend, dropped chunk by chunk
+        self.metadata = metadata
+        self.chunks = [urls[i:i + chunk_size] for i in range(0, len(urls), chunk_size)]
+        self.results = [None] * len(self.chunks)
+        self.reported = 0
+        self.done = threading.Event()
+        self.cancelled = threading.Event()
+        self.ready = queue.Queue(maxsize=max(1, queue_size))
+        self.consumed = 0
+        self.lock = threading.Lock()
+        # path -> (size, mtime, spotify_id), so each new file's tags are read once
+        self.seen_files = {}
+        # Files that were there before we started. Only new ones can be our downloads,
+        # which matters when the folder is a big shared store.
+        self.baseline = set(os.listdir(output_dir)) if self.chunks else set()
+        if not self.chunks:
+            self.done.set()
+
+    @property
+    def failed_urls(self):
+        return [url for result in self.results if result for url in result['failed']]
+
+    def completed(self):
+        """
+        Yields each chunk's result as soon as it finishes (in completion order):
+        a dict with the chunk's size, its failed URLs, the error if any, and
+        `files`, {spotify_id: path} of the songs it downloaded.
+        """
+        while self.consumed < len(self.chunks) and not self.cancelled.is_set():
+            try:
+                result = self.ready.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.consumed += 1
+            yield result
+
+    def wait(self):
+        """Blocks until every chunk has finished. Returns the URLs that did not download."""
+        for _ in self.completed():
+            pass
+        return self.failed_urls
+
+    def cancel(self):
+        """Stops handing out results. Chunks that haven't started yet are skipped."""
+        self.cancelled.set()
+
+    @property
+    def finished(self):
+        """True once every result has been handed out, or the job was cancelled."""
+        return self.cancelled.is_set() or self.consumed == len(self.chunks)
+
+    def _present_ids(self):
+        """{spotify_id: path} of the audio files that appeared in output_dir since we started."""
+        ids = {}
+        with self.lock:
+            for entry in os.scandir(self.output_dir):
+                if entry.name in self.baseline or not entry.is_file():
+                    continue
+                if os.path.splitext(entry.name)[1].lower() not in AUDIO_EXTS:
+                    continue
+                st = entry.stat()
+                cached = self.seen_files.get(entry.path)
+                if cached is None or cached[:2] != (st.st_size, st.st_mtime):
+                    cached = (st.st_size, st.st_mtime, audio_tags.read_spotify_id(entry.path))
+                    self.seen_files[entry.path] = cached
+                if cached[2]:
+                    ids[cached[2]] = entry.path
+        return ids
+
+    def _finish_chunk(self, index, result):
+        """Stores a chunk result and prints progress for every chunk finished so far, in order."""
+        with self.lock:
+            self.results[index] = result
+            if self.metadata:
+                for url in self.chunks[index]:
+                    self.metadata.pop(audio_tags.track_id_from_url(url), None)
+            while self.reported < len(self.chunks) and self.results[self.reported] is not None:
+                done = self.results[self.reported]
+                self.reported += 1
+                message = f"[{self.name}] Batch {self.reported}/{len(self.chunks)}"
+                if done['failed']:
+                    log_warning(f"{message}: {len(done['failed'])} of {done['size']} songs failed ({done['error']})")
+                elif done['error']:
+                    log_warning(f"{message}: finished with errors ({done['error']})")
+                else:
+                    log_info(f"{message}: {done['size']} songs done")
+            if self.reported == len(self.chunks):
+                # Only needed to spot new files while chunks were still running
+                self.baseline = set()
+                self.seen_files = {}
+                self.done.set()
+        # Outside the lock: this blocks while the importer is behind.
+        while not self.cancelled.is_set():
+            try:
+                self.ready.put(result, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+class DownloadScheduler:
+    """
+    Runs SpotDL for any number of playlists on a fixed pool of workers. Each
+    worker downloads one chunk at a time, so `workers` also caps the process
+    count, and max_bandwidth (bytes/s or '4M') is shared out between them.
+
+    backend='library' runs spotdl in-process (see spotdl_library.LibraryPool)
+    when it is importable, and falls back to the spotdl command when it isn't
+    or its worker processes fail. backend='command' always uses the command.
+    """
+
+    def __init__(self, workers=2, chunk_size=20, max_bandwidth=None, queue_size=8,
+                 backend='library', client_id=None, client_secret=None):
+        self.workers = max(1, workers)
+        self.chunk_size = chunk_size
+        self.queue_size = queue_size
+        self.jobs = []
+        self.rate_per_worker = None
+        if parse_rate(max_bandwidth):
+            self.rate_per_worker = max(1, parse_rate(max_bandwidth) // self.workers)
+        self.pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='spotdl')
+        self.missing_spotdl = False
+        self.library = None
+        self.library_lock = threading.Lock()
+        if backend == 'library' and spotdl_library.available():
+            self.library = spotdl_library.LibraryPool(self.workers, client_id, client_secret, self.rate_per_worker)
+
+    def submit(self, name, urls, output_dir, metadata=None):
+        """
+        Queues a playlist's URLs for download into output_dir. metadata maps track
+        IDs to what Spotify already told us about them. Returns a DownloadJob.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        job = DownloadJob(name, list(urls), output_dir, self.chunk_size, self.queue_size, metadata)
+        # Only unfinished jobs are kept (for shutdown), or a daemon would hold on to every one
+        self.jobs = [other for other in self.jobs if not other.finished]
+        self.jobs.append(job)
+        if job.chunks:
+            log_info(f"[{name}] Queued {len(urls)} songs for SpotDL in {len(job.chunks)} batches.")
+        for index, chunk in enumerate(job.chunks):
+            self.pool.submit(self._run_chunk, job, index, chunk)
+        return job
+
+    def _command(self, chunk):
+        cmd = [SPOTDL, 'download'] + chunk
+        if self.rate_per_worker:
+            cmd += ['--yt-dlp-args', f'--limit-rate {self.rate_per_worker}']
+        return cmd
+
+    def _run_chunk(self, job, index, chunk):
+        if job.cancelled.is_set():
+            job._finish_chunk(index, {'size': len(chunk), 'failed': list(chunk), 'error': "cancelled", 'files': {}})
+            return
+        try:
+            result = self._run_library(job, chunk) if self.library is not None else None
+            if result is None:
+                result = self._run_command(job, chunk)
+            if result['files']:
+                metrics.count('songs_downloaded', len(result['files']))
+                metrics.count('bytes_downloaded', sum(os.path.getsize(path) for path in result['files'].values()))
+        except Exception as e:
+            # Every chunk must finish, or completed() waits for it forever
+            result = {'size': len(chunk), 'failed': list(chunk), 'error': f"{type(e).__name__}: {e}", 'files': {}}
+        if result['failed']:
+            metrics.count('songs_failed', len(result['failed']))
+        job._finish_chunk(index, result)
+
+    def _run_library(self, job, chunk):
+        """Downloads the chunk in the spotdl worker processes. Returns None if we have to fall back."""
+        library = self.library
+        try:
+            with metrics.span('download', job.name):
+                files, error = library.download(chunk, job.output_dir, job.metadata)
+        except spotdl_library.LibraryError as e:
+            with self.library_lock:
+                if self.library is library:
+                    log_warning(f"In-process SpotDL failed: {e}. Using the spotdl command instead.")
+                    self.library = None
+                    library.shutdown(wait=False)
+            return None
+        failed = [url for url in chunk if audio_tags.track_id_from_url(url) not in files]
+        if failed and not error:
+            error = "no matching audio found"
+        return {'size': len(chunk), 'failed': failed, 'error': error, 'files': files}
+
+    def _run_command(self, job, chunk):
+        error = None
+        try:
+            if self.missing_spotdl:
+                raise FileNotFoundError(SPOTDL)
+            metrics.count('subprocesses', command='spotdl')
+            # cwd=output_dir makes spotdl save into the playlist folder without extra flags
+            with metrics.span('download', job.name):
+                proc = subprocess.run(self._command(chunk), cwd=job.output_dir)
+            if proc.returncode != 0:
+                error = f"spotdl exited with status {proc.returncode}"
+        except FileNotFoundError:
+            if not self.missing_spotdl:
+                log_warning("SpotDL not found! Make sure it is installed (pip install spotdl).")
+            self.missing_spotdl = True
+            return {'size': len(chunk), 'failed': list(chunk), 'error': "spotdl not found", 'files': {}}
+        except Exception as e:
+            error = str(e)
+
+        # spotdl's exit status doesn't say which songs failed, so look at what landed
+        # on disk. Without mutagen we can't tell and only pass the error on.
+        failed = []
+        files = {}
+        if audio_tags.mutagen is not None:
+            present = job._present_ids()
+            for url in chunk:
+                track_id = audio_tags.track_id_from_url(url)
+                if track_id in present:
+                    files[track_id] = present[track_id]
+                else:
+                    failed.append(url)
+            if failed and not error:
+                error = "no matching audio found"
+        return {'size': len(chunk), 'failed': failed, 'error': error, 'files': files}
+
+    def shutdown(self):
+        """Waits for running spotdl processes; batches that haven't started are dropped."""
+        # A cancelled job's chunks return straight away when their turn comes
+        for job in self.jobs:
+            job.cancel()
+        self.pool.shutdown(wait=True)
+        if self.library is not None:
+            self.library.shutdown()
+
+def download_all(urls, output_dir, name="Download", **options):
+    """Downloads one list of URLs and waits for it. Returns the URLs that failed."""
+    scheduler = DownloadScheduler(**options)
+    try:
+        failed = scheduler.submit(name, urls, output_dir).wait()
+    finally:
+        scheduler.shutdown()
+    if not failed:
+        log_success(f"[{name}] All {len(urls)} songs downloaded.")
+    return failed
@@ -0,0 +1,179 @@
+import os
+import time
+from . import apple_music, metrics
+from .sync_state import file_entry, is_unchanged
+from .utils import log_info, log_success, log_error
+
+class SettingsError(Exception):
+    """Music copied the file into its own folder instead of referencing it."""
+
+class PlaylistImporter:
+    """
+    Adds files to one Apple Music playlist as they become available and records
+    each one in the sync state. What is already in Music comes from the
+    run-wide LibraryIndex, so a file the library already has (through any
+    playlist) is added by persistent ID instead of being imported again.
+    """
+
+    def __init__(self, apple_pl_name, state, library=None):
+        self.apple_pl_name = apple_pl_name
+        self.state = state
+        self.library = library or apple_music.LibraryIndex()
+        # path -> row/entry of everything recorded for the playlist, kept current as we add
+        self.known = dict(state.get_tracks(apple_pl_name))
+        self.verified = False
+        self.added = 0
+        # Paths already counted as skipped or added. A job imports its folder
+        # more than once, so without this the final pass counts them again.
+        self.counted = set()
+
+    def is_current(self, path):
+        return is_unchanged(self.known.get(path), path)
+
+    def forget_missing(self, on_disk):
+        """Drops recorded files that are no longer on disk."""
+        removed = [path for path in self.known if path not in on_disk]
+        if removed:
+            self.state.remove_tracks(self.apple_pl_name, removed)
+            for path in removed:
+                del self.known[path]
+
+    def _record(self, entries, imported=False):
+        """Saves entries to the state. imported=True means Music now has a track at each path."""
+        if entries:
+            self.state.record_tracks(self.apple_pl_name, entries)
+            for entry in entries:
+                self.known[entry['path']] = entry
+                self.counted.add(entry['path'])
+                self.library.added(self.apple_pl_name, entry['apple_id'], entry['path'] if imported else None)
+
+    def import_files(self, files, path_ids):
+        """
+        Brings the given files into the playlist, skipping ones that are already
+        there and unchanged. path_ids maps file paths to Spotify IDs where known.
+        Raises SettingsError if Music turns out to copy files.
+        """
+        changed_files = []
+        skipped = 0
+        for f in files:
+            if not self.is_current(f):
+                changed_files.append(f)
+            elif f not in self.counted:
+                self.counted.add(f)
+                skipped += 1
+        metrics.count('files_skipped', skipped)
+        if not changed_files:
+            return
+        in_playlist = self.library.playlist_ids(self.apple_pl_name)
+
+        # Library tracks already imported for these songs from another playlist's file
+        known_ids = self.state.find_apple_ids({path_ids[f] for f in changed_files if path_ids.get(f)})
+
+        files_to_add = []
+        already_there = []
+        reusable = {}
+        for f in changed_files:
+            # Strict File Path Check, against the whole library
+            persistent_id = self.library.lookup(f)
+            if not persistent_id and self.library.has_track(known_ids.get(path_ids.get(f))):
+                persistent_id = known_ids[path_ids[f]]
+            if persistent_id in in_playlist:
+                already_there.append(file_entry(f, apple_id=persistent_id, spotify_id=path_ids.get(f)))
+            elif persistent_id:
+                reusable[f] = persistent_id
+            else:
+                files_to_add.append(f)
+
+        self._record(already_there)
+        metrics.count('files_skipped', len(already_there))
+
+        # Tracks the library already has go in by persistent ID, so Music
+        # doesn't end up with a second library entry for the same song.
+        if reusable:
+            added_ids = apple_music.add_tracks_by_id(list(dict.fromkeys(reusable.values())), self.apple_pl_name)
+            reused = [
+                file_entry(f, apple_id=persistent_id, spotify_id=path_ids.get(f))
+                for f, persistent_id in reusable.items() if persistent_id in added_ids
+            ]
+            if reused:
+                self._record(reused)
+                self.added += len(reused)
+                metrics.count('files_added', len(reused), how='by_id')
+                log_success(f"Added {len(reused)} songs already in the Music library.")
+            files_to_add += [f for f, persistent_id in reusable.items() if persistent_id not in added_ids]
+
+        if not files_to_add:
+            return
+        log_info(f"Found {len(files_to_add)} songs to add to Apple Music.")
+
+        if not self.verified:
+            self.verified = self._recently_verified()
+        if not self.verified:
+            # We use the first file to verify the "Copy files" setting
+            first_file = files_to_add.pop(0)
+            with metrics.span('settings_check'):
+                self._verify_settings(first_file, path_ids)
+
+        if files_to_add:
+            results = apple_music.add_files_batched(files_to_add, self.apple_pl_name)
+            added = [
+                file_entry(path, apple_id=persistent_id, spotify_id=path_ids.get(path))
+                for path, persistent_id in results if persistent_id
+            ]
+            self._record(added, imported=True)
+            self.added += len(added)
+            metrics.count('files_added', len(added), how='import')
+            metrics.count('files_failed', len(results) - len(added))
+            log_success(f"Added {len(added)} songs to '{self.apple_pl_name}'.")
+
+    def _recently_verified(self):
+        """True if the settings check passed for this Music library within the TTL."""
+        library_id = self.library.library_id()
+        checked_at = self.state.get_settings_check(library_id) if library_id else None
+        ttl = apple_music.settings['settings_check_hours'] * 3600
+        return checked_at is not None and time.time() - checked_at < ttl
+
+    def _verify_settings(self, first_file, path_ids):
+        """
+        Adds one file and checks Music kept it at its original path. If it didn't,
+        'Copy files to Music Media folder' is on and we must not add any more.
+        """
+        log_info(f"Adding first file to verify settings: {os.path.basename(first_file)}")
+        added = apple_music.add_file(first_file, self.apple_pl_name)
+        if added is None:
+            raise SettingsError("Failed to add the first file. Aborting sync.")
+
+        persistent_id, location = added
+        expected = os.path.normcase(first_file)
+        if location != expected:
+            # Music may still be settling; ask once more about just this track
+            time.sleep(1.0)
+            location = apple_music.track_location(persistent_id)
+
+        if location != expected:
+            log_error("CRITICAL: Added file not found by path in Apple Music.")
+            log_error(f"Expected Path: {first_file}")
+            log_error(f"Music stored it at: {location or 'MISSING_LOCATION'}")
+            if apple_music.settings['debug_dump']:
+                log_info("Dumping found tracks in Apple Music for debugging:")
+                for t in apple_music.iter_playlist_tracks(self.apple_pl_name):
+                    log_info(f" - Name: {t.name}")
+                    log_info(f"   Artist: {t.artist}")
+                    log_info(f"   Path: {t.path or 'MISSING_LOCATION'}")
+                    log_info(f"   Persistent ID: {t.persistent_id}")
+
+            log_error("This likely means 'Copy files to Music Media folder' is ON.")
+            raise SettingsError(
+                "Please UNCHECK 'Copy files to Music Media folder when adding to library' in Music > Settings > Files."
+            )
+
+        log_success("Settings verified: File added with correct path.")
+        self.verified = True
+        library_id = self.library.library_id()
+        if library_id:
+            self.state.record_settings_check(library_id)
+        self.added += 1
+        metrics.count('files_added', how='import')
+        self._record([
+            file_entry(first_file, apple_id=persistent_id, spotify_id=path_ids.get(first_file))
+        ], imported=True)
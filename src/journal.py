@@ -0,0 +1,68 @@
+import json
+import time
+from .utils import log_info
+
+class RunJournal:
+    """
+    Write-ahead record, in the sync state, of how far each job got in the
+    current run: 'fetched' (track list saved), 'downloading' and 'importing'
+    (with done/total counts) and finally 'done'. When a run dies part way (a
+    crash, Ctrl-C, the laptop going to sleep) the next one carries on: jobs that
+    finished are skipped and the rest reuse the track lists they already fetched.
+
+    A run that completes is closed even if some of its jobs failed; those are
+    simply synced again next time. Only an interrupted run is resumed, and only
+    for max_age_hours, after which its saved track lists are too stale to trust.
+
+    RunJournal(None) records nothing, for one-off runs.
+    """
+
+    def __init__(self, state, resume=True, max_age_hours=12):
+        self.state = state
+        self.run_id = None
+        self.entries = {}
+        if state is None:
+            return
+        last = state.last_run()
+        interrupted = last is not None and last['finished_at'] is None
+        if interrupted and time.time() - last['started_at'] > max_age_hours * 3600:
+            log_info(f"The interrupted last run is more than {max_age_hours:g} hours old. Starting over.")
+            interrupted = False
+        if resume and interrupted:
+            self.run_id = last['run_id']
+            self.entries = dict(state.get_journal(self.run_id))
+            if self.entries:
+                started = time.strftime('%Y-%m-%d %H:%M', time.localtime(last['started_at']))
+                finished = sum(1 for entry in self.entries.values() if entry['phase'] == 'done')
+                log_info(f"Resuming the run started {started}: {finished} jobs already finished.")
+        else:
+            self.run_id = state.start_run()
+
+    def _write(self, playlist, phase, done=0, total=0, data=None):
+        if self.run_id is not None:
+            self.state.write_journal(self.run_id, playlist, phase, done, total, data)
+
+    def is_done(self, playlist):
+        entry = self.entries.get(playlist)
+        return entry is not None and entry['phase'] == 'done'
+
+    def resume_data(self, playlist):
+        """What the interrupted run saved when it fetched this job, or None."""
+        entry = self.entries.get(playlist)
+        if entry is None or entry['phase'] == 'done' or not entry['data']:
+            return None
+        return json.loads(entry['data'])
+
+    def fetched(self, playlist, **data):
+        self._write(playlist, 'fetched', data=json.dumps(data))
+
+    def progress(self, playlist, phase, done, total):
+        self._write(playlist, phase, done, total)
+
+    def done(self, playlist):
+        self._write(playlist, 'done')
+
+    def finish(self):
+        """Marks the run complete (failed jobs included), so the next one starts afresh."""
+        if self.run_id is not None:
+            self.state.finish_run(self.run_id)
@@ -0,0 +1,177 @@
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Defaults; override with the `metrics` section of settings.yaml (see configure())
+settings = {
+    'enabled': False,
+    'report_path': 'metrics/last_run.json',  # JSON run report
+    'prometheus_path': None,                 # node_exporter textfile, e.g. /var/lib/node_exporter/spotify_sync.prom
+}
+
+PROMETHEUS_PREFIX = 'spotify_apple_sync'
+
+# Handed out by span() while metrics are off, so a disabled span costs one check
+_NOOP = nullcontext()
+
+class Recorder:
+    """
+    Phase timings and counters for this process. Spans nest (an 'import'
+    contains its 'scan' and 'apple_script' spans), so phase totals overlap
+    rather than add up to the run time.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        # (phase, job) -> [count, seconds]
+        self.spans = {}
+        # (name, ((label, value), ...)) -> value
+        self.counters = {}
+
+    @contextmanager
+    def span(self, phase, job=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                entry = self.spans.setdefault((phase, job), [0, 0.0])
+                entry[0] += 1
+                entry[1] += elapsed
+
+    def count(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def report(self):
+        """The JSON run report, as a dict."""
+        with self.lock:
+            spans = dict(self.spans)
+            counters = dict(self.counters)
+        phases = {}
+        jobs = {}
+        for (phase, job), (count, seconds) in _sorted_spans(spans):
+            total = phases.setdefault(phase, {'count': 0, 'seconds': 0.0})
+            total['count'] += count
+            total['seconds'] += seconds
+            if job is not None:
+                jobs.setdefault(job, {})[phase] = {'count': count, 'seconds': round(seconds, 4)}
+        for total in phases.values():
+            total['seconds'] = round(total['seconds'], 4)
+        return {
+            'started_at': time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(self.started_at)),
+            'duration_seconds': round(time.time() - self.started_at, 3),
+            'phases': phases,
+            'jobs': jobs,
+            'counters': {_counter_name(name, labels): value for (name, labels), value in sorted(counters.items())},
+        }
+
+    def prometheus(self):
+        """The same numbers in the Prometheus text exposition format."""
+        with self.lock:
+            spans = dict(self.spans)
+            counters = dict(self.counters)
+        lines = [
+            f'# TYPE {PROMETHEUS_PREFIX}_start_time_seconds gauge',
+            f'{PROMETHEUS_PREFIX}_start_time_seconds {self.started_at:.3f}',
+            f'# TYPE {PROMETHEUS_PREFIX}_last_report_time_seconds gauge',
+            f'{PROMETHEUS_PREFIX}_last_report_time_seconds {time.time():.3f}',
+            f'# TYPE {PROMETHEUS_PREFIX}_phase_seconds_total counter',
+        ]
+        for (phase, job), (_, seconds) in _sorted_spans(spans):
+            lines.append(f'{PROMETHEUS_PREFIX}_phase_seconds_total{_labels(_span_labels(phase, job))} {seconds:.6f}')
+        lines.append(f'# TYPE {PROMETHEUS_PREFIX}_phase_runs_total counter')
+        for (phase, job), (count, _) in _sorted_spans(spans):
+            lines.append(f'{PROMETHEUS_PREFIX}_phase_runs_total{_labels(_span_labels(phase, job))} {count}')
+        typed = set()
+        for (name, labels), value in sorted(counters.items()):
+            metric = f'{PROMETHEUS_PREFIX}_{name}_total'
+            if metric not in typed:
+                lines.append(f'# TYPE {metric} counter')
+                typed.add(metric)
+            lines.append(f'{metric}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+def _counter_name(name, labels):
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}={value}' for key, value in labels) + '}'
+
+def _labels(labels):
+    if not labels:
+        return ''
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{key}="{escape(value)}"' for key, value in labels) + '}'
+
+def _sorted_spans(spans):
+    """((phase, job), [count, seconds]) pairs, jobless spans first within each phase."""
+    return sorted(spans.items(), key=lambda item: (item[0][0], item[0][1] or ''))
+
+def _span_labels(phase, job):
+    return (('phase', phase),) + ((('job', job),) if job is not None else ())
+
+_recorder = None
+
+def configure(overrides):
+    """Applies the `metrics` section of the config, starting a fresh recording if enabled."""
+    global _recorder
+    settings.update(overrides or {})
+    _recorder = Recorder() if settings['enabled'] else None
+
+def span(phase, job=None):
+    """Context manager timing one phase, optionally for one job."""
+    if _recorder is None:
+        return _NOOP
+    return _recorder.span(phase, job)
+
+def timed(phase):
+    """Decorator form of span() for whole functions."""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _recorder is None:
+                return func(*args, **kwargs)
+            with _recorder.span(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+def count(name, value=1, **labels):
+    """Adds value to a counter, e.g. count('subprocesses', command='spotdl')."""
+    if _recorder is not None:
+        _recorder.count(name, value, **labels)
+
+def report():
+    """The run report so far, or None when metrics are off."""
+    return _recorder.report() if _recorder is not None else None
+
+def _write_atomic(path, text):
+    # Scrapers and readers never see a half-written file
+    path = os.path.expanduser(path)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    with open(tmp, 'w') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def write():
+    """Writes the JSON report and, if configured, the Prometheus textfile. Returns the paths written."""
+    if _recorder is None:
+        return []
+    written = []
+    if settings['report_path']:
+        _write_atomic(settings['report_path'], json.dumps(_recorder.report(), indent=2) + '\n')
+        written.append(settings['report_path'])
+    if settings['prometheus_path']:
+        _write_atomic(settings['prometheus_path'], _recorder.prometheus())
+        written.append(settings['prometheus_path'])
+    return written
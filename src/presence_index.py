@@ -0,0 +1,49 @@
+from . import audio_tags, metrics
+from .sync_state import file_entry
+from .tracks import intern_id
+from .utils import log_warning
+
+_warned_no_mutagen = False
+
+@metrics.timed('tag_index')
+def index_local_tracks(paths, directory, state):
+    """
+    Returns {spotify_id: path} for the given audio files (all under directory).
+    IDs are interned like the Track records they are checked against.
+
+    IDs come from the tags spotdl embeds. Tags are only read for files that are
+    new or whose size/mtime changed since the last run; everything else comes
+    from the cache in the sync state.
+    """
+    global _warned_no_mutagen
+    if audio_tags.mutagen is None and not _warned_no_mutagen:
+        log_warning("mutagen is not installed, so already-downloaded songs can't be recognised. "
+                    "Every track will be sent to SpotDL (pip install mutagen).")
+        _warned_no_mutagen = True
+
+    cached = state.get_file_ids(directory)
+    present = {}
+    fresh = []
+    for path in paths:
+        try:
+            entry = file_entry(path)
+        except OSError:
+            continue
+        row = cached.pop(path, None)
+        if row is not None and row['size'] == entry['size'] and row['mtime'] == entry['mtime']:
+            spotify_id = row['spotify_id']
+        else:
+            spotify_id = audio_tags.read_spotify_id(path)
+            # Without mutagen nothing was read, so don't cache the miss.
+            if audio_tags.mutagen is not None:
+                fresh.append({**entry, 'spotify_id': spotify_id})
+        if spotify_id:
+            present[intern_id(spotify_id)] = path
+
+    if fresh:
+        metrics.count('tags_read', len(fresh))
+        state.record_file_ids(fresh)
+    # Whatever is left in `cached` is no longer on disk
+    if cached:
+        state.forget_file_ids(list(cached))
+    return present
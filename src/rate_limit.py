@@ -0,0 +1,92 @@
+import threading
+import time
+from spotipy.exceptions import SpotifyException
+from . import metrics
+from .utils import log_warning
+
+# Statuses worth retrying. 429 is rate limiting, the 5xx are transient server trouble.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+class RequestScheduler:
+    """
+    One gate shared by every Spotify Web API call in the process.
+
+    A token bucket keeps us under the quota (`rate` requests per second, with
+    bursts up to `burst`). When Spotify still answers 429, every caller pauses
+    until its Retry-After has passed, not just the thread that got it.
+    """
+
+    def __init__(self, rate=10.0, burst=20, max_retries=6, max_backoff=60.0):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.max_retries = max_retries
+        self.max_backoff = max_backoff
+        self.lock = threading.Lock()
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+        # Counters
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+
+    def _acquire(self):
+        """Blocks until a request may be sent."""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        self.requests += 1
+                        metrics.count('spotify_requests')
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+            with self.lock:
+                self.wait_seconds += wait
+            metrics.count('spotify_wait_seconds', wait)
+
+    def _backoff(self, error, attempt):
+        """Seconds to wait before retrying: Retry-After if given, else exponential."""
+        headers = getattr(error, 'headers', None) or {}
+        retry_after = headers.get('Retry-After') or headers.get('retry-after')
+        try:
+            delay = float(retry_after)
+        except (TypeError, ValueError):
+            delay = 2 ** attempt
+        return min(self.max_backoff, max(delay, 0.0))
+
+    def call(self, func, *args, **kwargs):
+        """Runs func(*args, **kwargs) under the rate limit, retrying throttled and transient failures."""
+        for attempt in range(self.max_retries + 1):
+            self._acquire()
+            try:
+                return func(*args, **kwargs)
+            except SpotifyException as e:
+                if e.http_status not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise
+                delay = self._backoff(e, attempt)
+                with self.lock:
+                    if e.http_status == 429:
+                        self.throttled += 1
+                    self.retries += 1
+                    metrics.count('spotify_retries', status=e.http_status)
+                    # Everyone waits, so the other worker threads don't keep hammering.
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+                if e.http_status == 429 and delay >= 5:
+                    log_warning(f"Spotify rate limit hit. Waiting {delay:.0f}s before continuing...")
+
+    def stats(self):
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'throttled': self.throttled,
+                'retries': self.retries,
+                'wait_seconds': round(self.wait_seconds, 2),
+            }
@@ -0,0 +1,91 @@
+import os
+import time
+
+AUDIO_EXTS = {'.mp3', '.m4a', '.opus', '.flac'}
+
+# A directory modified this recently may still change within the same mtime
+# tick, so it is listed again next time instead of trusted.
+RACY_NS = 2 * 10**9
+
+class DirectoryScanner:
+    """
+    Lists the audio files under a folder, remembering each directory's mtime
+    and the files it held in the sync state. Adding, removing or renaming a file
+    changes its directory's mtime, so on the next scan only those directories
+    are listed again; everything else comes from the cache with one stat per
+    directory.
+
+    Files are stat'ed once, when they first show up. A file rewritten in place
+    keeps its cached size/mtime here; callers that care stat it themselves.
+    """
+
+    def __init__(self, state, exts=AUDIO_EXTS):
+        self.state = state
+        self.exts = exts
+
+    def changes(self, root):
+        """
+        Yields ('added', path) and ('removed', path) for every audio file that
+        appeared or disappeared under root since the last scan. The cache is
+        only updated once the generator has been run to the end.
+        """
+        root = os.path.abspath(os.path.expanduser(root))
+        cached_dirs, cached_files = self.state.get_scan_cache(root)
+        children = {}
+        for path, (parent, _) in cached_dirs.items():
+            children.setdefault(parent, []).append(path)
+
+        listed = {}
+        visited = set()
+        self.listing = []
+        now_ns = time.time_ns()
+        stack = [(root, None)]
+        while stack:
+            path, parent = stack.pop()
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                continue
+            visited.add(path)
+            old = cached_files.get(path, {})
+
+            if path in cached_dirs and cached_dirs[path][1] == mtime_ns:
+                # Nothing was added or removed here
+                entries = old
+                stack.extend((child, path) for child in children.get(path, ()))
+            else:
+                entries = {}
+                try:
+                    with os.scandir(path) as it:
+                        for entry in it:
+                            if entry.is_dir(follow_symlinks=False):
+                                stack.append((entry.path, path))
+                            elif os.path.splitext(entry.name)[1].lower() in self.exts and entry.is_file():
+                                if entry.name in old:
+                                    entries[entry.name] = old[entry.name]
+                                else:
+                                    st = entry.stat()
+                                    entries[entry.name] = (st.st_size, st.st_mtime)
+                                    yield 'added', entry.path
+                except OSError:
+                    continue
+                for name in old:
+                    if name not in entries:
+                        yield 'removed', os.path.join(path, name)
+                # Too fresh to trust: list it again next time
+                listed[path] = (parent, mtime_ns if now_ns - mtime_ns > RACY_NS else None, entries)
+
+            self.listing.extend(os.path.join(path, name) for name in entries)
+
+        gone = [path for path in cached_dirs if path not in visited]
+        for path in gone:
+            for name in cached_files.get(path, {}):
+                yield 'removed', os.path.join(path, name)
+        if listed or gone:
+            self.state.save_scan(listed, gone)
+
+    def scan(self, root):
+        """Returns the absolute paths of every audio file under root."""
+        for _ in self.changes(root):
+            pass
+        return self.listing
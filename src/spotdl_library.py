@@ -0,0 +1,136 @@
+import importlib.util
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .audio_tags import track_id_from_url
+
+# spotdl's default file name; the rest of the tool expects "Artist - Title.ext"
+OUTPUT_TEMPLATE = '{artists} - {title}.{output-ext}'
+
+class LibraryError(Exception):
+    """The in-process backend can't be used; fall back to the spotdl command."""
+
+def available():
+    """True if spotdl can be imported as a library by this interpreter."""
+    return importlib.util.find_spec('spotdl') is not None
+
+class LibraryPool:
+    """
+    SpotDL used as a library in `workers` long-lived processes. Each process
+    imports spotdl and builds its Downloader (search providers, HTTP sessions,
+    yt-dlp) once, then serves chunks from every playlist. Separate processes
+    keep a crash or a wedged download from taking the sync down with it.
+
+    Songs come with the metadata get_tracks() already fetched, so spotdl
+    doesn't ask Spotify about them again; songs without it are looked up by URL.
+    """
+
+    def __init__(self, workers, client_id=None, client_secret=None, rate_per_worker=None):
+        if not available():
+            raise LibraryError("spotdl is not importable")
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(client_id, client_secret, rate_per_worker),
+        )
+        # Submitted chunks, so shutdown() can drop the ones that haven't started
+        self.pending = set()
+
+    def download(self, urls, output_dir, metadata=None):
+        """
+        Downloads urls into output_dir. Returns ({spotify_id: path}, error or None).
+        Raises LibraryError if the worker processes are unusable.
+        """
+        metadata = metadata or {}
+        songs = [(url, metadata.get(track_id_from_url(url))) for url in urls]
+        try:
+            future = self.pool.submit(_download_chunk, songs, os.path.abspath(output_dir))
+        except (BrokenProcessPool, RuntimeError) as e:
+            raise LibraryError(f"worker processes are gone ({e})")
+        self.pending.add(future)
+        try:
+            return future.result()
+        except BrokenProcessPool as e:
+            raise LibraryError(f"worker process died ({e})")
+        finally:
+            self.pending.discard(future)
+
+    def shutdown(self, wait=True):
+        # By hand, since shutdown(cancel_futures=True) needs Python 3.9
+        for future in list(self.pending):
+            future.cancel()
+        self.pool.shutdown(wait=wait)
+
+# --- everything below runs in the pool processes ---
+
+_downloader = None
+
+def _init_worker(client_id, client_secret, rate_per_worker):
+    global _downloader
+    from spotdl.download.downloader import Downloader
+    from spotdl.utils.config import DEFAULT_CONFIG
+    from spotdl.utils.spotify import SpotifyClient
+
+    # Only needed for songs we have no metadata for
+    SpotifyClient.init(
+        client_id=client_id or DEFAULT_CONFIG['client_id'],
+        client_secret=client_secret or DEFAULT_CONFIG['client_secret'],
+        user_auth=False,
+    )
+    settings = {'threads': 1, 'simple_tui': True, 'log_level': 'ERROR', 'output': OUTPUT_TEMPLATE}
+    if rate_per_worker:
+        settings['yt_dlp_args'] = f'--limit-rate {rate_per_worker}'
+    _downloader = Downloader(settings)
+
+def song_fields(meta):
+    """Our track_metadata() dict in the shape of spotdl's Song."""
+    artists = meta['artists'] or ['']
+    return {
+        'name': meta['name'],
+        'artists': artists,
+        'artist': artists[0],
+        'artist_id': meta['artist_id'],
+        'genres': [],
+        'disc_number': meta['disc_number'] or 1,
+        # Spotify's track and album objects don't say how many discs there are
+        'disc_count': meta.get('disc_count'),
+        'album_name': meta['album_name'],
+        'album_artist': meta['album_artist'] or artists[0],
+        'album_id': meta['album_id'],
+        'album_type': meta['album_type'],
+        'duration': (meta['duration_ms'] or 0) // 1000,
+        'year': meta['year'],
+        'date': meta['date'],
+        'track_number': meta['track_number'] or 1,
+        'tracks_count': meta['tracks_count'] or 1,
+        'song_id': meta['id'],
+        'explicit': bool(meta['explicit']),
+        'publisher': '',
+        'url': meta['url'],
+        'isrc': meta['isrc'],
+        'cover_url': meta['cover_url'],
+        'copyright_text': None,
+        'popularity': meta['popularity'],
+    }
+
+def _download_chunk(songs, output_dir):
+    from spotdl.types.song import Song
+
+    _downloader.settings['output'] = os.path.join(output_dir, OUTPUT_TEMPLATE)
+    files = {}
+    errors = []
+    for url, meta in songs:
+        try:
+            song = Song.from_missing_data(**song_fields(meta)) if meta else Song.from_url(url)
+            _, path = _downloader.search_and_download(song)
+        except Exception as e:
+            errors.append(f"{type(e).__name__}: {e}")
+            continue
+        if path:
+            files[track_id_from_url(url)] = str(path)
+        else:
+            errors.append(f"no match for {url}")
+    error = None
+    if errors:
+        error = errors[0] if len(errors) == 1 else f"{errors[0]} (+{len(errors) - 1} more)"
+    return files, error
@@ -1,112 +1,274 @@
 import spotipy
+import requests
+from requests.adapters import HTTPAdapter
 from spotipy.oauth2 import SpotifyOAuth
-import subprocess
-import os
-from .utils import log_info, log_success, log_warning
+from concurrent.futures import ThreadPoolExecutor
+from collections import deque
+import itertools
+from .downloader import download_all
+from .rate_limit import RequestScheduler
+from .tracks import Track
+from .utils import log_info
+
+PAGE_SIZE = 50
+
+# Only ask for the parts of each playlist item we actually use.
+PLAYLIST_ITEM_FIELDS = 'items(added_at,track(id,name,external_urls.spotify,artists(name))),total,next'
+# ...plus what SpotDL needs to find and tag a song, when it runs in-process and
+# takes its metadata from us instead of looking every song up again.
+PLAYLIST_ITEM_FIELDS_FULL = (
+    'items(added_at,track(id,name,external_urls.spotify,artists(id,name),duration_ms,track_number,'
+    'disc_number,explicit,popularity,external_ids.isrc,'
+    'album(id,name,album_type,release_date,total_tracks,images,artists(name)))),total,next'
+)
+
+def track_metadata(track):
+    """The parts of a Spotify track object SpotDL needs, as a plain dict."""
+    album = track.get('album') or {}
+    artists = [artist['name'] for artist in track.get('artists') or []]
+    images = album.get('images') or []
+    release_date = album.get('release_date') or ''
+    return {
+        'id': track['id'],
+        'url': track['external_urls']['spotify'],
+        'name': track['name'],
+        'artists': artists,
+        'artist_id': (track.get('artists') or [{}])[0].get('id'),
+        'duration_ms': track.get('duration_ms'),
+        'track_number': track.get('track_number'),
+        'disc_number': track.get('disc_number'),
+        'explicit': track.get('explicit'),
+        'popularity': track.get('popularity'),
+        'isrc': (track.get('external_ids') or {}).get('isrc'),
+        'album_id': album.get('id'),
+        'album_name': album.get('name'),
+        'album_type': album.get('album_type'),
+        'album_artist': ((album.get('artists') or [{}])[0]).get('name'),
+        'tracks_count': album.get('total_tracks'),
+        'date': release_date,
+        'year': int(release_date[:4]) if release_date[:4].isdigit() else None,
+        # Largest first
+        'cover_url': max(images, key=lambda image: image.get('width') or 0)['url'] if images else None,
+    }
+
+def build_session(pool_size=4):
+    """
+    Keep-alive session with a connection per page worker. Retries are off here
+    because RequestScheduler handles 429s (honouring Retry-After) itself.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=2, pool_maxsize=max(4, pool_size), max_retries=0)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
 
 class SpotifyHandler:
-    def __init__(self, config):
+    def __init__(self, config, client=None):
         self.config = config
-        self.sp = spotipy.Spotify(auth_manager=SpotifyOAuth(
-            client_id=config['client_id'],
-            client_secret=config['client_secret'],
-            redirect_uri=config['redirect_uri'],
-            scope=config['scope'],
-            cache_path=".spotdl_cache"
-        ))
+        # How many pages of a playlist to fetch at once
+        self.page_workers = config.get('page_workers', 4)
+        # Every API call goes through this, so parallel pages and playlists share one quota
+        self.scheduler = RequestScheduler(
+            rate=config.get('requests_per_second', 10),
+            burst=config.get('request_burst', 20),
+        )
+        self.sp = client or spotipy.Spotify(
+            auth_manager=SpotifyOAuth(
+                client_id=config['client_id'],
+                client_secret=config['client_secret'],
+                redirect_uri=config['redirect_uri'],
+                scope=config['scope'],
+                cache_path=".spotdl_cache"
+            ),
+            requests_session=build_session(self.page_workers),
+        )
+        # Whether Track records come with track_metadata(), see keep_track_metadata()
+        self.with_metadata = False
+
+    def keep_track_metadata(self):
+        """
+        Fetches the metadata the in-process SpotDL backend downloads with, and
+        hands it out on each Track. Nothing is kept here: whoever queues the
+        download holds on to it for the songs it needs.
+        """
+        self.with_metadata = True
+
+    def _call(self, func, *args, **kwargs):
+        return self.scheduler.call(func, *args, **kwargs)
+
+    def api_stats(self):
+        """Request, 429 and wait-time counters for this run."""
+        return self.scheduler.stats()
+
+    def _fetch_pages(self, fetch_page, limit=None):
+        """
+        Yields result pages in offset order. The first page tells us `total`;
+        the remaining offsets are then fetched concurrently.
+        fetch_page(offset, page_size) must return one page of a Spotify paging object.
+        """
+        page_size = PAGE_SIZE if limit is None else max(1, min(PAGE_SIZE, limit))
+        first = fetch_page(0, page_size)
+        yield first
+
+        total = first.get('total') or 0
+        if limit is not None:
+            total = min(total, limit)
+        offsets = range(len(first['items']), total, page_size)
+        if not first['items'] or first['next'] is None or not offsets:
+            return
+
+        # Only a couple of pages per worker run ahead of the caller, so a 100k-song
+        # playlist is never all in memory as JSON at once. Pages still come back in order.
+        offsets = iter(offsets)
+        with ThreadPoolExecutor(max_workers=self.page_workers) as pool:
+            pending = deque(pool.submit(fetch_page, offset, page_size)
+                            for offset in itertools.islice(offsets, self.page_workers * 2))
+            while pending:
+                page = pending.popleft().result()
+                for offset in itertools.islice(offsets, 1):
+                    pending.append(pool.submit(fetch_page, offset, page_size))
+                yield page
+
+    def _record(self, track, added_at=None):
+        """Track record for a playlist item's track, or None for local files and removed songs."""
+        if not track or not track.get('id') or not track.get('external_urls'):
+            return None
+        # Only what the sync needs; at 100k songs every field adds megabytes
+        metadata = track_metadata(track) if self.with_metadata else None
+        return Track(track['id'], added_at=added_at, metadata=metadata)
+
+    def iter_tracks(self, playlist_config, limit=50):
+        """
+        Yields a Track for each song in the playlist, a page at a time, so only
+        one page of Spotify's JSON is held at once.
+        """
+        if playlist_config['type'] == 'saved_tracks':
+            yield from self.iter_saved_tracks(limit=limit)
+            return
+
+        pl_url = playlist_config['spotify_playlist_url']
+
+        fields = PLAYLIST_ITEM_FIELDS_FULL if self.with_metadata else PLAYLIST_ITEM_FIELDS
+
+        def fetch_page(offset, page_size):
+            return self._call(self.sp.playlist_items, pl_url, limit=page_size, offset=offset, fields=fields)
+
+        count = 0
+        for results in self._fetch_pages(fetch_page, limit):
+            for item in results['items']:
+                record = self._record(item.get('track'))
+                if record is None:
+                    continue
+                yield record
+                count += 1
+                if limit is not None and count >= limit:
+                    return
 
     def get_tracks(self, playlist_config, limit=50):
         """
-        Fetches track URLs from Spotify.
+        Fetches the playlist's tracks from Spotify, as a list of Track records.
+        """
+        return list(self.iter_tracks(playlist_config, limit))
+
+    def iter_saved_tracks(self, limit=None, since=None):
+        """
+        Yields Liked Songs newest first, as Track records with added_at set.
+
+        since is an (added_at, track_id) high-water mark from an earlier sync.
+        Spotify returns Liked Songs in the order they were added, so we can stop
+        paginating at the first song added before it, or at that very like. A
+        song un-liked and liked again comes back with a new added_at, so the ID
+        alone isn't a stopping point.
         """
-        tracks = []
+        count = 0
+        if since is None:
+            # No early stop possible, so read every page we need concurrently.
+            def fetch_page(offset, page_size):
+                return self._call(self.sp.current_user_saved_tracks, limit=page_size, offset=offset)
+
+            for results in self._fetch_pages(fetch_page, limit):
+                for item in results['items']:
+                    record = self._record(item.get('track'), item['added_at'])
+                    if record is None:
+                        continue
+                    yield record
+                    count += 1
+                    if limit is not None and count >= limit:
+                        return
+            return
+
         offset = 0
-        batch_size = 50
-        
-        fetch_limit = batch_size if limit is None else limit
-        
+
         while True:
-            if playlist_config['type'] == 'saved_tracks':
-                results = self.sp.current_user_saved_tracks(limit=fetch_limit, offset=offset)
-            else:
-                pl_url = playlist_config['spotify_playlist_url']
-                results = self.sp.playlist_items(pl_url, limit=fetch_limit, offset=offset)
+            page_size = PAGE_SIZE if limit is None else min(PAGE_SIZE, limit - count)
+            results = self._call(self.sp.current_user_saved_tracks, limit=page_size, offset=offset)
 
             if not results['items']:
-                break
+                return
 
             for item in results['items']:
-                if item.get('track') and item['track'].get('external_urls'):
-                    tracks.append(item['track']['external_urls']['spotify'])
-            
-            if limit is not None and len(tracks) >= limit:
-                tracks = tracks[:limit]
-                break
-                
+                track = item.get('track')
+                if not track or not track.get('id') or not track.get('external_urls'):
+                    continue
+                if item['added_at'] < since[0] or (item['added_at'] == since[0] and track['id'] == since[1]):
+                    return
+                yield self._record(track, item['added_at'])
+                count += 1
+                if limit is not None and count >= limit:
+                    return
+
             if results['next'] is None:
-                break
-                
+                return
+
             offset += len(results['items'])
-            
-        return tracks
+
+    def fetch_saved_tracks(self, limit=None, since=None):
+        """Liked Songs newest first, as a list of Track records (see iter_saved_tracks)."""
+        return list(self.iter_saved_tracks(limit, since))
+
+    def get_snapshot_id(self, playlist_config):
+        """
+        Returns the playlist's current snapshot_id, which changes whenever the playlist does.
+        Liked Songs has no snapshot, so this returns None for saved_tracks jobs.
+        """
+        if playlist_config['type'] == 'saved_tracks':
+            return None
+        # sync_all_playlists jobs already carry it from the playlist listing
+        if playlist_config.get('snapshot_id'):
+            return playlist_config['snapshot_id']
+        result = self._call(self.sp.playlist, playlist_config['spotify_playlist_url'], fields='snapshot_id')
+        return result.get('snapshot_id')
 
     def download_tracks(self, track_urls, output_dir):
         """
-        Uses SpotDL to download tracks.
-        Strategy: Changes the 'current working directory' to the output folder,
-        then runs the simple command, mimicking the original working script.
+        Uses SpotDL to download tracks into output_dir.
+        Returns the URLs that could not be downloaded.
         """
         if not track_urls:
             return []
 
         log_info(f"Sending {len(track_urls)} songs to SpotDL...")
-        
-        # Ensure output dir exists
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-
-        # We still batch to be safe, but we remove the complicated flags
-        BATCH_SIZE = 50 
-        
-        for i in range(0, len(track_urls), BATCH_SIZE):
-            chunk = track_urls[i:i + BATCH_SIZE]
-            
-            # The command is exactly what worked for you before:
-            # spotdl download url1 url2 url3 ...
-            cmd = ['spotdl', 'download'] + chunk
-            
-            try:
-                # KEY FIX: cwd=output_dir
-                # This tells Python: "Go into this folder, THEN run the command."
-                # This forces the download to land in the right place without using flags.
-                subprocess.run(cmd, cwd=output_dir, check=True)
-            except subprocess.CalledProcessError:
-                log_warning(f"SpotDL skipped some songs in batch {i//BATCH_SIZE + 1}, usually because they already exist.")
-            except FileNotFoundError:
-                log_warning("SpotDL not found! Make sure it is installed (pip install spotdl).")
-                return False
-                
-        return True
+        return download_all(track_urls, output_dir)
 
     def get_all_user_playlists(self):
         """
         Fetches all playlists for the current user.
-        Returns a list of dicts: {'name': str, 'spotify_playlist_url': str}
+        Returns a list of dicts: {'name': str, 'spotify_playlist_url': str, 'snapshot_id': str,
+        'track_count': int or None}
         """
         playlists = []
-        results = self.sp.current_user_playlists(limit=50)
-        
-        while results:
+
+        def fetch_page(offset, page_size):
+            return self._call(self.sp.current_user_playlists, limit=page_size, offset=offset)
+
+        for results in self._fetch_pages(fetch_page):
             for item in results['items']:
                 if item and item.get('name') and item.get('external_urls'):
                     playlists.append({
                         'name': item['name'],
-                        'spotify_playlist_url': item['external_urls']['spotify']
+                        'spotify_playlist_url': item['external_urls']['spotify'],
+                        'snapshot_id': item.get('snapshot_id'),
+                        'track_count': (item.get('tracks') or {}).get('total'),
                     })
-            
-            if results['next']:
-                results = self.sp.next(results)
-            else:
-                break
                 
-        return playlists
\ No newline at end of file
+        return playlists
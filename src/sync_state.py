@@ -0,0 +1,386 @@
+import sqlite3
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_PATH = ".sync_state.db"
+
+# Each entry upgrades the database by one version. Never edit a shipped entry,
+# append a new one instead.
+MIGRATIONS = [
+    '''
+    CREATE TABLE playlists (
+        playlist TEXT PRIMARY KEY,
+        local_dir TEXT NOT NULL,
+        synced_at REAL
+    );
+    CREATE TABLE tracks (
+        playlist TEXT NOT NULL,
+        path TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        spotify_id TEXT,
+        apple_id TEXT,
+        PRIMARY KEY (playlist, path)
+    );
+    CREATE INDEX tracks_spotify_id ON tracks (spotify_id);
+    CREATE INDEX tracks_apple_id ON tracks (apple_id);
+    ''',
+    '''
+    ALTER TABLE playlists ADD COLUMN snapshot_id TEXT;
+    ''',
+    '''
+    CREATE TABLE liked_cursor (
+        playlist TEXT PRIMARY KEY,
+        added_at TEXT NOT NULL,
+        track_id TEXT NOT NULL,
+        reconciled_at REAL NOT NULL
+    );
+    ''',
+    '''
+    CREATE TABLE file_ids (
+        path TEXT PRIMARY KEY,
+        size INTEGER NOT NULL,
+        mtime REAL NOT NULL,
+        spotify_id TEXT
+    );
+    CREATE INDEX file_ids_spotify_id ON file_ids (spotify_id);
+    ''',
+    '''
+    CREATE TABLE scan_dirs (
+        path TEXT PRIMARY KEY,
+        parent TEXT,
+        mtime_ns INTEGER,
+        entries TEXT NOT NULL
+    );
+    ''',
+    '''
+    CREATE TABLE settings_checks (
+        library TEXT PRIMARY KEY,
+        checked_at REAL NOT NULL
+    );
+    ''',
+    '''
+    CREATE TABLE runs (
+        run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        started_at REAL NOT NULL,
+        finished_at REAL
+    );
+    CREATE TABLE journal (
+        run_id INTEGER NOT NULL,
+        playlist TEXT NOT NULL,
+        phase TEXT NOT NULL,
+        done INTEGER NOT NULL DEFAULT 0,
+        total INTEGER NOT NULL DEFAULT 0,
+        data TEXT,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (run_id, playlist)
+    );
+    ''',
+    '''
+    CREATE TABLE retry_tracks (
+        playlist TEXT NOT NULL,
+        spotify_id TEXT NOT NULL,
+        failed_at REAL NOT NULL,
+        PRIMARY KEY (playlist, spotify_id)
+    );
+    ''',
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+class SyncState:
+    """
+    Local record of what each job has already synced: for every playlist, the
+    files on disk (with size and mtime so changes can be spotted without reading
+    them), the Spotify track they came from and their Apple Music persistent ID.
+
+    Playlists are keyed by their Apple Music playlist name.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        # isolation_level=None: we issue BEGIN/COMMIT ourselves in transaction().
+        self.conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.RLock()
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._migrate()
+
+    def _migrate(self):
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(
+                f"{self.path} was written by a newer version (schema {version}, we know {SCHEMA_VERSION}). "
+                f"Update the tool or delete the file and run 'python main.py rebuild'."
+            )
+        for target in range(version + 1, SCHEMA_VERSION + 1):
+            with self.transaction():
+                for statement in MIGRATIONS[target - 1].split(';'):
+                    if statement.strip():
+                        self.conn.execute(statement)
+                self.conn.execute(f"PRAGMA user_version = {target}")
+
+    @contextmanager
+    def transaction(self):
+        """All writes inside the block are committed together or not at all."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            else:
+                self.conn.execute("COMMIT")
+
+    def close(self):
+        self.conn.close()
+
+    # --- playlists ---
+
+    def touch_playlist(self, playlist, local_dir, snapshot_id=None):
+        """Marks a playlist as fully synced, as of the given Spotify snapshot."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO playlists (playlist, local_dir, synced_at, snapshot_id) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (playlist) DO UPDATE SET local_dir = excluded.local_dir, "
+                "synced_at = excluded.synced_at, snapshot_id = excluded.snapshot_id",
+                (playlist, local_dir, time.time(), snapshot_id)
+            )
+
+    def get_snapshot_id(self, playlist):
+        """Spotify snapshot_id of the last completed sync, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT snapshot_id FROM playlists WHERE playlist = ?", (playlist,)).fetchone()
+        return row['snapshot_id'] if row else None
+
+    def get_playlists(self):
+        """Returns {playlist: row} for every playlist that has completed a sync."""
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM playlists").fetchall()
+        return {row['playlist']: row for row in rows}
+
+    def clear_playlist(self, playlist):
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM tracks WHERE playlist = ?", (playlist,))
+            conn.execute("DELETE FROM playlists WHERE playlist = ?", (playlist,))
+
+    # --- Liked Songs high-water mark ---
+
+    def get_liked_cursor(self, playlist):
+        """Newest Liked Song (added_at, track_id) already synced, plus when we last did a full pass."""
+        with self.lock:
+            return self.conn.execute("SELECT * FROM liked_cursor WHERE playlist = ?", (playlist,)).fetchone()
+
+    def set_liked_cursor(self, playlist, added_at, track_id, reconciled_at=None):
+        """Moves the high-water mark. reconciled_at is only updated after a full pass."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO liked_cursor (playlist, added_at, track_id, reconciled_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (playlist) DO UPDATE SET added_at = excluded.added_at, track_id = excluded.track_id, "
+                "reconciled_at = COALESCE(?, liked_cursor.reconciled_at)",
+                (playlist, added_at, track_id, reconciled_at or 0, reconciled_at)
+            )
+
+    # --- songs to download again ---
+
+    def get_retry_tracks(self, playlist):
+        """Spotify IDs of the songs the last sync couldn't download or link."""
+        with self.lock:
+            rows = self.conn.execute("SELECT spotify_id FROM retry_tracks WHERE playlist = ?", (playlist,)).fetchall()
+        return [row['spotify_id'] for row in rows]
+
+    def set_retry_tracks(self, playlist, spotify_ids):
+        """Replaces the playlist's songs to retry with this sync's failures."""
+        now = time.time()
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM retry_tracks WHERE playlist = ?", (playlist,))
+            conn.executemany(
+                "INSERT INTO retry_tracks (playlist, spotify_id, failed_at) VALUES (?, ?, ?)",
+                [(playlist, spotify_id, now) for spotify_id in spotify_ids]
+            )
+
+    # --- tracks ---
+
+    def get_tracks(self, playlist):
+        """Returns {path: row} for every file recorded for the playlist."""
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM tracks WHERE playlist = ?", (playlist,)).fetchall()
+        return {row['path']: row for row in rows}
+
+    def record_tracks(self, playlist, entries):
+        """
+        Upserts files for a playlist. entries are dicts with path, size, mtime and
+        optionally spotify_id / apple_id; a missing ID never overwrites a known one.
+        """
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT INTO tracks (playlist, path, size, mtime, spotify_id, apple_id) "
+                "VALUES (:playlist, :path, :size, :mtime, :spotify_id, :apple_id) "
+                "ON CONFLICT (playlist, path) DO UPDATE SET "
+                "size = excluded.size, mtime = excluded.mtime, "
+                "spotify_id = COALESCE(excluded.spotify_id, tracks.spotify_id), "
+                "apple_id = COALESCE(excluded.apple_id, tracks.apple_id)",
+                [
+                    {'spotify_id': None, 'apple_id': None, **entry, 'playlist': playlist}
+                    for entry in entries
+                ]
+            )
+
+    def find_apple_ids(self, spotify_ids):
+        """Returns {spotify_id: apple_id} for songs already imported by any playlist."""
+        found = {}
+        with self.lock:
+            for spotify_id in spotify_ids:
+                row = self.conn.execute(
+                    "SELECT apple_id FROM tracks WHERE spotify_id = ? AND apple_id IS NOT NULL LIMIT 1",
+                    (spotify_id,)
+                ).fetchone()
+                if row:
+                    found[spotify_id] = row['apple_id']
+        return found
+
+    def count_tracks(self, playlist):
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM tracks WHERE playlist = ?", (playlist,)).fetchone()[0]
+
+    def remove_tracks(self, playlist, paths):
+        with self.transaction() as conn:
+            conn.executemany(
+                "DELETE FROM tracks WHERE playlist = ? AND path = ?",
+                [(playlist, path) for path in paths]
+            )
+
+    # --- Spotify IDs read from file tags, cached by size/mtime ---
+
+    def get_file_ids(self, directory):
+        """Returns {path: row} for every cached file under directory."""
+        prefix = os.path.join(directory, '')
+        with self.lock:
+            # [prefix, prefix + U+10FFFF) is every path starting with prefix, and can use the index.
+            rows = self.conn.execute(
+                "SELECT * FROM file_ids WHERE path >= ? AND path < ?", (prefix, prefix + '\U0010ffff')
+            ).fetchall()
+        return {row['path']: row for row in rows}
+
+    def record_file_ids(self, entries):
+        """entries are dicts with path, size, mtime and spotify_id (None = file has no ID tag)."""
+        with self.transaction() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO file_ids (path, size, mtime, spotify_id) "
+                "VALUES (:path, :size, :mtime, :spotify_id)",
+                entries
+            )
+
+    def find_files(self, spotify_id):
+        """Every cached file, in any directory, tagged with this Spotify ID."""
+        with self.lock:
+            return self.conn.execute("SELECT * FROM file_ids WHERE spotify_id = ?", (spotify_id,)).fetchall()
+
+    def forget_file_ids(self, paths):
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM file_ids WHERE path = ?", [(path,) for path in paths])
+
+    # --- directory listings, see scanner.py ---
+
+    def get_scan_cache(self, root):
+        """
+        Returns ({dir: (parent, mtime_ns)}, {dir: {name: (size, mtime)}}) for
+        root and everything below it.
+        """
+        prefix = os.path.join(root, '')
+        dirs = {}
+        files = {}
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT * FROM scan_dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                (root, prefix, prefix + '\U0010ffff')
+            ).fetchall()
+        for row in rows:
+            dirs[row['path']] = (row['parent'], row['mtime_ns'])
+            # One JSON blob per directory loads much faster than a row per file
+            files[row['path']] = {name: tuple(stat) for name, stat in json.loads(row['entries']).items()}
+        return dirs, files
+
+    def save_scan(self, listed, gone):
+        """
+        listed is {dir: (parent, mtime_ns, {name: (size, mtime)})} for directories
+        that were just read; gone lists directories that no longer exist.
+        """
+        with self.transaction() as conn:
+            conn.executemany("DELETE FROM scan_dirs WHERE path = ?", [(path,) for path in gone])
+            conn.executemany(
+                "INSERT OR REPLACE INTO scan_dirs (path, parent, mtime_ns, entries) VALUES (?, ?, ?, ?)",
+                [
+                    (path, parent, mtime_ns, json.dumps(entries))
+                    for path, (parent, mtime_ns, entries) in listed.items()
+                ]
+            )
+
+    # --- Music settings check ---
+
+    def get_settings_check(self, library):
+        """When the copy-files check last passed for this Music library, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT checked_at FROM settings_checks WHERE library = ?", (library,)).fetchone()
+        return row['checked_at'] if row else None
+
+    def record_settings_check(self, library):
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO settings_checks (library, checked_at) VALUES (?, ?)",
+                         (library, time.time()))
+
+    # --- run journal, see journal.py ---
+
+    def last_run(self):
+        with self.lock:
+            return self.conn.execute("SELECT * FROM runs ORDER BY run_id DESC LIMIT 1").fetchone()
+
+    def start_run(self):
+        """Opens a new run and drops the journals of older ones. Returns the run ID."""
+        with self.transaction() as conn:
+            run_id = conn.execute("INSERT INTO runs (started_at) VALUES (?)", (time.time(),)).lastrowid
+            conn.execute("DELETE FROM journal WHERE run_id != ?", (run_id,))
+            conn.execute("DELETE FROM runs WHERE run_id != ?", (run_id,))
+        return run_id
+
+    def finish_run(self, run_id):
+        with self.transaction() as conn:
+            conn.execute("UPDATE runs SET finished_at = ? WHERE run_id = ?", (time.time(), run_id))
+
+    def get_journal(self, run_id):
+        """Returns {playlist: row} for every job the run has touched."""
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM journal WHERE run_id = ?", (run_id,)).fetchall()
+        return {row['playlist']: row for row in rows}
+
+    def write_journal(self, run_id, playlist, phase, done=0, total=0, data=None):
+        """Records a job's progress. data (JSON text) is kept from earlier entries when not given."""
+        with self.transaction() as conn:
+            conn.execute(
+                "INSERT INTO journal (run_id, playlist, phase, done, total, data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (run_id, playlist) DO UPDATE SET phase = excluded.phase, done = excluded.done, "
+                "total = excluded.total, data = COALESCE(excluded.data, journal.data), "
+                "updated_at = excluded.updated_at",
+                (run_id, playlist, phase, done, total, data, time.time())
+            )
+
+def file_entry(path, **ids):
+    """Stats a file into the dict shape record_tracks expects."""
+    st = os.stat(path)
+    return {'path': path, 'size': st.st_size, 'mtime': st.st_mtime, **ids}
+
+def is_unchanged(row, path):
+    """True if the file still matches what we recorded and is known to be in Apple Music."""
+    if row is None or not row['apple_id']:
+        return False
+    try:
+        st = os.stat(path)
+    except OSError:
+        return False
+    return st.st_size == row['size'] and st.st_mtime == row['mtime']
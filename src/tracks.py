@@ -0,0 +1,47 @@
+import sys
+from .audio_tags import track_id_from_url
+
+SPOTIFY_TRACK_URL = 'https://open.spotify.com/track/'
+
+def intern_id(value):
+    """
+    Interns a Spotify or persistent ID, so the records, sets and indexes that
+    hold it share one string and set lookups mostly compare pointers.
+    """
+    return sys.intern(value) if value else None
+
+class Track:
+    """
+    One song as Spotify or Music reports it. Spotify fills in spotify_id (and
+    added_at for Liked Songs); Music fills in path and persistent_id.
+    metadata is the track_metadata() dict the in-process SpotDL backend
+    downloads with, when the handler was asked to keep it.
+
+    Slots instead of a per-instance dict keep 100k of these at about 100 bytes
+    each, and the URL is rebuilt from the ID rather than stored next to it.
+    """
+    __slots__ = ('spotify_id', 'name', 'artist', 'added_at', 'path', 'persistent_id', 'metadata')
+
+    def __init__(self, spotify_id=None, name=None, artist=None, added_at=None, path=None, persistent_id=None,
+                 metadata=None):
+        self.spotify_id = intern_id(spotify_id)
+        self.name = name
+        self.artist = artist
+        self.added_at = added_at
+        self.path = path
+        self.persistent_id = intern_id(persistent_id)
+        self.metadata = metadata
+
+    @classmethod
+    def from_url(cls, url):
+        """A record for a Spotify track URL (None if it isn't one)."""
+        spotify_id = track_id_from_url(url)
+        return cls(spotify_id) if spotify_id else None
+
+    @property
+    def url(self):
+        return SPOTIFY_TRACK_URL + self.spotify_id if self.spotify_id else None
+
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__ if getattr(self, name) is not None)
+        return f'Track({fields})'
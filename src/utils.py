@@ -24,10 +24,26 @@ def ensure_dir(path):
         os.makedirs(expanded_path)
     return expanded_path
 
-def ask_user(question, default='y'):
-    """Simple Y/N prompt."""
+# Set by answer_automatically() for unattended runs: prompt key -> answer
+AUTO_ANSWERS = None
+
+def answer_automatically(answers):
+    """
+    Stops ask_user() from reading stdin. Prompts are answered from `answers`
+    by key, and fall back to their default.
+    """
+    global AUTO_ANSWERS
+    AUTO_ANSWERS = dict(answers or {})
+
+def ask_user(question, default='y', key=None):
+    """Simple Y/N prompt. key names the prompt for answer_automatically()."""
     valid = {"yes": True, "y": True, "ye": True, "no": False, "n": False}
     prompt = " [Y/n] " if default == 'y' else " [y/N] "
+
+    if AUTO_ANSWERS is not None:
+        answer = bool(AUTO_ANSWERS.get(key, valid[default or 'n']))
+        log_info(f"{question} {'yes' if answer else 'no'} (automatic)")
+        return answer
     
     while True:
         sys.stdout.write(question + prompt)
@@ -0,0 +1,144 @@
+import json
+import os
+import sys
+import tempfile
+import textwrap
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import apple_music
+from src.apple_music import GROUP_SEP, RECORD_SEP
+
+FAKE_OSASCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'benchmarks', 'fakes', 'fake_osascript.py')
+
+
+class ScriptedBackend:
+    """Answers each call with the next of `replies` and records the commands."""
+
+    def __init__(self, *replies):
+        self.replies = list(replies)
+        self.commands = []
+
+    def run(self, script, args=(), repeat=True):
+        self.commands.append(args[0])
+        return self.replies.pop(0)
+
+    def close(self):
+        pass
+
+
+class LibraryIndexTest(unittest.TestCase):
+    def use(self, backend):
+        apple_music.set_backend(backend)
+        self.addCleanup(apple_music.set_backend, None)
+        return backend
+
+    def test_failed_read_raises_instead_of_leaving_an_empty_index(self):
+        library_output = f'A1{RECORD_SEP}B2{GROUP_SEP}/Music/a.mp3{RECORD_SEP}/Music/b.mp3'
+        backend = self.use(ScriptedBackend((False, 'AppleEvent timed out. (-1712)'), (True, library_output)))
+        library = apple_music.LibraryIndex()
+        with self.assertRaises(apple_music.MusicError):
+            library.lookup('/Music/a.mp3')
+        # Not asked again within the same run
+        with self.assertRaises(apple_music.MusicError):
+            library.has_track('A1')
+        self.assertEqual(backend.commands, ['fetch_library'])
+
+        library.refresh()
+        self.assertEqual(library.lookup('/Music/a.mp3'), 'A1')
+        self.assertTrue(library.has_track('B2'))
+
+    def test_garbled_output_is_a_failure(self):
+        self.use(ScriptedBackend((True, '')))
+        with self.assertRaises(apple_music.MusicError):
+            apple_music.LibraryIndex().lookup('/Music/a.mp3')
+
+
+# Reads one request, notes its command and dies without answering
+DYING_WORKER = textwrap.dedent('''
+    import json, sys
+    length = int(sys.stdin.buffer.readline())
+    message = json.loads(sys.stdin.buffer.read(length))
+    with open(sys.argv[1], 'a') as log:
+        log.write(message['argv'][0] + '\\n')
+''')
+
+
+class WorkerRetryTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        script = os.path.join(tmp.name, 'worker.py')
+        with open(script, 'w') as f:
+            f.write(DYING_WORKER)
+        self.log = os.path.join(tmp.name, 'ran.log')
+        self.command = [sys.executable, script, self.log]
+
+    def ran(self):
+        with open(self.log) as f:
+            return f.read().split()
+
+    def test_reads_are_sent_again(self):
+        backend = apple_music.WorkerBackend(self.command)
+        with self.assertRaises(apple_music.WorkerError) as caught:
+            backend.run(apple_music.HANDLERS, ['playlist_ids', 'Mix'])
+        self.assertTrue(caught.exception.sent)
+        self.assertEqual(self.ran(), ['playlist_ids', 'playlist_ids'])
+
+    def test_adds_are_not_sent_again(self):
+        apple_music.set_backend(apple_music.WorkerBackend(self.command))
+        self.addCleanup(apple_music.set_backend, None)
+        with self.assertRaises(apple_music.MusicError):
+            apple_music.call('add_files', 'Mix', '/Music/a.mp3')
+        # Neither the worker nor the osascript fallback got it a second time
+        self.assertEqual(self.ran(), ['add_files'])
+        self.assertIsInstance(apple_music.get_backend(), apple_music.OsascriptBackend)
+
+
+class AddFilesBatchedTest(unittest.TestCase):
+    """add_files_batched against the fake Music, which times out past 4 files per add."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.library = os.path.join(tmp.name, 'library.json')
+        env = {'FAKE_MUSIC_LIBRARY': self.library, 'FAKE_OSASCRIPT_MAX_BATCH': '4',
+               'FAKE_OSASCRIPT_LATENCY': '0', 'FAKE_OSASCRIPT_EVENT_COST': '0'}
+        for patch in (mock.patch.dict(os.environ, env), mock.patch.object(apple_music.time, 'sleep')):
+            patch.start()
+            self.addCleanup(patch.stop)
+        apple_music.set_backend(apple_music.WorkerBackend([sys.executable, FAKE_OSASCRIPT, '--worker']))
+        self.addCleanup(apple_music.set_backend, None)
+        apple_music.create_playlist('Mix')
+        self.files = []
+        for i in range(10):
+            path = os.path.join(tmp.name, f'Artist - Song {i}.mp3')
+            with open(path, 'wb') as f:
+                f.write(b'ID3')
+            self.files.append(path)
+
+    def playlist(self):
+        apple_music.set_backend(None)
+        with open(self.library) as f:
+            library = json.load(f)
+        return [library['tracks'][pid]['path'] for pid in library['playlists']['Mix']]
+
+    def test_timed_out_batches_are_not_added_twice(self):
+        results = apple_music.add_files_batched(self.files, 'Mix', batch_size=8, max_batch_size=8)
+        self.assertTrue(all(persistent_id for _, persistent_id in results))
+        self.assertEqual(sorted(self.playlist()), sorted(self.files))
+
+    def test_missing_file_fails_alone(self):
+        missing = self.files[2]
+        os.remove(missing)
+        results = dict(apple_music.add_files_batched(self.files, 'Mix', batch_size=3, max_batch_size=3))
+        self.assertIsNone(results.pop(missing))
+        self.assertTrue(all(results.values()))
+        self.assertEqual(sorted(self.playlist()), sorted(results))
+
+
+if __name__ == '__main__':
+    unittest.main()
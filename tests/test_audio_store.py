@@ -0,0 +1,51 @@
+import errno
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.audio_store import AudioStore
+from src.sync_state import SyncState
+
+TRACK_ID = 'a' * 22
+
+
+def cross_device(source, target):
+    raise OSError(errno.EXDEV, os.strerror(errno.EXDEV))
+
+
+class AudioStoreTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+        self.playlist = os.path.join(self.tmp, 'Playlist')
+        os.makedirs(self.playlist)
+        state = SyncState(os.path.join(self.tmp, 'state.db'))
+        self.addCleanup(state.close)
+        self.store = AudioStore(os.path.join(self.tmp, 'store'), state)
+        self.song = os.path.join(self.store.directory, 'Artist - Song.mp3')
+        with open(self.song, 'wb') as f:
+            f.write(b'song')
+
+    def test_hardlinks_into_playlist_folder(self):
+        self.assertEqual(self.store.download_dir(self.playlist), self.store.directory)
+        path = self.store.link_into(TRACK_ID, self.playlist, source=self.song)
+        self.assertFalse(os.path.islink(path))
+        self.assertTrue(os.path.samefile(path, self.song))
+        self.assertEqual(os.listdir(self.playlist), ['Artist - Song.mp3'])
+
+    def test_no_hardlinks_downloads_into_playlist_folder(self):
+        with mock.patch('os.link', cross_device):
+            self.assertEqual(self.store.download_dir(self.playlist), self.playlist)
+            self.assertIsNone(self.store.link_into(TRACK_ID, self.playlist, source=self.song))
+        # No symlinks, and the link probe cleaned up after itself
+        self.assertEqual(os.listdir(self.playlist), [])
+        self.assertEqual(os.listdir(self.store.directory), ['Artist - Song.mp3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
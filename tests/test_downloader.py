@@ -0,0 +1,71 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+FAKE_SPOTDL = os.path.join(ROOT, 'benchmarks', 'fakes', 'fake_spotdl.py')
+
+from src import audio_tags, downloader
+
+URLS = [f"https://open.spotify.com/track/{c * 22}" for c in 'abcd']
+
+
+def wait(job, timeout=30):
+    """job.wait(), but fails the test instead of hanging."""
+    result = []
+    thread = threading.Thread(target=lambda: result.append(job.wait()), daemon=True)
+    thread.start()
+    thread.join(timeout)
+    if thread.is_alive():
+        raise AssertionError("DownloadJob.wait() did not return")
+    return result[0]
+
+
+class DownloadSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        env = {'FAKE_SPOTDL_STARTUP': '0', 'FAKE_SPOTDL_PER_SONG': '0', 'FAKE_SPOTDL_FAIL': 'b' * 22}
+        patches = [mock.patch.dict(os.environ, env), mock.patch.object(downloader, 'SPOTDL', FAKE_SPOTDL)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.scheduler = downloader.DownloadScheduler(workers=2, chunk_size=2, backend='command')
+        self.addCleanup(self.scheduler.shutdown)
+        self.addCleanup(self.tmp.cleanup)
+
+    @unittest.skipIf(audio_tags.mutagen is None, "needs mutagen to tell which songs downloaded")
+    def test_partial_failure_reports_only_missing_songs(self):
+        job = self.scheduler.submit('Test', URLS, self.tmp.name)
+        self.assertEqual(wait(job), [URLS[1]])
+        files = {track_id for result in job.results for track_id in result['files']}
+        self.assertEqual(files, {'a' * 22, 'c' * 22, 'd' * 22})
+
+    def test_metadata_is_dropped_once_downloaded(self):
+        metadata = {url[-22:]: {'id': url[-22:]} for url in URLS}
+        job = self.scheduler.submit('Test', URLS, self.tmp.name, metadata)
+        wait(job)
+        self.assertEqual(job.metadata, {})
+
+    def test_finished_jobs_are_not_kept(self):
+        first = self.scheduler.submit('First', URLS, self.tmp.name)
+        wait(first)
+        self.assertEqual(first.baseline, set())
+        second = self.scheduler.submit('Second', URLS, self.tmp.name)
+        self.assertEqual(self.scheduler.jobs, [second])
+        wait(second)
+
+    def test_exception_in_chunk_fails_it_instead_of_hanging(self):
+        with mock.patch.object(downloader.DownloadJob, '_present_ids', side_effect=OSError("folder is gone")), \
+                mock.patch.object(audio_tags, 'mutagen', object()):
+            job = self.scheduler.submit('Test', URLS, self.tmp.name)
+            failed = wait(job)
+        self.assertEqual(sorted(failed), sorted(URLS))
+        self.assertTrue(all('folder is gone' in result['error'] for result in job.results))
+
+
+if __name__ == '__main__':
+    unittest.main()
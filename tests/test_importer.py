@@ -0,0 +1,70 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import metrics
+from src.importer import PlaylistImporter
+from src.sync_state import SyncState, file_entry
+
+
+class StaticLibrary:
+    """A LibraryIndex over fixed {path: persistent ID} and playlist contents."""
+
+    def __init__(self, tracks, in_playlist):
+        self.tracks = tracks
+        self.in_playlist = in_playlist
+
+    def playlist_ids(self, playlist_name):
+        return self.in_playlist
+
+    def lookup(self, path):
+        return self.tracks.get(path)
+
+    def has_track(self, persistent_id):
+        return persistent_id in self.tracks.values()
+
+    def added(self, playlist_name, persistent_id, path=None):
+        pass
+
+
+class SkippedCountTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.state = SyncState(os.path.join(tmp.name, 'state.db'))
+        self.addCleanup(self.state.close)
+        self.files = []
+        for name in ('a', 'b', 'c', 'd'):
+            path = os.path.join(tmp.name, f'{name}.mp3')
+            with open(path, 'wb') as f:
+                f.write(b'song')
+            self.files.append(path)
+        metrics.configure({'enabled': True})
+        self.addCleanup(metrics.configure, {'enabled': False})
+
+    def skipped(self):
+        return metrics.report()['counters'].get('files_skipped', 0)
+
+    @mock.patch('src.apple_music.add_tracks_by_id', side_effect=lambda ids, name: set(ids))
+    def test_each_file_is_skipped_once_per_job(self, add_tracks_by_id):
+        a, b, c, d = self.files
+        # a is recorded from an earlier run; b and c are in the playlist but not
+        # recorded yet; d is in the library and gets added to the playlist
+        self.state.record_tracks('Mix', [file_entry(a, apple_id='A1')])
+        tracks = {os.path.normcase(b): 'B2', os.path.normcase(c): 'C3', os.path.normcase(d): 'D4'}
+        importer = PlaylistImporter('Mix', self.state, StaticLibrary(tracks, {'B2', 'C3'}))
+
+        # Step 6, a streamed batch, and the final pass over the whole folder
+        importer.import_files([a, b], {})
+        importer.import_files([c, d], {})
+        importer.import_files(self.files, {})
+        self.assertEqual(self.skipped(), 3)
+        self.assertEqual(importer.added, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from src.sync_state import SyncState
+from src.tracks import Track
+
+JOB = {'name': 'Liked', 'type': 'saved_tracks', 'apple_playlist_name': 'Liked'}
+
+
+class LikedHandler:
+    def __init__(self, tracks):
+        self.tracks = tracks
+        self.calls = []
+
+    def fetch_saved_tracks(self, limit=None, since=None):
+        self.calls.append(since)
+        return [t for t in self.tracks if since is None or t.added_at > since[0]]
+
+
+class RetryTest(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.state = SyncState(os.path.join(tmp.name, 'state.db'))
+        self.addCleanup(self.state.close)
+
+    def test_failed_songs_dont_hold_back_the_cursor(self):
+        old = [Track(f'{i:022d}', added_at=f'2024-01-0{i}T00:00:00Z') for i in (2, 1)]
+        tracks, cursor = main.fetch_liked_songs(JOB, LikedHandler(old), self.state, None, False, 7)
+        main.mark_synced(self.state, 'Liked', '/music/Liked', None, cursor, retry=[f'{1:022d}'])
+        self.assertEqual(self.state.get_liked_cursor('Liked')['track_id'], f'{2:022d}')
+
+        # The next run only pages back to the cursor, and still tries song 1 again
+        new = Track(f'{3:022d}', added_at='2024-01-03T00:00:00Z')
+        handler = LikedHandler([new] + old)
+        tracks, cursor = main.fetch_liked_songs(JOB, handler, self.state, None, False, 7)
+        self.assertEqual(handler.calls, [('2024-01-02T00:00:00Z', f'{2:022d}')])
+        self.assertEqual([t.spotify_id for t in tracks], [f'{3:022d}', f'{1:022d}'])
+        self.assertEqual(cursor[:2], ('2024-01-03T00:00:00Z', f'{3:022d}'))
+
+        main.mark_synced(self.state, 'Liked', '/music/Liked', None, cursor, retry=[])
+        self.assertEqual(self.state.get_retry_tracks('Liked'), [])
+
+
+
+class DiagnoseTest(unittest.TestCase):
+    def test_stdout_is_only_the_report(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            config = {
+                'spotify': {}, 'sync_all_playlists': True,
+                'state_path': os.path.join(tmp, 'state.db'),
+            }
+            handler = mock.Mock()
+            handler.get_all_user_playlists.return_value = []
+            out = io.StringIO()
+            with mock.patch.object(main, 'load_config', return_value=config), \
+                    mock.patch.object(main, 'SpotifyHandler', return_value=handler), \
+                    mock.patch.object(main, 'diagnose', return_value={'playlists': []}), \
+                    mock.patch.object(sys, 'argv', ['main.py', 'diagnose']), \
+                    mock.patch.object(sys, 'stderr', io.StringIO()), \
+                    contextlib.redirect_stdout(out):
+                main.main()
+        self.assertEqual(json.loads(out.getvalue()), {'playlists': []})
+
+
+class DaemonAnswersTest(unittest.TestCase):
+    def test_partial_answers_keep_the_other_defaults(self):
+        config = {'daemon': {'answers': {'create_playlist': False}}}
+        with mock.patch.object(main, 'answer_automatically', side_effect=StopIteration) as answer:
+            with self.assertRaises(StopIteration):
+                main.run_daemon([], config, None, None, None, None, None, 50)
+        answer.assert_called_once_with({'create_playlist': False, 'download_all': False})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import json
+import os
+import sys
+import unittest
+from unittest import mock
+
+import requests
+import spotipy
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src import rate_limit
+from src.rate_limit import RequestScheduler
+
+
+class FakeClock:
+    """Stands in for the time module: sleep() moves monotonic() forward instead of blocking."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class ScriptedSession(requests.Session):
+    """Answers each request with the next (status, headers, body) and notes when it was sent."""
+
+    def __init__(self, clock, replies):
+        super().__init__()
+        self.clock = clock
+        self.replies = list(replies)
+        self.sent_at = []
+
+    def request(self, method, url, **kwargs):
+        self.sent_at.append(self.clock.now)
+        status, headers, body = self.replies.pop(0)
+        response = requests.Response()
+        response.status_code = status
+        response.reason = 'Too Many Requests' if status == 429 else 'OK'
+        response.url = url
+        response.headers.update(headers)
+        response._content = json.dumps(body).encode()
+        return response
+
+
+class RetryAfterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        patch = mock.patch.object(rate_limit, 'time', self.clock)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def client(self, replies):
+        self.session = ScriptedSession(self.clock, replies)
+        return spotipy.Spotify(auth='token', requests_session=self.session)
+
+    def test_429_waits_for_retry_after_then_retries(self):
+        page = {'items': [], 'total': 0, 'next': None}
+        sp = self.client([
+            (429, {'Retry-After': '7'}, {'error': {'status': 429, 'message': 'API rate limit exceeded'}}),
+            (200, {}, page),
+        ])
+        scheduler = RequestScheduler(rate=100, burst=100)
+        self.assertEqual(scheduler.call(sp.current_user_saved_tracks, limit=1), page)
+
+        self.assertEqual(len(self.session.sent_at), 2)
+        self.assertGreaterEqual(self.session.sent_at[1] - self.session.sent_at[0], 7)
+        stats = scheduler.stats()
+        self.assertEqual((stats['requests'], stats['throttled'], stats['retries']), (2, 1, 1))
+        self.assertGreaterEqual(stats['wait_seconds'], 7)
+
+    def test_gives_up_after_max_retries(self):
+        throttled = (429, {'Retry-After': '1'}, {'error': {'status': 429, 'message': 'API rate limit exceeded'}})
+        sp = self.client([throttled] * 3)
+        scheduler = RequestScheduler(rate=100, burst=100, max_retries=2)
+        with self.assertRaises(spotipy.SpotifyException) as caught:
+            scheduler.call(sp.current_user_saved_tracks, limit=1)
+        self.assertEqual(caught.exception.http_status, 429)
+        self.assertEqual(len(self.session.sent_at), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+FAKES = os.path.join(ROOT, 'benchmarks', 'fakes')
+
+from src import spotdl_library
+from src.spotify_handler import track_metadata
+
+TRACK = {
+    'id': 'a' * 22, 'name': 'Song', 'external_urls': {'spotify': 'https://open.spotify.com/track/' + 'a' * 22},
+    'artists': [{'id': 'b' * 22, 'name': 'Artist'}], 'disc_number': 2, 'track_number': 5,
+    'album': {'id': 'c' * 22, 'name': 'Album', 'release_date': '2020-05-01', 'total_tracks': 24},
+}
+
+
+class SongFieldsTest(unittest.TestCase):
+    def test_disc_number_is_not_the_disc_count(self):
+        fields = spotdl_library.song_fields(track_metadata(TRACK))
+        self.assertEqual(fields['disc_number'], 2)
+        self.assertIsNone(fields['disc_count'])
+        self.assertEqual(fields['year'], 2020)
+
+
+class LibraryPoolTest(unittest.TestCase):
+    def setUp(self):
+        # The fake spotdl package stands in for the real one
+        patches = [
+            mock.patch.object(sys, 'path', [FAKES] + sys.path),
+            mock.patch.dict(os.environ, {'FAKE_SPOTDL_STARTUP': '0', 'FAKE_SPOTDL_PER_SONG': '0'}),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def test_downloads_and_shuts_down(self):
+        pool = spotdl_library.LibraryPool(1)
+        try:
+            files, error = pool.download([TRACK['external_urls']['spotify']], self.tmp, {})
+        finally:
+            pool.shutdown()
+        self.assertIsNone(error)
+        self.assertEqual(list(files), ['a' * 22])
+        self.assertEqual(pool.pending, set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.spotify_handler import SpotifyHandler
+
+
+def song(i, added_at):
+    track_id = f'{i:022d}'
+    return {'added_at': added_at, 'track': {
+        'id': track_id, 'name': f'Song {i}', 'artists': [{'name': 'Artist'}],
+        'external_urls': {'spotify': f'https://open.spotify.com/track/{track_id}'},
+    }}
+
+
+class LikedSongsClient:
+    """current_user_saved_tracks over a fixed list, newest first like Spotify."""
+
+    def __init__(self, items):
+        self.items = items
+
+    def current_user_saved_tracks(self, limit=20, offset=0):
+        page = self.items[offset:offset + limit]
+        more = offset + limit < len(self.items)
+        return {'items': page, 'total': len(self.items), 'next': 'more' if more else None}
+
+
+def handler(items):
+    return SpotifyHandler({'requests_per_second': 1e9, 'request_burst': 1e9}, client=LikedSongsClient(items))
+
+
+class SavedTracksSinceTest(unittest.TestCase):
+    def test_stops_at_the_cursor(self):
+        items = [song(3, '2024-03-03T00:00:00Z'), song(2, '2024-02-02T00:00:00Z'), song(1, '2024-01-01T00:00:00Z')]
+        since = ('2024-02-02T00:00:00Z', f'{2:022d}')
+        tracks = handler(items).fetch_saved_tracks(since=since)
+        self.assertEqual([t.spotify_id for t in tracks], [f'{3:022d}'])
+
+    def test_reliked_cursor_song_does_not_hide_newer_songs(self):
+        # Song 2 was the cursor, then got un-liked and liked again after song 3
+        items = [song(2, '2024-04-04T00:00:00Z'), song(3, '2024-03-03T00:00:00Z'), song(1, '2024-01-01T00:00:00Z')]
+        since = ('2024-02-02T00:00:00Z', f'{2:022d}')
+        tracks = handler(items).fetch_saved_tracks(since=since)
+        self.assertEqual([t.spotify_id for t in tracks], [f'{2:022d}', f'{3:022d}'])
+
+    def test_same_second_as_the_cursor_is_not_skipped(self):
+        items = [song(3, '2024-02-02T00:00:00Z'), song(2, '2024-02-02T00:00:00Z'), song(1, '2024-01-01T00:00:00Z')]
+        since = ('2024-02-02T00:00:00Z', f'{2:022d}')
+        tracks = handler(items).fetch_saved_tracks(since=since)
+        self.assertEqual([t.spotify_id for t in tracks], [f'{3:022d}'])
+
+
+if __name__ == '__main__':
+    unittest.main()